@@ -1,17 +1,358 @@
+import io
 import os
+import sys
+import csv
 import json
+import math
+import time
+import asyncio
 import base64
-from typing import Dict, List, Optional
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 from enum import Enum
+import argparse
 
-# Mocking the AI client for now, or using standard library if feasible.
-# Ideally, we'd use `openai` library: import openai
-# But sticking to standard request structure for compatibility/demonstration if lib not present.
-# For production code, we assume 'openai' or similar SDK is installed.
+# Model calls go through a pluggable backend (see ad_oracle_backends.py).
+# The default is the OpenAI SDK; without it we run in Mock Mode unless a
+# backend such as HTTPChatBackend (local stand-in) or GeminiBackend is passed.
+from ad_oracle_backends import Backend, OpenAI, OpenAIBackend, ResilientBackend
+
+# Pillow is optional: without it images are sent as-is (format still sniffed).
 try:
-    from openai import OpenAI
+    from PIL import Image
 except ImportError:
-    OpenAI = None
+    Image = None
+
+class PreparedImage:
+    """An image ready to send: base64 payload plus its source hash and size report."""
+    __slots__ = ("sha256", "mime", "data", "original_bytes", "encoded_bytes")
+
+    def __init__(self, sha256: str, mime: str, data: str, original_bytes: int, encoded_bytes: int):
+        self.sha256 = sha256
+        self.mime = mime
+        self.data = data
+        self.original_bytes = original_bytes
+        self.encoded_bytes = encoded_bytes
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.encoded_bytes
+
+    @property
+    def data_url(self) -> str:
+        return f"data:{self.mime};base64,{self.data}"
+
+class ImagePreprocessor:
+    """
+    Detects the real image format from its header, downscales/recompresses
+    oversized images to `max_edge` px and `max_bytes` (needs Pillow), and caches
+    the encoded payload by path, size and mtime.
+    """
+
+    # (magic prefix, offset, mime)
+    SIGNATURES = (
+        (b"\xff\xd8\xff", 0, "image/jpeg"),
+        (b"\x89PNG\r\n\x1a\n", 0, "image/png"),
+        (b"GIF87a", 0, "image/gif"),
+        (b"GIF89a", 0, "image/gif"),
+        (b"WEBP", 8, "image/webp"),
+        (b"ftypheic", 4, "image/heic"),
+        (b"ftypheix", 4, "image/heic"),
+        (b"ftypmif1", 4, "image/heif"),
+        (b"BM", 0, "image/bmp"),
+    )
+    # Formats the vision APIs accept without conversion
+    PASSTHROUGH = ("image/jpeg", "image/png", "image/gif", "image/webp")
+    CHUNK = 3 * 256 * 1024  # multiple of 3 so per-chunk base64 concatenates cleanly
+
+    def __init__(self, max_edge: int = 1568, max_bytes: int = 1_500_000, cache_size: int = 256):
+        self.max_edge = max_edge
+        self.max_bytes = max_bytes
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.images = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def signature(self) -> str:
+        """Identifies what the model actually sees; part of result cache keys."""
+        return f"{self.max_edge}x{self.max_bytes}" if Image else "raw"
+
+    @classmethod
+    def detect_mime(cls, header: bytes) -> str:
+        for magic, offset, mime in cls.SIGNATURES:
+            if header[offset:offset + len(magic)] == magic:
+                return mime
+        return "image/jpeg"
+
+    def prepare(self, image_path: str) -> PreparedImage:
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Image not found at {image_path}")
+
+        st = os.stat(image_path)
+        cache_key = (os.path.abspath(image_path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            prepared = self._cache.get(cache_key)
+            if prepared is not None:
+                self._cache.move_to_end(cache_key)
+                return prepared
+
+        prepared = self._encode(image_path, st.st_size)
+
+        with self._lock:
+            self._cache[cache_key] = prepared
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            self.images += 1
+            self.bytes_in += prepared.original_bytes
+            self.bytes_out += prepared.encoded_bytes
+        return prepared
+
+    def _encode(self, image_path: str, size: int) -> PreparedImage:
+        # One streaming pass: hash, sniff the header and base64 chunk by chunk
+        digest = hashlib.sha256()
+        parts = []
+        with open(image_path, "rb") as f:
+            header = f.read(32)
+            mime = self.detect_mime(header)
+            chunk = header + f.read(self.CHUNK - len(header))
+            while chunk:
+                digest.update(chunk)
+                parts.append(base64.b64encode(chunk))
+                chunk = f.read(self.CHUNK)
+
+        if Image is not None and self._needs_resize(image_path, mime, size):
+            try:
+                data = self._recompress(image_path)
+                return PreparedImage(digest.hexdigest(), "image/jpeg",
+                                     base64.b64encode(data).decode("ascii"), size, len(data))
+            except Exception:
+                pass  # e.g. HEIC without a Pillow plugin: send the original bytes
+        return PreparedImage(digest.hexdigest(), mime, b"".join(parts).decode("ascii"), size, size)
+
+    def _needs_resize(self, image_path: str, mime: str, size: int) -> bool:
+        if size > self.max_bytes or mime not in self.PASSTHROUGH:
+            return True
+        try:
+            with Image.open(image_path) as img:  # lazy: reads the header only
+                return max(img.size) > self.max_edge
+        except Exception:
+            return False
+
+    def _recompress(self, image_path: str) -> bytes:
+        with Image.open(image_path) as img:
+            # JPEG draft mode decodes at a reduced scale, far cheaper than a full decode
+            img.draft("RGB", (self.max_edge, self.max_edge))
+            img = img.convert("RGB")
+            img.thumbnail((self.max_edge, self.max_edge))
+            data = b""
+            for quality in (85, 75, 65, 50):
+                buf = io.BytesIO()
+                img.save(buf, format="JPEG", quality=quality, optimize=True)
+                data = buf.getvalue()
+                if len(data) <= self.max_bytes:
+                    break
+            return data
+
+    def stats(self) -> Dict:
+        return {"images": self.images, "bytes_in": self.bytes_in, "bytes_out": self.bytes_out,
+                "bytes_saved": self.bytes_in - self.bytes_out}
+
+class ResultCache:
+    """
+    Persistent, content-addressed store for prediction results (SQLite).
+    Entries expire after `ttl` seconds; beyond `max_entries` the least recently
+    used rows are evicted. Safe to share between predict_many worker threads.
+    """
+
+    def __init__(self, path: str, max_entries: int = 50000, ttl: Optional[float] = 30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results(accessed)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_results_created ON results(created)")
+        self._conn.commit()
+        # Counted once here and then tracked, so put() does not scan the table
+        self._count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    @staticmethod
+    def make_key(image_hash: str, text: str, platform: str, criteria_version: str, model: str) -> str:
+        h = hashlib.sha256(image_hash.encode("ascii"))
+        for part in (text, platform, criteria_version, model):
+            h.update(b"\0" + part.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._conn.commit()
+                self._count -= 1
+                self.evictions += 1
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict):
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM results WHERE key = ?", (key,)).fetchone()
+            self._conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                               (key, json.dumps(value, ensure_ascii=False), now, now))
+            self._count += not exists
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        if self.ttl is not None:
+            cur = self._conn.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+            self._count -= cur.rowcount
+            self.evictions += cur.rowcount
+        if self._count > self.max_entries:
+            cur = self._conn.execute(
+                "DELETE FROM results WHERE key IN "
+                "(SELECT key FROM results ORDER BY accessed LIMIT ?)", (self._count - self.max_entries,))
+            self._count -= cur.rowcount
+            self.evictions += cur.rowcount
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+            self._count = 0
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "entries": self._count, "hit_ratio": round(self.hits / total, 4) if total else 0.0}
+
+class AdPrediction:
+    """Validated single-platform verdict. Compact (`__slots__`) for large ranking runs."""
+    __slots__ = ("platform_fit_score", "predicted_ctr_level", "visual_analysis",
+                 "copy_analysis", "critical_flaw", "optimization_suggestions")
+
+    def __init__(self, platform_fit_score: int, predicted_ctr_level: str, visual_analysis: str,
+                 copy_analysis: str, critical_flaw: str, optimization_suggestions: List[str]):
+        self.platform_fit_score = platform_fit_score
+        self.predicted_ctr_level = predicted_ctr_level
+        self.visual_analysis = visual_analysis
+        self.copy_analysis = copy_analysis
+        self.critical_flaw = critical_flaw
+        self.optimization_suggestions = optimization_suggestions
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class ResponseValidator:
+    """
+    Coerces model JSON into an AdPrediction: string/float scores become ints
+    clamped to 0-10, CTR level is normalised (or derived from the score),
+    text fields are stringified, suggestions become a list of strings.
+    Fields that cannot be coerced are reported for a targeted repair call.
+    Also counts invalid-response rates per platform.
+    """
+
+    CTR_LEVELS = {"high": "High", "medium": "Medium", "med": "Medium", "mid": "Medium", "low": "Low"}
+    TEXT_FIELDS = ("visual_analysis", "copy_analysis", "critical_flaw")
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def check(self, raw: Dict) -> Tuple[Optional[AdPrediction], List[str]]:
+        """Returns (prediction, []) when valid, else (None, invalid field names)."""
+        invalid = []
+        score = self._score(raw.get("platform_fit_score"))
+        if score is None:
+            invalid.append("platform_fit_score")
+
+        level = raw.get("predicted_ctr_level")
+        level = self.CTR_LEVELS.get(level.strip().lower()) if isinstance(level, str) else None
+        if level is None and score is not None:
+            # Same thresholds as the AdOracle front end colour coding
+            level = "High" if score > 7 else "Medium" if score > 4 else "Low"
+        if level is None:
+            invalid.append("predicted_ctr_level")
+
+        texts = {}
+        for field in self.TEXT_FIELDS:
+            value = raw.get(field)
+            if isinstance(value, list):
+                value = " ".join(str(v) for v in value)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+            if isinstance(value, str) and value.strip():
+                texts[field] = value.strip()
+            elif field == "critical_flaw" and value == "":
+                texts[field] = "None"
+            else:
+                invalid.append(field)
+
+        suggestions = raw.get("optimization_suggestions")
+        if isinstance(suggestions, str):
+            suggestions = [s for s in suggestions.replace(";", "\n").splitlines()]
+        if isinstance(suggestions, list):
+            suggestions = [str(s).strip() for s in suggestions if str(s).strip()]
+        if not suggestions:
+            invalid.append("optimization_suggestions")
+
+        if invalid:
+            return None, invalid
+        return AdPrediction(score, level, texts["visual_analysis"], texts["copy_analysis"],
+                            texts["critical_flaw"], suggestions), []
+
+    @staticmethod
+    def _score(value) -> Optional[int]:
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, str):
+            value = value.strip().split("/")[0]  # "7/10"
+            try:
+                value = float(value)
+            except ValueError:
+                return None
+        if not isinstance(value, (int, float)) or not math.isfinite(value):
+            return None
+        return max(0, min(10, int(round(value))))
+
+    def record(self, platform: str, outcome: str):
+        """outcome: 'valid', 'repaired' or 'failed'."""
+        with self._lock:
+            counts = self._counts.setdefault(platform, {"responses": 0, "invalid": 0, "repaired": 0, "failed": 0})
+            counts["responses"] += 1
+            if outcome != "valid":
+                counts["invalid"] += 1
+                counts[outcome] += 1
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {platform: dict(c, invalid_rate=round(c["invalid"] / c["responses"], 4))
+                    for platform, c in self._counts.items()}
 
 class AdContentPredictor:
     """
@@ -45,25 +386,76 @@ class AdContentPredictor:
         }
     }
 
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, request_timeout: float = 60.0,
+                 model: str = "gpt-4o", cache_path: Optional[str] = ".adoracle_cache.sqlite",
+                 preprocessor: Optional[ImagePreprocessor] = None,
+                 backend: Optional[Backend] = None):
+        self.request_timeout = request_timeout
+        self.preprocessor = preprocessor or ImagePreprocessor()
+        # Results are cached by content hash; pass cache_path=None to disable.
+        self.cache = ResultCache(cache_path) if cache_path else None
         self.api_key = api_key or os.getenv("OPENAI_API_KEY") or "mock_key"
-        if OpenAI:
-            self.client = OpenAI(api_key=self.api_key)
-        else:
-            self.client = None
+        if backend is None and OpenAI:
+            backend = OpenAIBackend(model=model, api_key=self.api_key, timeout=request_timeout)  # Or gpt-4-turbo
+        if backend is not None and not isinstance(backend, ResilientBackend):
+            # Every model call gets retries/backoff and the circuit breaker;
+            # pass a configured ResilientBackend to set rpm/tpm quotas.
+            backend = ResilientBackend(backend)
+        self.backend = backend
+        self.model = backend.model if backend else model
+        if backend is None:
             print("Warning: OpenAI library not found. Running in Mock Mode.")
+        self.validator = ResponseValidator()
+        self.usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self._usage_lock = threading.Lock()
+
+    @property
+    def live(self) -> bool:
+        """False in mock mode (no backend)."""
+        return self.backend is not None
 
     def _encode_image(self, image_path: str) -> str:
-        """Encodes a local image file to base64 string."""
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Image not found at {image_path}")
-        
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+        """Encodes a local image file to base64 string (downscaled if oversized)."""
+        return self.preprocessor.prepare(image_path).data
+
+    def criteria_version(self, platform: str) -> str:
+        """Fingerprint of a platform's rubric; editing PLATFORM_CRITERIA changes it."""
+        payload = json.dumps(self.PLATFORM_CRITERIA[platform], sort_keys=True) + self.RESULT_SCHEMA
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _cache_key(self, image: PreparedImage, text: str, platform: str) -> str:
+        model = f"{self.model}@{self.preprocessor.signature}"
+        return ResultCache.make_key(image.sha256, text, platform, self.criteria_version(platform), model)
+
+    def _cache_get(self, key: str, use_cache: bool, refresh: bool) -> Optional[Dict]:
+        if self.cache is None or not use_cache or refresh:
+            return None
+        return self.cache.get(key)
 
-    def predict(self, image_path: str, text: str, platform: str) -> Dict:
+    def _cache_put(self, key: str, result: Dict, use_cache: bool):
+        # Never persist errors or mock output
+        if self.cache is not None and use_cache and self.live and self._is_valid_result(result):
+            self.cache.put(key, result)
+
+    # Shape of a single-platform verdict; shared by the single and combined prompts.
+    RESULT_SCHEMA = """{
+                    "platform_fit_score": (int 0-10, based on criteria),
+                    "predicted_ctr_level": (str "High"/"Medium"/"Low"),
+                    "visual_analysis": (str "Why it fits/fails this platform visually"),
+                    "copy_analysis": (str "Why the text fits/fails user psychology here"),
+                    "critical_flaw": (str "The biggest dealbreaker if any, else 'None'"),
+                    "optimization_suggestions": [(str), (str), (str)]
+                }"""
+
+    REQUIRED_FIELDS = ("platform_fit_score", "predicted_ctr_level", "visual_analysis",
+                       "copy_analysis", "critical_flaw", "optimization_suggestions")
+
+    def predict(self, image_path: str, text: str, platform: str,
+                use_cache: bool = True, refresh: bool = False) -> Dict:
         """
         Predicts ad performance for a specific platform.
+        use_cache=False bypasses the result cache entirely; refresh=True skips
+        the lookup but stores the fresh result.
         Output: JSON Dict.
         """
         # 1. Validate Platform
@@ -73,11 +465,78 @@ class AdContentPredictor:
             # Fuzzy match or default? Let's error for strictness.
             return {"error": f"Invalid platform. Choose from {valid_keys}"}
 
-        # 2. Prepare Prompt
-        messages = [
-            {
-                "role": "system",
-                "content": f"""
+        # 2. Handle Image + cache lookup
+        try:
+            image, keys, cached = self._lookup(image_path, text, [platform], use_cache, refresh)
+        except Exception as e:
+            return {"error": f"Image processing failed: {str(e)}"}
+        if platform in cached:
+            return cached[platform]
+
+        result = self._predict_encoded(image, text, platform)
+        self._cache_put(keys[platform], result, use_cache)
+        return result
+
+    def _lookup(self, image_path: str, text: str, platforms: Sequence[str],
+                use_cache: bool, refresh: bool) -> Tuple[PreparedImage, Dict[str, str], Dict[str, Dict]]:
+        """Prepares the image and returns (image, cache keys, cached results) per platform."""
+        image = self.preprocessor.prepare(image_path)
+        keys = {p: self._cache_key(image, text, p) for p in platforms}
+        cached = {}
+        for platform in platforms:
+            result = self._cache_get(keys[platform], use_cache, refresh)
+            if result is not None:
+                cached[platform] = result
+        return image, keys, cached
+
+    def _predict_encoded(self, image: PreparedImage, text: str, platform: str) -> Dict:
+        """Single-platform call on an already encoded image."""
+        messages = self._build_messages(self._platform_prompt(platform), text, image)
+
+        if self.backend:
+            return self._validated(self._call_llm(messages, max_tokens=500), text, platform)
+        else:
+            # Mock Response for Testing without API Key
+            return self._mock_response(platform)
+
+    def _validated(self, raw: Dict, text: str, platform: str) -> Dict:
+        """Coerces a raw verdict; invalid fields get one cheap repair call."""
+        if not isinstance(raw, dict) or "error" in raw:
+            return raw
+        prediction, invalid = self.validator.check(raw)
+        if prediction is None:
+            repair = self._call_llm(self._repair_messages(raw, invalid, text, platform), max_tokens=300)
+            prediction, invalid = self._merge_repair(raw, repair)
+            self.validator.record(platform, "failed" if prediction is None else "repaired")
+        else:
+            self.validator.record(platform, "valid")
+        if prediction is None:
+            return {"error": f"Invalid response: bad fields {invalid}"}
+        return prediction.to_dict()
+
+    def _merge_repair(self, raw: Dict, repair: Dict) -> Tuple[Optional[AdPrediction], List[str]]:
+        if isinstance(repair, dict) and "error" not in repair:
+            raw = {**raw, **repair}
+        return self.validator.check(raw)
+
+    def _repair_messages(self, raw: Dict, invalid: List[str], text: str, platform: str) -> List[Dict]:
+        """
+        Text-only follow-up asking for just the broken fields. The earlier
+        answer is quoted for context, so the image is not re-sent.
+        """
+        return [
+            {"role": "system", "content": self._platform_prompt(platform)},
+            {"role": "user", "content": f"Ad Copy: {text}"},
+            {"role": "assistant", "content": json.dumps(raw, ensure_ascii=False)},
+            {"role": "user", "content": (
+                f"These fields are missing or invalid: {', '.join(invalid)}. "
+                f"Return STRICT JSON containing ONLY those keys, following the original schema "
+                f"(platform_fit_score is an int 0-10, optimization_suggestions is a list of 3 strings).")},
+        ]
+
+    def _platform_prompt(self, platform: str) -> str:
+        criteria = self.PLATFORM_CRITERIA[platform]
+        return f"""
                 {criteria['system_prompt']}
                 
                 Core DNA: {criteria['core_dna']}
@@ -86,52 +545,236 @@ class AdContentPredictor:
                 
                 Task: Analyze the provided image and text.
                 Return STRICT JSON format with no markdown formatting:
-                {{
-                    "platform_fit_score": (int 0-10, based on criteria),
-                    "predicted_ctr_level": (str "High"/"Medium"/"Low"),
-                    "visual_analysis": (str "Why it fits/fails this platform visually"),
-                    "copy_analysis": (str "Why the text fits/fails user psychology here"),
-                    "critical_flaw": (str "The biggest dealbreaker if any, else 'None'"),
-                    "optimization_suggestions": [(str), (str), (str)]
-                }}
+                {self.RESULT_SCHEMA}
                 """
-            },
+
+    def predict_all_platforms(self, image_path: str, text: str,
+                              platforms: Optional[Sequence[str]] = None,
+                              use_cache: bool = True, refresh: bool = False) -> Dict[str, Dict]:
+        """
+        Scores one creative against several platforms in a single model call.
+        The image is encoded and sent once with a combined rubric; the model
+        returns {platform: verdict}. Only platforms whose verdict fails
+        validation are re-scored with individual `predict`-style calls.
+        Cached platforms are left out of the combined call.
+        """
+        platforms = list(platforms or self.PLATFORM_CRITERIA.keys())
+        invalid = [p for p in platforms if p not in self.PLATFORM_CRITERIA]
+        if invalid:
+            valid_keys = list(self.PLATFORM_CRITERIA.keys())
+            return {p: {"error": f"Invalid platform. Choose from {valid_keys}"} for p in platforms}
+
+        try:
+            image, keys, results = self._lookup(image_path, text, platforms, use_cache, refresh)
+        except Exception as e:
+            return {p: {"error": f"Image processing failed: {str(e)}"} for p in platforms}
+
+        missing = [p for p in platforms if p not in results]
+        if not missing:
+            return results
+
+        if len(missing) == 1:
+            combined = {}
+        elif self.backend:
+            messages = self._build_messages(self._combined_prompt(missing), text, image)
+            combined = self._call_llm(messages, max_tokens=self._combined_max_tokens(missing))
+        else:
+            combined = {p: self._mock_response(p) for p in missing}
+
+        for platform in missing:
+            verdict = combined.get(platform) if isinstance(combined, dict) else None
+            if isinstance(verdict, dict) and self.backend:
+                verdict = self._validated(verdict, text, platform)
+            if not self._is_valid_result(verdict):
+                # Fallback: this platform alone, reusing the encoded image
+                verdict = self._predict_encoded(image, text, platform)
+            self._cache_put(keys[platform], verdict, use_cache)
+            results[platform] = verdict
+        return {p: results[p] for p in platforms}
+
+    def _combined_prompt(self, platforms: Sequence[str]) -> str:
+        """One rubric covering every requested platform, keyed by platform name."""
+        rubric = []
+        for platform in platforms:
+            criteria = self.PLATFORM_CRITERIA[platform]
+            rubric.append(f"""
+                [{platform}]
+                Reviewer: {criteria['system_prompt']}
+                Core DNA: {criteria['core_dna']}
+                High Score Criteria: {criteria['high_score_traits']}
+                Low Score Criteria: {criteria['low_score_traits']}""")
+        keys = ", ".join(f'"{p}"' for p in platforms)
+        return f"""
+                You are a panel of platform experts scoring one ad for several platforms.
+                Judge each platform ONLY by its own rubric below.
+                {"".join(rubric)}
+                
+                Task: Analyze the provided image and text for each platform.
+                Return STRICT JSON format with no markdown formatting, one key per platform ({keys}),
+                each value shaped exactly like:
+                {self.RESULT_SCHEMA}
+                """
+
+    def _build_messages(self, system_prompt: str, text: str, image: PreparedImage) -> List[Dict]:
+        return [
+            {"role": "system", "content": system_prompt},
             {
                 "role": "user",
                 "content": [
                     {"type": "text", "text": f"Ad Copy: {text}"},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": image.data_url
+                        }
+                    },
                 ]
             }
         ]
-        
-        # 3. Handle Image
+
+    def _call_llm(self, messages: List[Dict], max_tokens: int) -> Dict:
         try:
-            base64_image = self._encode_image(image_path)
-            messages[1]["content"].append({
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{base64_image}"
-                }
-            })
+            response = self.backend.complete(messages, max_tokens)
+            self._count_usage(response)
+            return json.loads(response["content"])
         except Exception as e:
-            return {"error": f"Image processing failed: {str(e)}"}
+            return {"error": f"API Call Failed: {str(e)}"}
 
-        # 4. Call LLM
-        if self.client:
-            try:
-                response = self.client.chat.completions.create(
-                    model="gpt-4o", # Or gpt-4-turbo
-                    messages=messages,
-                    response_format={ "type": "json_object" },
-                    max_tokens=500
-                )
-                result_json = response.choices[0].message.content
-                return json.loads(result_json)
-            except Exception as e:
-                return {"error": f"API Call Failed: {str(e)}"}
+    def _count_usage(self, response: Dict):
+        with self._usage_lock:
+            self.usage["calls"] += 1
+            self.usage["prompt_tokens"] += response.get("prompt_tokens", 0)
+            self.usage["completion_tokens"] += response.get("completion_tokens", 0)
+
+    def _combined_max_tokens(self, platforms: Sequence[str]) -> int:
+        return 450 * len(platforms)
+
+    def _is_valid_result(self, result) -> bool:
+        return isinstance(result, dict) and "error" not in result and \
+            all(field in result for field in self.REQUIRED_FIELDS)
+
+    def predict_many(self,
+                     jobs: Iterable[Tuple[str, str, Union[str, Sequence[str]]]],
+                     max_workers: int = 4,
+                     timeout: Optional[float] = None,
+                     combined: bool = False) -> Iterator[Dict]:
+        """
+        Scores many (image_path, text, platforms) jobs on a bounded thread pool.
+        Yields one record per (job, platform) in completion order:
+        {"job": index, "image_path", "platform", "elapsed", "result"}.
+        `timeout` is per call, counted from when a worker picks it up; an expired
+        call yields {"error": "Timeout ..."}. A running call cannot be interrupted:
+        its thread is left to finish (the backend's own request_timeout bounds
+        it), and queued calls move to a fresh pool instead of waiting behind it.
+        With `combined=True` each job is one `predict_all_platforms` call.
+        """
+        tasks = self._expand_jobs(jobs, combined)
+        max_inflight = max_workers  # only pull jobs as workers free up; keeps memory flat
+        started: Dict[Tuple[int, str], float] = {}
+        pending = {}
+        exhausted = False
+
+        pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="adoracle")
+        try:
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_inflight:
+                    task = next(tasks, None)
+                    if task is None:
+                        exhausted = True
+                        break
+                    future = pool.submit(self._timed_predict, started, *task)
+                    pending[future] = task
+                if not pending:
+                    break
+
+                done, _ = wait(pending, timeout=self._next_poll(pending, started, timeout),
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, image_path, _, platform = pending.pop(future)
+                    try:
+                        result, elapsed = future.result()
+                    except Exception as e:
+                        result, elapsed = {"error": f"Prediction failed: {str(e)}"}, 0.0
+                    started.pop((index, platform), None)
+                    yield from self._job_records(index, image_path, platform, elapsed, result)
+
+                if timeout is not None:
+                    now = time.monotonic()
+                    expired = False
+                    for future, (index, image_path, _, platform) in list(pending.items()):
+                        t0 = started.get((index, platform))
+                        if t0 is not None and now - t0 >= timeout:
+                            del pending[future]
+                            started.pop((index, platform), None)
+                            expired = True
+                            yield from self._job_records(index, image_path, platform, now - t0,
+                                                         {"error": f"Timeout after {timeout}s"})
+                    if expired:
+                        pool = self._requeue(pool, pending, started, max_workers)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _requeue(self, pool: ThreadPoolExecutor, pending: Dict, started: Dict,
+                 max_workers: int) -> ThreadPoolExecutor:
+        """Moves calls that have not started yet off a pool whose workers are stuck in timed-out calls."""
+        fresh = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="adoracle")
+        for future, task in list(pending.items()):
+            if future.cancel():
+                del pending[future]
+                pending[fresh.submit(self._timed_predict, started, *task)] = task
+        pool.shutdown(wait=False)
+        return fresh
+
+    def _expand_jobs(self, jobs, combined: bool = False) -> Iterator[Tuple]:
+        """
+        Flattens (image, text, platforms) jobs into tasks, lazily: one task per
+        platform, or one task per job carrying a platform tuple when combined.
+        """
+        for index, (image_path, text, platforms) in enumerate(jobs):
+            if isinstance(platforms, str):
+                platforms = [platforms]
+            if not platforms:
+                continue  # nothing left to score (e.g. a resumed batch row); index stays aligned
+            if combined:
+                yield index, image_path, text, tuple(platforms)
+            else:
+                for platform in platforms:
+                    yield index, image_path, text, platform
+
+    def _timed_predict(self, started: Dict, index: int, image_path: str, text: str, platform):
+        t0 = time.monotonic()
+        started[(index, platform)] = t0
+        if isinstance(platform, tuple):
+            result = self.predict_all_platforms(image_path, text, platform)
         else:
-            # Mock Response for Testing without API Key
-            return self._mock_response(platform)
+            result = self.predict(image_path, text, platform)
+        return result, time.monotonic() - t0
+
+    @staticmethod
+    def _job_records(index: int, image_path: str, platform, elapsed: float,
+                     result: Dict) -> Iterator[Dict]:
+        """Splits a finished task into per-platform records."""
+        if isinstance(platform, tuple):
+            for p in platform:
+                yield {"job": index, "image_path": image_path, "platform": p,
+                       "elapsed": round(elapsed, 3), "result": result.get(p, result)}
+        else:
+            yield {"job": index, "image_path": image_path, "platform": platform,
+                   "elapsed": round(elapsed, 3), "result": result}
+
+    @staticmethod
+    def _next_poll(pending: Dict, started: Dict, timeout: Optional[float]) -> Optional[float]:
+        """How long to block in wait(): until the earliest running call expires."""
+        if timeout is None:
+            return None
+        now = time.monotonic()
+        deadlines = [started[(t[0], t[3])] + timeout - now
+                     for t in pending.values() if (t[0], t[3]) in started]
+        # Queued calls have no start time yet; re-check shortly so they get a deadline.
+        poll = min(deadlines) if deadlines else 0.05
+        if len(deadlines) < len(pending):
+            poll = min(poll, 0.05)
+        return max(poll, 0.0)
 
     def _mock_response(self, platform: str) -> Dict:
         """Returns a dummy JSON response for testing purposes."""
@@ -149,10 +792,391 @@ class AdContentPredictor:
             "note": "RUNNING IN MOCK MODE (No API Key)"
         }
 
+class AsyncAdContentPredictor(AdContentPredictor):
+    """
+    asyncio flavour of AdContentPredictor for event-loop backends.
+    Shares prompts, cache and validation with the sync class. Model calls go
+    through the backend's async client when it has one (OpenAI, HTTP, Gemini;
+    pass one `backend` to several predictors to share its pool), otherwise
+    through a thread pool the backend owns, sized by `apredict_many`; file and
+    SQLite work runs in worker threads. Cancelling the awaiting task aborts an
+    async client's request; a threaded call is no longer awaited but runs to
+    the end (bounded by the backend's timeout).
+    """
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        if self.backend is not None:
+            await self.backend.aclose()
+
+    async def apredict(self, image_path: str, text: str, platform: str,
+                       use_cache: bool = True, refresh: bool = False) -> Dict:
+        """Coroutine version of `predict`."""
+        if platform not in self.PLATFORM_CRITERIA:
+            valid_keys = list(self.PLATFORM_CRITERIA.keys())
+            return {"error": f"Invalid platform. Choose from {valid_keys}"}
+
+        try:
+            image, keys, cached = await asyncio.to_thread(
+                self._lookup, image_path, text, [platform], use_cache, refresh)
+        except Exception as e:
+            return {"error": f"Image processing failed: {str(e)}"}
+        if platform in cached:
+            return cached[platform]
+
+        result = await self._apredict_encoded(image, text, platform)
+        await asyncio.to_thread(self._cache_put, keys[platform], result, use_cache)
+        return result
+
+    async def apredict_all_platforms(self, image_path: str, text: str,
+                                     platforms: Optional[Sequence[str]] = None,
+                                     use_cache: bool = True, refresh: bool = False) -> Dict[str, Dict]:
+        """Coroutine version of `predict_all_platforms`; fallbacks run concurrently."""
+        platforms = list(platforms or self.PLATFORM_CRITERIA.keys())
+        invalid = [p for p in platforms if p not in self.PLATFORM_CRITERIA]
+        if invalid:
+            valid_keys = list(self.PLATFORM_CRITERIA.keys())
+            return {p: {"error": f"Invalid platform. Choose from {valid_keys}"} for p in platforms}
+
+        try:
+            image, keys, results = await asyncio.to_thread(
+                self._lookup, image_path, text, platforms, use_cache, refresh)
+        except Exception as e:
+            return {p: {"error": f"Image processing failed: {str(e)}"} for p in platforms}
+
+        missing = [p for p in platforms if p not in results]
+        if not missing:
+            return results
+
+        if len(missing) == 1:
+            combined = {}
+        elif self.backend:
+            messages = self._build_messages(self._combined_prompt(missing), text, image)
+            combined = await self._acall_llm(messages, max_tokens=self._combined_max_tokens(missing))
+        else:
+            combined = {p: self._mock_response(p) for p in missing}
+
+        verdicts = [combined.get(p) if isinstance(combined, dict) else None for p in missing]
+        if self.backend:
+            verdicts = await asyncio.gather(*(
+                self._avalidated(v, text, p) if isinstance(v, dict) else asyncio.sleep(0, v)
+                for p, v in zip(missing, verdicts)))
+        retry = []
+        for platform, verdict in zip(missing, verdicts):
+            if self._is_valid_result(verdict):
+                results[platform] = verdict
+            else:
+                retry.append(platform)
+        if retry:
+            verdicts = await asyncio.gather(*(self._apredict_encoded(image, text, p) for p in retry))
+            results.update(zip(retry, verdicts))
+
+        for platform in missing:
+            await asyncio.to_thread(self._cache_put, keys[platform], results[platform], use_cache)
+        return {p: results[p] for p in platforms}
+
+    async def apredict_many(self,
+                            jobs: Iterable[Tuple[str, str, Union[str, Sequence[str]]]],
+                            max_concurrency: int = 32,
+                            timeout: Optional[float] = None,
+                            combined: bool = False):
+        """
+        Async generator counterpart of `predict_many`: at most `max_concurrency`
+        calls in flight, records yielded in completion order. Timed-out calls
+        are cancelled (see the class docstring for what that stops).
+        """
+        tasks = self._expand_jobs(jobs, combined)
+        pending = set()
+        if self.backend is not None:
+            self.backend.reserve_threads(max_concurrency)
+
+        async def run(task):
+            index, image_path, text, platform = task
+            t0 = time.monotonic()
+            if isinstance(platform, tuple):
+                coro = self.apredict_all_platforms(image_path, text, platform)
+            else:
+                coro = self.apredict(image_path, text, platform)
+            try:
+                result = await asyncio.wait_for(coro, timeout)
+            except asyncio.TimeoutError:
+                result = {"error": f"Timeout after {timeout}s"}
+            except Exception as e:
+                result = {"error": f"Prediction failed: {str(e)}"}
+            return task, result, time.monotonic() - t0
+
+        try:
+            exhausted = False
+            while True:
+                while not exhausted and len(pending) < max_concurrency:
+                    task = next(tasks, None)
+                    if task is None:
+                        exhausted = True
+                        break
+                    pending.add(asyncio.ensure_future(run(task)))
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    (index, image_path, _, platform), result, elapsed = future.result()
+                    for record in self._job_records(index, image_path, platform, elapsed, result):
+                        yield record
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _apredict_encoded(self, image: PreparedImage, text: str, platform: str) -> Dict:
+        messages = self._build_messages(self._platform_prompt(platform), text, image)
+        if self.backend:
+            return await self._avalidated(await self._acall_llm(messages, max_tokens=500), text, platform)
+        else:
+            return self._mock_response(platform)
+
+    async def _avalidated(self, raw: Dict, text: str, platform: str) -> Dict:
+        if not isinstance(raw, dict) or "error" in raw:
+            return raw
+        prediction, invalid = self.validator.check(raw)
+        if prediction is None:
+            repair = await self._acall_llm(self._repair_messages(raw, invalid, text, platform), max_tokens=300)
+            prediction, invalid = self._merge_repair(raw, repair)
+            self.validator.record(platform, "failed" if prediction is None else "repaired")
+        else:
+            self.validator.record(platform, "valid")
+        if prediction is None:
+            return {"error": f"Invalid response: bad fields {invalid}"}
+        return prediction.to_dict()
+
+    async def _acall_llm(self, messages: List[Dict], max_tokens: int) -> Dict:
+        try:
+            response = await self.backend.acomplete(messages, max_tokens)
+            self._count_usage(response)
+            return json.loads(response["content"])
+        except Exception as e:
+            return {"error": f"API Call Failed: {str(e)}"}
+
+# ==========================================
+# Batch CLI
+# ==========================================
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".heic", ".bmp")
+
+def _split_platforms(value, default: List[str]) -> List[str]:
+    if isinstance(value, list):
+        return value
+    if not value:
+        return default
+    return [p.strip() for p in value.replace("|", ";").replace(",", ";").split(";") if p.strip()]
+
+def iter_manifest(source: str, default_copy: str, default_platforms: List[str]) -> Iterator[Tuple[str, str, List[str]]]:
+    """
+    Streams (image, copy, platforms) jobs from a folder of images, a CSV with
+    image/copy/platforms columns, or JSONL with the same keys. Relative image
+    paths resolve against the manifest's folder.
+    """
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(source, name), default_copy, default_platforms
+        return
+
+    base = os.path.dirname(os.path.abspath(source))
+    with open(source, "r", encoding="utf-8-sig", newline="") as f:
+        if source.lower().endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for row in rows:
+            image = os.path.join(base, row.get("image") or row.get("image_path") or "")
+            copy = row.get("copy") or row.get("text") or default_copy
+            yield image, copy, _split_platforms(row.get("platforms"), default_platforms)
+
+def count_manifest(source: str) -> int:
+    """Cheap streaming pass for the progress ETA."""
+    if os.path.isdir(source):
+        return sum(1 for name in os.listdir(source) if name.lower().endswith(IMAGE_EXTENSIONS))
+    with open(source, "r", encoding="utf-8-sig", newline="") as f:
+        if source.lower().endswith(".csv"):
+            return sum(1 for _ in csv.DictReader(f))
+        return sum(1 for line in f if line.strip())
+
+class ResumeState:
+    """
+    What an earlier run already finished, rebuilt by streaming its JSONL
+    output. Manifest rows are keyed by row number: rows below `watermark` are
+    fully done and only the out-of-order tail is held in memory, so this stays
+    small however long the manifest is. Folder sources are keyed by image name
+    and mtime (the record's "key"), so adding, renaming or editing images
+    between runs does not shift which ones count as done.
+    Error records do not count, so failed calls are retried on resume.
+    """
+
+    def __init__(self):
+        self.watermark = 0
+        self.complete = set()
+        self.partial: Dict[Union[int, str], set] = {}
+        self.records = 0
+
+    @classmethod
+    def load(cls, path: str, by_key: bool = False) -> "ResumeState":
+        state = cls()
+        if not os.path.exists(path):
+            return state
+        _truncate_partial_line(path)
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                key = record.get("key") if by_key else record["row"]
+                if key is not None and "error" not in record.get("result", {"error": 1}):
+                    state.mark(key, record["platform"], record["of"])
+        return state
+
+    def _done(self, key: Union[int, str]) -> bool:
+        return key in self.complete or (isinstance(key, int) and key < self.watermark)
+
+    def mark(self, key: Union[int, str], platform: str, total: int):
+        if self._done(key):
+            return
+        self.records += 1
+        done = self.partial.setdefault(key, set())
+        done.add(platform)
+        if len(done) >= total:
+            del self.partial[key]
+            self.complete.add(key)
+            while self.watermark in self.complete:
+                self.complete.remove(self.watermark)
+                self.watermark += 1
+
+    def remaining(self, key: Union[int, str], platforms: List[str]) -> List[str]:
+        if self._done(key):
+            return []
+        done = self.partial.get(key)
+        return [p for p in platforms if p not in done] if done else platforms
+
+def _truncate_partial_line(path: str):
+    """Drops a half-written last line left by a crash."""
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            step = min(4096, pos)
+            f.seek(pos - step)
+            chunk = f.read(step)
+            nl = chunk.rfind(b"\n")
+            if nl != -1:
+                pos = pos - step + nl + 1
+                break
+            pos -= step
+        if pos != end:
+            f.truncate(pos)
+
+def run_batch(predictor: AdContentPredictor, source: str, out_path: str, platforms: List[str],
+              default_copy: str = "", max_workers: int = 4, timeout: Optional[float] = None,
+              combined: bool = False, progress: bool = True) -> Dict:
+    """Scores a manifest into JSONL, resuming from whatever `out_path` already holds."""
+    by_key = os.path.isdir(source)
+    state = ResumeState.load(out_path, by_key)
+    total_rows = count_manifest(source)
+    totals: Dict[int, List] = {}  # row -> [platform count, records still pending, key]; in-flight rows only
+    skipped = 0
+
+    def jobs():
+        nonlocal skipped
+        for row, (image, copy, row_platforms) in enumerate(iter_manifest(source, default_copy, platforms)):
+            key = _image_key(image) if by_key else row
+            todo = state.remaining(key, row_platforms)
+            if todo:
+                totals[row] = [len(row_platforms), len(todo), key]
+            else:
+                skipped += 1
+            yield image, copy, todo
+
+    written = errors = 0
+    started = last_report = time.monotonic()
+    with open(out_path, "a", encoding="utf-8") as out:
+        for record in predictor.predict_many(jobs(), max_workers=max_workers, timeout=timeout, combined=combined):
+            row = record.pop("job")
+            entry = totals[row]
+            entry[1] -= 1
+            if not entry[1]:
+                del totals[row]
+            head = {"row": row, "of": entry[0], "key": entry[2]} if by_key else {"row": row, "of": entry[0]}
+            out.write(json.dumps({**head, **record}, ensure_ascii=False) + "\n")
+            out.flush()
+            written += 1
+            errors += "error" in record["result"]
+
+            now = time.monotonic()
+            if progress and now - last_report >= 0.5:
+                last_report = now
+                _print_progress(written, errors, row, skipped, total_rows, now - started)
+    if progress:
+        _print_progress(written, errors, total_rows, skipped, total_rows, time.monotonic() - started)
+        sys.stderr.write("\n")
+    return {"written": written, "errors": errors, "skipped_rows": skipped, "rows": total_rows}
+
+def _image_key(image: str) -> str:
+    """Resume key for a folder image: its name plus mtime, so an edited file is scored again."""
+    try:
+        mtime = os.stat(image).st_mtime_ns
+    except OSError:
+        mtime = 0
+    return f"{os.path.basename(image)}@{mtime}"
+
+def _print_progress(written: int, errors: int, row: int, skipped: int, total_rows: int, elapsed: float):
+    rate = written / elapsed if elapsed else 0.0
+    # Rows are pulled roughly in order, so the latest row tracks progress
+    rows_per_s = max(row + 1 - skipped, 0) / elapsed if elapsed else 0.0
+    eta = max(total_rows - row - 1, 0) / rows_per_s if rows_per_s else 0.0
+    sys.stderr.write(f"\r{min(row + 1, total_rows)}/{total_rows} rows  {written} results ({errors} errors)  "
+                     f"{rate:.1f}/s  ETA {int(eta // 60)}m{int(eta % 60):02d}s   ")
+    sys.stderr.flush()
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="AdOracle batch scorer")
+    parser.add_argument("source", help="folder of images, or a .csv/.jsonl manifest of image,copy,platforms")
+    parser.add_argument("--out", default="adoracle_results.jsonl", help="JSONL output; also the resume checkpoint")
+    parser.add_argument("--platforms", default="TikTok,LinkedIn,WhatsApp,YouTube",
+                        help="default platforms for rows that do not list any")
+    parser.add_argument("--copy", default="", help="default ad copy for rows without one")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=None, help="per-call timeout (s)")
+    parser.add_argument("--combined", action="store_true", help="one model call per creative")
+    parser.add_argument("--backend", choices=["openai", "gemini", "http", "local"], default="openai")
+    parser.add_argument("--base-url", help="base URL for http/gemini backends")
+    parser.add_argument("--model", help="model name override")
+    parser.add_argument("--api-key", help="default: $OPENAI_API_KEY for openai, $GEMINI_API_KEY for gemini")
+    parser.add_argument("--rpm", type=float, default=None, help="requests/minute quota")
+    parser.add_argument("--tpm", type=float, default=None, help="tokens/minute quota")
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    from ad_oracle_backends import default_api_key, make_backend
+    backend = None
+    if args.backend != "openai" or OpenAI:
+        api_key = args.api_key or default_api_key(args.backend)
+        kwargs = {k: v for k, v in (("base_url", args.base_url), ("model", args.model),
+                                    ("api_key", api_key)) if v}
+        backend = ResilientBackend(make_backend(args.backend, **kwargs),
+                                   requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+    predictor = AdContentPredictor(cache_path=None if args.no_cache else ".adoracle_cache.sqlite",
+                                   backend=backend)
+    summary = run_batch(predictor, args.source, args.out, _split_platforms(args.platforms, []),
+                        default_copy=args.copy, max_workers=args.workers, timeout=args.timeout,
+                        combined=args.combined)
+    print(json.dumps(summary))
+    return 1 if summary["errors"] else 0
+
 # ==========================================
 # Main Test Block
 # ==========================================
-if __name__ == "__main__":
+def _demo():
     # Test Setup
     predictor = AdContentPredictor() # Will fallback to Mock if no key
     
@@ -175,18 +1199,20 @@ if __name__ == "__main__":
     print(f"Analyzing Ad: '{test_copy[:30]}...'")
     print("-------------------------------------------")
 
-    for plat in platforms:
-        print(f"\n[Targeting: {plat}]")
-        try:
-            # Note: We pass the path. If it doesn't exist, _encode_image throws.
-            # For the purpose of this script run, we handle that.
-            if os.path.exists(test_image):
-                result = predictor.predict(test_image, test_copy, plat)
-            else:
-                 # Force mock if no file
-                 result = predictor._mock_response(plat)
-                 
-            print(json.dumps(result, indent=2))
-        except Exception as e:
-            print(f"Error: {e}")
-            
+    if os.path.exists(test_image):
+        # One combined call scores all four platforms; failed platforms are retried alone.
+        for record in predictor.predict_many([(test_image, test_copy, platforms)], timeout=90,
+                                             combined=True):
+            print(f"\n[Targeting: {record['platform']}] ({record['elapsed']}s)")
+            print(json.dumps(record['result'], indent=2))
+    else:
+        for plat in platforms:
+            print(f"\n[Targeting: {plat}]")
+            # Force mock if no file
+            print(json.dumps(predictor._mock_response(plat), indent=2))
+
+if __name__ == "__main__":
+    # No arguments: the original demo run; otherwise the batch CLI
+    if len(sys.argv) > 1:
+        sys.exit(main())
+    _demo()
@@ -0,0 +1,590 @@
+import os
+import ssl
+import json
+import time
+import random
+import asyncio
+import threading
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Model backends for AdOracle. Every backend takes OpenAI-style chat messages
+# (system prompt + user content with text and a data-URL image) and returns
+# {"content": raw model text, "prompt_tokens": int, "completion_tokens": int}.
+# Non-2xx responses raise BackendError so callers can tell 429/5xx apart.
+try:
+    from openai import OpenAI, AsyncOpenAI
+except ImportError:
+    OpenAI = None
+    AsyncOpenAI = None
+
+
+class BackendError(Exception):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class Backend:
+    """
+    Base interface. Subclasses implement `complete`; `acomplete` defaults to
+    running it on a thread pool the backend owns (see `reserve_threads`).
+    A cancelled threaded call stops being awaited but finishes in its thread.
+    """
+
+    name = "base"
+    default_threads = 16
+
+    def __init__(self, model: str, timeout: float = 60.0):
+        self.model = model
+        self.timeout = timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._threads = 0
+
+    def complete(self, messages: List[Dict], max_tokens: int) -> Dict:
+        raise NotImplementedError
+
+    def reserve_threads(self, count: int):
+        """Grows the pool `acomplete` runs `complete` on, e.g. to an async caller's concurrency."""
+        if count <= self._threads:
+            return
+        old, self._threads = self._executor, count
+        self._executor = ThreadPoolExecutor(max_workers=count, thread_name_prefix=f"{self.name}-backend")
+        if old is not None:
+            old.shutdown(wait=False)  # calls already running there finish on their own
+
+    async def acomplete(self, messages: List[Dict], max_tokens: int) -> Dict:
+        if self._executor is None:
+            self.reserve_threads(self.default_threads)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.complete, messages, max_tokens)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor, self._threads = None, 0
+
+    async def aclose(self):
+        self.close()
+
+
+class OpenAIBackend(Backend):
+    """The OpenAI SDK (sync + async clients, each with its own connection pool)."""
+
+    name = "openai"
+
+    def __init__(self, model: str = "gpt-4o", api_key: Optional[str] = None, timeout: float = 60.0,
+                 base_url: Optional[str] = None):
+        if OpenAI is None:
+            raise ImportError("openai package is not installed")
+        super().__init__(model, timeout)
+        # Retries are handled by ResilientBackend, not the SDK
+        self.client = OpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+        self.aclient = AsyncOpenAI(api_key=api_key, base_url=base_url, timeout=timeout, max_retries=0)
+
+    def _request(self, messages: List[Dict], max_tokens: int) -> Dict:
+        return dict(model=self.model, messages=messages, response_format={"type": "json_object"},
+                    max_tokens=max_tokens)
+
+    @staticmethod
+    def _unpack(response) -> Dict:
+        usage = response.usage
+        return {"content": response.choices[0].message.content,
+                "prompt_tokens": getattr(usage, "prompt_tokens", 0),
+                "completion_tokens": getattr(usage, "completion_tokens", 0)}
+
+    def complete(self, messages: List[Dict], max_tokens: int) -> Dict:
+        try:
+            return self._unpack(self.client.chat.completions.create(**self._request(messages, max_tokens)))
+        except Exception as e:
+            raise BackendError(str(e), getattr(e, "status_code", None)) from e
+
+    async def acomplete(self, messages: List[Dict], max_tokens: int) -> Dict:
+        try:
+            response = await self.aclient.chat.completions.create(**self._request(messages, max_tokens))
+            return self._unpack(response)
+        except Exception as e:
+            raise BackendError(str(e), getattr(e, "status_code", None)) from e
+
+    def close(self):
+        self.client.close()
+
+    async def aclose(self):
+        self.client.close()
+        await self.aclient.close()
+
+
+class _HTTPJSONBackend(Backend):
+    """
+    Stdlib JSON-over-HTTP transport: one keep-alive connection per thread for
+    `complete`, and a pool of asyncio stream connections for `acomplete`, so
+    async callers need no threads and cancelling one closes its socket.
+    Subclasses build the request (`_request`) and read the reply (`_unpack`).
+    """
+
+    def __init__(self, base_url: str, model: str, timeout: float = 60.0):
+        super().__init__(model, timeout)
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.base_path = parts.path.rstrip("/")
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []  # async keep-alive pool
+        self._idle_loop = None
+
+    def _request(self, messages: List[Dict], max_tokens: int) -> Tuple[str, Dict, Dict]:
+        """(path, JSON payload, extra headers) for one call."""
+        raise NotImplementedError
+
+    def _unpack(self, data: Dict) -> Dict:
+        raise NotImplementedError
+
+    def complete(self, messages: List[Dict], max_tokens: int) -> Dict:
+        return self._unpack(self._post(*self._request(messages, max_tokens)))
+
+    async def acomplete(self, messages: List[Dict], max_tokens: int) -> Dict:
+        return self._unpack(await self._apost(*self._request(messages, max_tokens)))
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            conn = cls(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def _post(self, path: str, payload: Dict, headers: Optional[Dict] = None) -> Dict:
+        body = json.dumps(payload).encode("utf-8")
+        all_headers = {"Content-Type": "application/json", **(headers or {})}
+        for attempt in (0, 1):
+            conn = self._connection()
+            try:
+                conn.request("POST", self.base_path + path, body=body, headers=all_headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                self._local.conn = None
+                # A stale keep-alive socket gets one reconnect; timeouts do not
+                stale = isinstance(e, (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError))
+                if attempt or not stale:
+                    raise BackendError(f"Connection failed: {str(e)}") from e
+        return self._decode(resp.status, data)
+
+    @staticmethod
+    def _decode(status: int, data: bytes) -> Dict:
+        if status >= 400:
+            raise BackendError(f"HTTP {status}: {data[:200].decode('utf-8', 'replace')}", status)
+        return json.loads(data)
+
+    async def _apost(self, path: str, payload: Dict, headers: Optional[Dict] = None) -> Dict:
+        body = json.dumps(payload).encode("utf-8")
+        host = self.host if self.port in (80, 443) else f"{self.host}:{self.port}"
+        lines = [f"POST {self.base_path + path} HTTP/1.1", f"Host: {host}",
+                 "Content-Type: application/json", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+        loop = asyncio.get_running_loop()
+        if self._idle_loop is not loop:  # streams belong to the loop that opened them
+            self._idle, self._idle_loop = [], loop
+        for attempt in (0, 1):
+            reused = bool(self._idle)
+            reader, writer = self._idle.pop() if reused else (None, None)
+            keep = False
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(self._aconnect(), self.timeout)
+                status, data, keep = await asyncio.wait_for(self._exchange(reader, writer, request), self.timeout)
+                break
+            except (OSError, EOFError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                # A stale keep-alive socket gets one reconnect; timeouts do not
+                if attempt or not reused or isinstance(e, asyncio.TimeoutError):
+                    raise BackendError(f"Connection failed: {str(e) or type(e).__name__}") from e
+            finally:
+                if keep:
+                    self._idle.append((reader, writer))
+                elif writer is not None:
+                    writer.close()  # also on cancellation: the server sees the request abandoned
+        return self._decode(status, data)
+
+    async def _aconnect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        context = ssl.create_default_context() if self.scheme == "https" else None
+        return await asyncio.open_connection(self.host, self.port, ssl=context,
+                                             server_hostname=self.host if context else None)
+
+    @staticmethod
+    async def _exchange(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                        request: bytes) -> Tuple[int, bytes, bool]:
+        """Sends one request; returns (status, body, whether the connection can be reused)."""
+        writer.write(request)
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise EOFError("connection closed by server")
+        status = int(status_line.split(None, 2)[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep = headers.get("connection", "").lower() != "close" and not status_line.startswith(b"HTTP/1.0")
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";", 1)[0], 16)
+                if not size:
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass  # trailers
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            data = b"".join(chunks)
+        elif "content-length" in headers:
+            data = await reader.readexactly(int(headers["content-length"]))
+        else:
+            data, keep = await reader.read(), False
+        return status, data, keep
+
+    def close(self):
+        super().close()
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
+
+    async def aclose(self):
+        self.close()
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+
+class HTTPChatBackend(_HTTPJSONBackend):
+    """
+    OpenAI-compatible /chat/completions over plain HTTP (no SDK needed).
+    Points at the local stand-in server by default.
+    """
+
+    name = "http"
+
+    def __init__(self, base_url: str = "http://127.0.0.1:8765/v1", model: str = "standin",
+                 api_key: Optional[str] = None, timeout: float = 60.0):
+        super().__init__(base_url, model, timeout)
+        self.api_key = api_key
+
+    def _request(self, messages: List[Dict], max_tokens: int) -> Tuple[str, Dict, Dict]:
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        return "/chat/completions", {
+            "model": self.model, "messages": messages, "max_tokens": max_tokens,
+            "response_format": {"type": "json_object"}}, headers
+
+    def _unpack(self, data: Dict) -> Dict:
+        usage = data.get("usage") or {}
+        return {"content": data["choices"][0]["message"]["content"],
+                "prompt_tokens": usage.get("prompt_tokens", 0),
+                "completion_tokens": usage.get("completion_tokens", 0)}
+
+
+class GeminiBackend(_HTTPJSONBackend):
+    """Gemini generateContent, the same endpoint app_part_adoracle.js `callGemini` uses."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "gemini-2.5-flash",
+                 base_url: str = "https://generativelanguage.googleapis.com/v1beta", timeout: float = 60.0):
+        if not api_key:
+            raise ValueError("The gemini backend needs an api_key")
+        super().__init__(base_url, model, timeout)
+        self.api_key = api_key
+
+    @staticmethod
+    def to_gemini(messages: List[Dict], max_tokens: int) -> Dict:
+        """OpenAI-style messages as a generateContent payload; assistant turns become role "model"."""
+        system = []
+        contents = []
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                content = [{"type": "text", "text": content}]
+            if message["role"] == "system":
+                system += [{"text": item["text"]} for item in content if item["type"] == "text"]
+                continue
+            role = "model" if message["role"] == "assistant" else "user"
+            if not contents or contents[-1]["role"] != role:
+                contents.append({"role": role, "parts": []})
+            parts = contents[-1]["parts"]
+            for item in content:
+                if item["type"] == "text":
+                    parts.append({"text": item["text"]})
+                elif item["type"] == "image_url":
+                    header, data = item["image_url"]["url"].split(",", 1)
+                    mime = header[len("data:"):].split(";", 1)[0]
+                    parts.append({"inline_data": {"mime_type": mime, "data": data}})
+        payload = {"contents": contents,
+                   "generationConfig": {"responseMimeType": "application/json",
+                                        "maxOutputTokens": max_tokens}}
+        if system:
+            payload["systemInstruction"] = {"parts": system}
+        return payload
+
+    def _request(self, messages: List[Dict], max_tokens: int) -> Tuple[str, Dict, Dict]:
+        return f"/models/{self.model}:generateContent?key={self.api_key}", self.to_gemini(messages, max_tokens), {}
+
+    def _unpack(self, data: Dict) -> Dict:
+        try:
+            text = data["candidates"][0]["content"]["parts"][0]["text"]
+        except (KeyError, IndexError) as e:
+            raise BackendError(f"Malformed Gemini response: {str(e)}") from e
+        # Same fence stripping as the front end
+        text = text.replace("```json", "").replace("```", "").strip()
+        usage = data.get("usageMetadata") or {}
+        return {"content": text,
+                "prompt_tokens": usage.get("promptTokenCount", 0),
+                "completion_tokens": usage.get("candidatesTokenCount", 0)}
+
+
+class CircuitOpenError(BackendError):
+    pass
+
+
+class TokenBucket:
+    """
+    Per-minute quota as a token bucket. `reserve` debits immediately (the
+    balance may go negative) and returns how long the caller must wait, so the
+    same bucket serves threads (time.sleep) and coroutines (asyncio.sleep).
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive provider failures and fails
+    fast for `reset_timeout` seconds; then lets one trial call through
+    (half-open) and closes again on success.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release_trial(self):
+        """A trial call ended without a verdict (cancelled, bad payload): let another try."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Returns True when this failure (re)opens the circuit."""
+        with self._lock:
+            self.failures += 1
+            reopen = self.trial_in_flight or (self.opened_at is None and self.failures >= self.failure_threshold)
+            self.trial_in_flight = False
+            if reopen:
+                self.opened_at = time.monotonic()
+            return reopen
+
+
+class ResilientBackend(Backend):
+    """
+    Shared call layer around any backend: rpm/tpm rate limiting, retries with
+    exponential backoff and full jitter on 429/5xx/connection errors, and a
+    circuit breaker. `metrics()` reports retries, throttled time and opens.
+    """
+
+    RETRYABLE = (408, 409, 429, 500, 502, 503, 504)
+    IMAGE_TOKENS = 765
+
+    def __init__(self, inner: Backend, max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 20.0,
+                 requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        super().__init__(inner.model, inner.timeout)
+        self.inner = inner
+        self.name = inner.name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.breaker = breaker or CircuitBreaker()
+        self._metrics = {"calls": 0, "failures": 0, "retries": 0, "throttled_seconds": 0.0,
+                         "circuit_opens": 0, "fast_failures": 0}
+        self._lock = threading.Lock()
+
+    def _bump(self, key: str, amount=1):
+        with self._lock:
+            self._metrics[key] += amount
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            metrics = dict(self._metrics)
+        metrics["throttled_seconds"] = round(metrics["throttled_seconds"], 3)
+        metrics["circuit_state"] = self.breaker.state
+        return metrics
+
+    @classmethod
+    def estimate_tokens(cls, messages: List[Dict], max_tokens: int) -> int:
+        """What a TPM quota charges up front: prompt estimate plus max_tokens."""
+        chars, images = 0, 0
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                chars += len(content)
+                continue
+            for item in content:
+                if item["type"] == "text":
+                    chars += len(item["text"])
+                else:
+                    images += 1
+        return chars // 4 + images * cls.IMAGE_TOKENS + max_tokens
+
+    def _throttle_delay(self, messages: List[Dict], max_tokens: int) -> float:
+        delay = 0.0
+        if self.request_bucket:
+            delay = self.request_bucket.reserve(1)
+        if self.token_bucket:
+            delay = max(delay, self.token_bucket.reserve(self.estimate_tokens(messages, max_tokens)))
+        if delay:
+            self._bump("throttled_seconds", delay)
+        return delay
+
+    def _before_attempt(self):
+        if not self.breaker.allow():
+            self._bump("fast_failures")
+            raise CircuitOpenError("Circuit open: provider failing, not calling", 503)
+        self._bump("calls")
+
+    def _after_failure(self, error: Exception, attempt: int) -> Optional[float]:
+        """Records a failure; returns the backoff delay, or None to give up."""
+        self._bump("failures")
+        status = getattr(error, "status", None)
+        retryable = status is None or status in self.RETRYABLE
+        if retryable:
+            if self.breaker.record_failure():
+                self._bump("circuit_opens")
+        else:
+            # Client errors say nothing about provider health
+            self.breaker.record_success()
+        if not retryable or attempt >= self.max_retries:
+            return None
+        self._bump("retries")
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def complete(self, messages: List[Dict], max_tokens: int) -> Dict:
+        attempt = 0
+        while True:
+            delay = self._throttle_delay(messages, max_tokens)
+            if delay:
+                time.sleep(delay)
+            self._before_attempt()
+            try:
+                result = self.inner.complete(messages, max_tokens)
+            except BackendError as e:
+                backoff = self._after_failure(e, attempt)
+                if backoff is None:
+                    raise
+                time.sleep(backoff)
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.release_trial()
+                raise
+            self.breaker.record_success()
+            return result
+
+    async def acomplete(self, messages: List[Dict], max_tokens: int) -> Dict:
+        attempt = 0
+        while True:
+            delay = self._throttle_delay(messages, max_tokens)
+            if delay:
+                await asyncio.sleep(delay)
+            self._before_attempt()
+            try:
+                result = await self.inner.acomplete(messages, max_tokens)
+            except BackendError as e:
+                backoff = self._after_failure(e, attempt)
+                if backoff is None:
+                    raise
+                await asyncio.sleep(backoff)
+                attempt += 1
+                continue
+            except BaseException:
+                self.breaker.release_trial()
+                raise
+            self.breaker.record_success()
+            return result
+
+    def reserve_threads(self, count: int):
+        self.inner.reserve_threads(count)
+
+    def close(self):
+        self.inner.close()
+
+    async def aclose(self):
+        await self.inner.aclose()
+
+
+API_KEY_ENV = {"openai": "OPENAI_API_KEY", "gemini": "GEMINI_API_KEY"}
+
+
+def default_api_key(kind: str) -> Optional[str]:
+    """The key from the backend's own environment variable; http/local get none unless one is given."""
+    name = API_KEY_ENV.get(kind)
+    return os.getenv(name) if name else None
+
+
+def make_backend(kind: str, **kwargs) -> Backend:
+    """Factory for CLI/bench use: 'openai', 'gemini', 'http' (alias 'local')."""
+    kinds = {"openai": OpenAIBackend, "gemini": GeminiBackend, "http": HTTPChatBackend,
+             "local": HTTPChatBackend}
+    if kind not in kinds:
+        raise ValueError(f"Unknown backend '{kind}'. Choose from {sorted(kinds)}")
+    return kinds[kind](**kwargs)
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+AdOracle benchmark runner.
+
+Replays a corpus of creatives through AdContentPredictor.predict_many at
+several concurrency levels and writes latency percentiles (one sample per
+model call), throughput, token usage, cache hit ratio and estimated cost per
+1k predictions to JSON, so runs can be compared across releases.
+
+    # Offline, against the bundled stand-in server with a synthetic corpus
+    python ad_oracle_bench.py --standin --jobs 100 --concurrency 1,4,16 --out bench.json
+
+    # Real provider over a folder of creatives
+    python ad_oracle_bench.py --backend openai --images ./creatives --concurrency 4
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Optional, Sequence
+
+from ad_oracle import AdContentPredictor, ImagePreprocessor
+from ad_oracle_backends import ResilientBackend, default_api_key, make_backend
+
+# USD per 1M (input, output) tokens; override with --price-in/--price-out
+PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4-turbo": (10.00, 30.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "standin": (0.0, 0.0),
+}
+
+SAMPLE_COPY = [
+    "Exciting news! Our new Heavy Duty Excavator X-2000 is now available. Best price, high quality. Contact us today!",
+    "20T excavator loading containers at our Qingdao factory right now. Busy day!",
+    "How to pick the right bucket size for your wheel loader (spec sheet inside).",
+    "Real engineer walkthrough: hydraulic system of the X-2000, 3 pain points solved.",
+]
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".heic")
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct * len(sorted_values) / 100.0))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def synthetic_corpus(count: int, directory: str, size: int = 200_000) -> List[str]:
+    """Writes `count` distinct JPEG-headed files so content hashes differ."""
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"creative_{i:05d}.jpg")
+        with open(path, "wb") as f:
+            f.write(b"\xff\xd8\xff\xe0" + os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def load_images(directory: str) -> List[str]:
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def run_level(predictor: AdContentPredictor, jobs: List, concurrency: int, timeout: Optional[float],
+              combined: bool, passes: int, price: Sequence[float]) -> Dict:
+    latencies = []
+    predictions = errors = 0
+    usage_before = dict(predictor.usage)
+    started = time.perf_counter()
+    for _ in range(passes):
+        timed = set()
+        for record in predictor.predict_many(jobs, max_workers=concurrency, timeout=timeout, combined=combined):
+            predictions += 1
+            errors += "error" in record["result"]
+            # A combined call yields one record per platform; its latency is one sample
+            if not combined or record["job"] not in timed:
+                timed.add(record["job"])
+                latencies.append(record["elapsed"])
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    prompt_tokens = predictor.usage["prompt_tokens"] - usage_before["prompt_tokens"]
+    completion_tokens = predictor.usage["completion_tokens"] - usage_before["completion_tokens"]
+    cost = (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+    report = {
+        "concurrency": concurrency,
+        "predictions": predictions,
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_per_s": round(predictions / wall, 3) if wall else 0.0,
+        "latency_s": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            "max": latencies[-1] if latencies else 0.0,
+        },
+        "model_calls": predictor.usage["calls"] - usage_before["calls"],
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": round(cost, 6),
+        "cost_per_1k_predictions_usd": round(cost / predictions * 1000, 4) if predictions else 0.0,
+        "cache": predictor.cache.stats() if predictor.cache else None,
+    }
+    if isinstance(predictor.backend, ResilientBackend):
+        report["resilience"] = predictor.backend.metrics()
+    report["validation"] = predictor.validator.stats()
+    return report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark AdOracle predictions")
+    parser.add_argument("--backend", default="openai", choices=["openai", "gemini", "http", "local"])
+    parser.add_argument("--base-url", help="base URL for http/gemini backends")
+    parser.add_argument("--model", help="model name override")
+    parser.add_argument("--api-key", help="default: $OPENAI_API_KEY for openai, $GEMINI_API_KEY for gemini")
+    parser.add_argument("--standin", action="store_true", help="start the local stand-in server and use it")
+    parser.add_argument("--latency", type=float, default=0.3, help="stand-in mean latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="stand-in injected error rate")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="stand-in malformed response rate")
+    parser.add_argument("--images", help="directory of creatives (default: synthetic corpus)")
+    parser.add_argument("--jobs", type=int, default=50, help="creatives to replay")
+    parser.add_argument("--platforms", default="TikTok,LinkedIn,WhatsApp,YouTube")
+    parser.add_argument("--combined", action="store_true", help="score all platforms in one call per creative")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated levels")
+    parser.add_argument("--passes", type=int, default=1, help="replays per level (>1 exercises the cache)")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--timeout", type=float, default=None, help="per-call timeout (s)")
+    parser.add_argument("--rpm", type=float, default=None, help="requests/minute quota")
+    parser.add_argument("--tpm", type=float, default=None, help="tokens/minute quota")
+    parser.add_argument("--price-in", type=float, help="USD per 1M prompt tokens")
+    parser.add_argument("--price-out", type=float, help="USD per 1M completion tokens")
+    parser.add_argument("--out", default="bench_output.json")
+    args = parser.parse_args(argv)
+    concurrency_levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    if not concurrency_levels:
+        parser.error("--concurrency needs at least one level")
+
+    server = None
+    backend_kwargs = {}
+    kind = args.backend
+    if args.standin:
+        from ad_oracle_server import StandInConfig, start_in_thread
+        server, base_url = start_in_thread(StandInConfig(latency=args.latency, jitter=args.latency / 3,
+                                                          error_rate=args.error_rate,
+                                                          invalid_rate=args.invalid_rate))
+        kind, backend_kwargs["base_url"] = "http", base_url
+    elif args.base_url:
+        backend_kwargs["base_url"] = args.base_url
+    if args.model:
+        backend_kwargs["model"] = args.model
+    api_key = args.api_key or default_api_key(kind)
+    if api_key:
+        backend_kwargs["api_key"] = api_key
+
+    probe = make_backend(kind, **backend_kwargs)
+    model = probe.model
+    probe.close()
+    price = PRICES.get(model, (0.0, 0.0))
+    price = (args.price_in if args.price_in is not None else price[0],
+             args.price_out if args.price_out is not None else price[1])
+
+    with tempfile.TemporaryDirectory(prefix="adoracle_bench_") as tmp:
+        images = load_images(args.images) if args.images else synthetic_corpus(args.jobs, tmp)
+        images = images[:args.jobs]
+        platforms = [p.strip() for p in args.platforms.split(",") if p.strip()]
+        jobs = [(path, SAMPLE_COPY[i % len(SAMPLE_COPY)], platforms) for i, path in enumerate(images)]
+
+        levels = []
+        for concurrency in concurrency_levels:
+            # Fresh predictor and cache per level so levels do not warm each other
+            backend = ResilientBackend(make_backend(kind, **backend_kwargs),
+                                       requests_per_minute=args.rpm, tokens_per_minute=args.tpm)
+            cache_path = None if args.no_cache else os.path.join(tmp, f"cache_{concurrency}.sqlite")
+            predictor = AdContentPredictor(cache_path=cache_path, backend=backend,
+                                           preprocessor=ImagePreprocessor())
+            report = run_level(predictor, jobs, concurrency, args.timeout, args.combined, args.passes, price)
+            report["images"] = predictor.preprocessor.stats()
+            levels.append(report)
+            lat = report["latency_s"]
+            print(f"c={concurrency:<3} {report['predictions']} preds in {report['wall_seconds']}s "
+                  f"({report['throughput_per_s']}/s)  p50={lat['p50']}s p95={lat['p95']}s p99={lat['p99']}s  "
+                  f"errors={report['errors']}  ${report['cost_per_1k_predictions_usd']}/1k")
+            backend.close()
+
+    if server:
+        server.shutdown()
+
+    result = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": git_revision(),
+        "backend": "standin" if args.standin else kind,
+        "model": model,
+        "combined": args.combined,
+        "jobs": len(jobs),
+        "platforms": platforms,
+        "passes": args.passes,
+        "levels": levels,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
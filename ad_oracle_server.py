@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Local stand-in model server for AdOracle.
+
+Speaks the OpenAI /v1/chat/completions and Gemini :generateContent request
+shapes, so the real HTTP request path (HTTPChatBackend / GeminiBackend, or the
+OpenAI SDK via base_url) can be load-tested offline. Latency, error rate and
+malformed-response rate are configurable; scores are a pure function of the
+request content, so repeated runs are comparable.
+
+    python ad_oracle_server.py --port 8765 --latency 0.8 --jitter 0.3 --error-rate 0.05
+"""
+
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+from ad_oracle import AdContentPredictor
+
+CTR_LEVELS = ("Low", "Medium", "High")
+IMAGE_TOKENS = 765  # rough cost of one high-detail image tile set
+
+
+class StandInConfig:
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, error_rate: float = 0.0,
+                 invalid_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.invalid_rate = invalid_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self) -> Tuple[float, Optional[int], bool]:
+        """(delay, injected error status or None, malformed) for one request, from the seeded generator."""
+        with self._lock:
+            delay = max(0.0, self._rng.gauss(self.latency, self.jitter)) if self.jitter else self.latency
+            status = self._rng.choice((429, 500, 503)) if self._rng.random() < self.error_rate else None
+            return delay, status, self._rng.random() < self.invalid_rate
+
+
+def find_platforms(system_prompt: str) -> List[str]:
+    """Platforms a prompt asks for: the combined key list, else the single rubric it embeds."""
+    m = re.search(r"one key per platform \(([^)]*)\)", system_prompt)
+    if m:
+        return re.findall(r'"([^"]+)"', m.group(1))
+    for platform, criteria in AdContentPredictor.PLATFORM_CRITERIA.items():
+        if criteria["core_dna"] in system_prompt:
+            return [platform]
+    return []
+
+
+def verdict(seed: bytes, platform: str, malformed: bool = False) -> Dict:
+    h = hashlib.sha256(seed + platform.encode("utf-8")).digest()
+    score = h[0] % 11
+    result = {
+        "platform_fit_score": score,
+        "predicted_ctr_level": CTR_LEVELS[min(score // 4, 2)],
+        "visual_analysis": f"Stand-in: visual fit for {platform} scored {score}/10.",
+        "copy_analysis": f"Stand-in: copy variant {h[1] % 7} for {platform}.",
+        "critical_flaw": "None" if score >= 5 else "Weak hook in the first frame.",
+        "optimization_suggestions": [f"Suggestion {i + 1} for {platform}." for i in range(3)],
+    }
+    if malformed:
+        # The failure modes seen from real models: wrong types, out of range, missing keys
+        result["platform_fit_score"] = str(score + 5)
+        del result["optimization_suggestions"]
+    return result
+
+
+def answer(system_prompt: str, user_parts: List[str], malformed: bool) -> Tuple[str, int, int]:
+    """Returns (content, prompt_tokens, completion_tokens) for a request."""
+    seed = hashlib.sha256("\0".join(user_parts).encode("utf-8")).digest()
+    platforms = find_platforms(system_prompt)
+    combined = "one key per platform" in system_prompt
+    if combined:
+        body = {p: verdict(seed, p, malformed) for p in platforms}
+    else:
+        body = verdict(seed, platforms[0] if platforms else "Unknown", malformed)
+    content = json.dumps(body)
+    text_chars = len(system_prompt) + sum(len(p) for p in user_parts if not p.startswith("data:"))
+    images = sum(1 for p in user_parts if p.startswith("data:"))
+    return content, text_chars // 4 + images * IMAGE_TOKENS, len(content) // 4
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real providers
+    config: StandInConfig = StandInConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: Dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gave up (timeout or cancellation); expected under load tests
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length))
+        except ValueError:
+            return self._send(400, {"error": {"message": "Invalid JSON body"}})
+
+        delay, status, malformed = self.config.draw()
+        time.sleep(delay)
+        if status:
+            return self._send(status, {"error": {"message": f"Stand-in injected error {status}"}})
+
+        if self.path.rstrip("/").endswith("/chat/completions"):
+            self._chat(request, malformed)
+        elif ":generateContent" in self.path:
+            self._gemini(request, malformed)
+        else:
+            self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def _chat(self, request: Dict, malformed: bool):
+        system_prompt, user_parts = "", []
+        for message in request.get("messages", []):
+            content = message.get("content")
+            items = [{"type": "text", "text": content}] if isinstance(content, str) else content or []
+            for item in items:
+                value = item.get("text") if item.get("type") == "text" else item.get("image_url", {}).get("url", "")
+                if message.get("role") == "system":
+                    system_prompt += value
+                else:
+                    user_parts.append(value)
+        content, prompt_tokens, completion_tokens = answer(system_prompt, user_parts, malformed)
+        self._send(200, {
+            "object": "chat.completion",
+            "model": request.get("model", "standin"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    def _gemini(self, request: Dict, malformed: bool):
+        system_prompt = "".join(p.get("text", "") for p in request.get("systemInstruction", {}).get("parts", []))
+        user_parts = []
+        for content in request.get("contents", []):
+            for part in content.get("parts", []):
+                if "text" in part:
+                    user_parts.append(part["text"])
+                elif "inline_data" in part:
+                    inline = part["inline_data"]
+                    user_parts.append(f"data:{inline.get('mime_type')};base64,{inline.get('data', '')}")
+        content, prompt_tokens, completion_tokens = answer(system_prompt, user_parts, malformed)
+        self._send(200, {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": content}]}}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": completion_tokens},
+        })
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, config: Optional[StandInConfig] = None) -> ThreadingHTTPServer:
+    handler = type("ConfiguredStandInHandler", (StandInHandler,), {"config": config or StandInConfig()})
+    # Async clients open hundreds of connections at once; the default backlog of 5 drops their SYNs
+    server_class = type("StandInServer", (ThreadingHTTPServer,), {"request_queue_size": 1024})
+    server = server_class((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(config: Optional[StandInConfig] = None, host: str = "127.0.0.1",
+                    port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Starts a stand-in on a free port; returns (server, base_url). Call server.shutdown() when done."""
+    server = serve(host, port, config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AdOracle local stand-in model server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean response delay (s)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="delay std deviation (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 429/5xx replies")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="fraction of malformed verdicts")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = StandInConfig(args.latency, args.jitter, args.error_rate, args.invalid_rate, args.seed)
+    server = serve(args.host, args.port, config)
+    print(f"AdOracle stand-in listening on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
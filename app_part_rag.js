@@ -183,6 +183,20 @@ function retrieveRelevantContext(query) {
     return topK;
 }
 
+// Optional retrieval service (python kb_search.py serve ...): BM25 over a prebuilt index.
+// Set window.KB_SERVICE_URL (e.g. 'http://127.0.0.1:8766') to use it; falls back to the local scan.
+async function retrieveContext(query) {
+    if (window.KB_SERVICE_URL) {
+        try {
+            const res = await fetch(`${window.KB_SERVICE_URL}/search?k=5&q=${encodeURIComponent(query)}`);
+            if (res.ok) return (await res.json()).results;
+        } catch (e) {
+            console.warn('KB service unavailable, using local search:', e);
+        }
+    }
+    return retrieveRelevantContext(query);
+}
+
 // 3. User Interaction
 // ------------------------------------------
 async function askKnowledgeBase() {
@@ -206,7 +220,7 @@ async function askKnowledgeBase() {
 
     try {
         // [Stage 1] Retrieval (Routing)
-        const relevantChunks = retrieveRelevantContext(query);
+        const relevantChunks = await retrieveContext(query);
         let contextText = '';
 
         const inspector = document.getElementById('kb-context-inspector');
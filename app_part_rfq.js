@@ -89,7 +89,7 @@ async function runRFQPipeline() {
         if (loadingText) loadingText.textContent = '📦 Step 2/4: 正在匹配产品信息...';
         if (loadingSteps) loadingSteps.innerHTML = '<span>[✅ Intent Decoded]</span><span class="animate-pulse">[Product Matching...]</span>';
 
-        const productMatch = matchProductFromKB(decoded.extracted_info?.products_requested || []);
+        const productMatch = await matchProductFromKB(decoded.extracted_info?.products_requested || []);
 
         // ===== Step 3: Auto Calculate Quote =====
         if (loadingText) loadingText.textContent = '💰 Step 3/4: 正在计算报价...';
@@ -157,7 +157,25 @@ async function runRFQPipeline() {
 // ========================================
 // Product Matching from Knowledge Base
 // ========================================
-function matchProductFromKB(keywords) {
+// Optional matching service (python kb_search.py serve --db kb.sqlite --products): a parsed spec index
+// with models, units and ranges. Used when window.KB_SERVICE_URL is set; falls back to the local scan.
+async function matchProductFromKB(keywords) {
+    if (window.KB_SERVICE_URL) {
+        try {
+            const res = await fetch(`${window.KB_SERVICE_URL}/match`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ products_requested: keywords, k: 3 })
+            });
+            if (res.ok) return await res.json();
+        } catch (e) {
+            console.warn('KB service unavailable, matching locally:', e);
+        }
+    }
+    return matchProductLocally(keywords);
+}
+
+function matchProductLocally(keywords) {
     const kbChunks = JSON.parse(localStorage.getItem('morgan_kb_chunks') || '[]');
     const kbFiles = JSON.parse(localStorage.getItem('morgan_kb_files') || '[]');
 
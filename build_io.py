@@ -0,0 +1,33 @@
+"""
+File helpers shared by the build scripts (prepare_deploy.py, page_fragments.py,
+rebuild_app_utf8.py), kept apart so the light ones need not import the deploy
+pipeline.
+"""
+
+import os
+import hashlib
+
+
+def file_digest(path, previous=None):
+    """sha256 of a source file; reuses the manifest entry when size and mtime are unchanged."""
+    st = os.stat(path)
+    if previous and previous.get('size') == st.st_size and previous.get('mtime_ns') == st.st_mtime_ns:
+        return previous
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': digest}
+
+
+def write_if_changed(path, data):
+    """Writes bytes only when the file is missing or different. Returns True if written."""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return True
@@ -1,29 +1,94 @@
 #!/usr/bin/env python3
 # Check JavaScript syntax for bracket matching
+#
+# Uses the js_lexer tokenizer, so brackets inside strings, template literals,
+# regexes and comments are ignored, and reports the line/column of the first
+# mismatch. Usage:
+#   python check_syntax.py                 # every JS file the deploy ships
+#   python check_syntax.py app_fixed.js a.js
+
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from js_lexer import tokenize, line_col, JSLexError, PUNCT
+from fix_encoding import read_source
+
+PAIRS = {')': '(', ']': '[', '}': '{'}
+# Below this many bytes a process pool costs more than it saves
+PARALLEL_MIN_BYTES = 256 * 1024
+
+
+def check_source(content, filename='<source>'):
+    """Returns None if brackets balance and every literal is terminated, else the first problem."""
+    stack = []  # (bracket, offset)
+    try:
+        for tok in tokenize(content):
+            if tok.type != PUNCT:
+                continue
+            if tok.value in '([{':
+                stack.append((tok.value, tok.start))
+            elif tok.value in PAIRS:
+                if not stack:
+                    return _problem(filename, content, tok.start, f"Unexpected '{tok.value}'")
+                opener, offset = stack.pop()
+                if opener != PAIRS[tok.value]:
+                    line, col = line_col(content, offset)
+                    return _problem(filename, content, tok.start,
+                                    f"'{tok.value}' does not match '{opener}' opened at {line}:{col}")
+    except JSLexError as e:
+        return _problem(filename, content, e.offset, str(e))
+    if stack:
+        opener, offset = stack[-1]
+        return _problem(filename, content, offset, f"'{opener}' is never closed")
+    return None
+
+
+def _problem(filename, content, offset, message):
+    line, col = line_col(content, offset)
+    return {'file': filename, 'line': line, 'col': col, 'message': message}
+
+
+def check_file(filename):
+    try:
+        content = read_source(filename)
+    except UnicodeDecodeError as e:
+        return {'file': filename, 'line': 0, 'col': 0, 'message': f"Undecodable text ({e.reason})"}
+    return check_source(content, filename)
+
+
+def check_files(filenames, workers=None):
+    """Checks files in one pass (in parallel for large inputs); returns the problems found, in input order."""
+    filenames = list(filenames)
+    total = sum(os.path.getsize(f) for f in filenames)
+    if workers == 1 or len(filenames) < 2 or total < PARALLEL_MIN_BYTES:
+        results = map(check_file, filenames)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(check_file, filenames))
+    return [r for r in results if r]
+
+
+def format_problem(problem):
+    return f"{problem['file']}:{problem['line']}:{problem['col']}: {problem['message']}"
+
 
 def analyze_file(filename):
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    open_braces = content.count('{')
-    close_braces = content.count('}')
-    open_parens = content.count('(')
-    close_parens = content.count(')')
-    open_brackets = content.count('[')
-    close_brackets = content.count(']')
-    
+    problem = check_file(filename)
     print(f"File: {filename}")
-    print(f"  Braces {{ }}: Open={open_braces}, Close={close_braces}, Diff={open_braces - close_braces}")
-    print(f"  Parens ( ): Open={open_parens}, Close={close_parens}, Diff={open_parens - close_parens}")
-    print(f"  Brackets [ ]: Open={open_brackets}, Close={close_brackets}, Diff={open_brackets - close_brackets}")
-    
-    return open_braces - close_braces
+    print(f"  {format_problem(problem)}" if problem else "  ✅ Brackets and literals are balanced")
+    return problem
+
+
+def default_files():
+    from prepare_deploy import collect_sources
+    return [path for name, path in collect_sources().items() if name.endswith('.js')]
+
 
 if __name__ == '__main__':
-    diff = analyze_file('app_fixed.js')
-    if diff > 0:
-        print(f"\n⚠️ Missing {diff} closing brace(s) '}}'")
-    elif diff < 0:
-        print(f"\n⚠️ Missing {-diff} opening brace(s) '{{'")
-    else:
-        print("\n✅ Braces are balanced")
+    files = sys.argv[1:] or default_files()
+    problems = check_files(files)
+    for problem in problems:
+        print(f"⚠️ {format_problem(problem)}")
+    print(f"\n{len(files) - len(problems)}/{len(files)} file(s) OK")
+    sys.exit(1 if problems else 0)
@@ -1,10 +1,12 @@
+# Superseded by js_index.py: `python js_index.py move app.js app_part_radar.js renderRadar`
 import os
 
+from fix_encoding import read_source
+
 path = 'C:/Users/33589/.gemini/antigravity/scratch/tds_marketing_os/app.js'
 
 try:
-    with open(path, 'rb') as f:
-        content = f.read().decode('utf-8', errors='ignore')
+    content = read_source(path)
 
     # Remove renderRadar
     # We will look for the signature start and the function end.
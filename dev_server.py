@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Local preview server for deploy/.
+
+Serves what prepare_deploy.py builds, the way Vercel will: the routes and
+cache headers come from the same vercel_config(), pre-compressed .br/.gz
+variants are picked by Accept-Encoding, and ETag / If-None-Match answer 304.
+Source changes (the files prepare_deploy collects) trigger an incremental
+rebuild, which only rewrites the outputs whose inputs changed. Each request
+logs transfer size, the uncompressed size and the time taken.
+
+    python dev_server.py                 # build, serve on :8000, watch
+    python dev_server.py --port 8090 --no-minify --no-watch
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import threading
+import mimetypes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+import prepare_deploy
+from minify import format_size
+
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))  # preferred first
+POLL_INTERVAL = 0.5
+
+mimetypes.add_type('application/javascript', '.js')
+mimetypes.add_type('application/json', '.map')
+
+
+def accepted_encodings(header: str):
+    """Codings from Accept-Encoding that are not refused with q=0."""
+    accepted = set()
+    for item in (header or '').split(','):
+        name, _, params = item.strip().partition(';')
+        q = re.search(r'q\s*=\s*([\d.]+)', params)
+        if name and not (q and float(q.group(1)) == 0):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class Router:
+    """Applies vercel_config() routes: header rules, then the filesystem, then rewrites."""
+
+    def __init__(self, root: str, config: Dict):
+        self.root = root
+        self.routes = [dict(route, pattern=re.compile('^%s$' % route['src'])) if 'src' in route else route
+                       for route in config.get('routes', [])]
+
+    def resolve(self, path: str) -> Tuple[Optional[str], Dict[str, str]]:
+        headers, filesystem_done = {}, False
+        for route in self.routes:
+            if route.get('handle') == 'filesystem':
+                found = self._file(path)
+                if found:
+                    return found, headers
+                filesystem_done = True
+                continue
+            if not route['pattern'].match(path):
+                continue
+            headers.update(route.get('headers', {}))
+            if 'dest' in route:
+                path = route['pattern'].sub(route['dest'], path)
+                if filesystem_done:
+                    return self._file(path), headers
+            if not route.get('continue'):
+                break
+        return self._file(path), headers
+
+    def _file(self, path: str) -> Optional[str]:
+        rel = unquote(path).lstrip('/') or 'index.html'
+        full = os.path.realpath(os.path.join(self.root, rel))
+        if not full.startswith(os.path.realpath(self.root) + os.sep) or not os.path.isfile(full):
+            return None
+        return full
+
+
+class DevHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    router: Router = None
+    build_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        started = time.perf_counter()
+        path = urlsplit(self.path).path
+        status, headers, f, coding, original = self._open(path)
+        if f is None:
+            data = b'Not found' if status == 404 else b''
+            return self._finish(started, path, status, data, headers, head, coding, original)
+        with f:  # an open file survives the next rebuild replacing or pruning it
+            data = f.read()
+        return self._finish(started, path, status, data, headers, head, coding, original)
+
+    def _open(self, path):
+        """(status, headers, open file or None, coding, original size), resolved between rebuilds."""
+        with self.build_lock:  # never serve a half-written rebuild; held only to resolve and open
+            full, headers = self.router.resolve(path)
+            if not full or full.endswith(('.gz', '.br')) or os.path.basename(full).startswith('.'):
+                return 404, {'Content-Type': 'text/plain'}, None, None, None
+            coding, variant = None, full
+            accepted = accepted_encodings(self.headers.get('Accept-Encoding'))
+            for name, suffix in ENCODINGS:
+                if name in accepted and os.path.isfile(full + suffix):
+                    coding, variant = name, full + suffix
+                    break
+            st = os.stat(variant)
+            etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}{"-" + coding if coding else ""}"'
+            headers.update({'Content-Type': mimetypes.guess_type(full)[0] or 'application/octet-stream',
+                            'ETag': etag, 'Vary': 'Accept-Encoding'})
+            if coding:
+                headers['Content-Encoding'] = coding
+            original = os.path.getsize(full)
+            if etag in [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]:
+                return 304, headers, None, coding, original
+            return 200, headers, open(variant, 'rb'), coding, original
+
+    def _finish(self, started, path, status, data, headers, head, coding=None, original=None):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        try:
+            if not head and status != 304:
+                self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        elapsed = (time.perf_counter() - started) * 1000
+        sent = 0 if head or status == 304 else len(data)
+        size = f"{format_size(sent)}/{format_size(original)}" if original else format_size(sent)
+        print(f"{self.command:<4} {path:<40} {status} {coding or 'identity':<8} {size:>16} {elapsed:7.1f} ms")
+
+
+def source_state():
+    """(size, mtime) of every source prepare_deploy collects; a change triggers a rebuild."""
+    state = {}
+    for name, path in prepare_deploy.collect_sources().items():
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        state[name] = (st.st_size, st.st_mtime_ns)
+    return state
+
+
+def watch(build, stop: threading.Event):
+    last = source_state()
+    while not stop.wait(POLL_INTERVAL):
+        current = source_state()
+        if current == last:
+            continue
+        changed = sorted(name for name in set(current) | set(last) if current.get(name) != last.get(name))
+        last = current
+        print(f"\nChanged: {', '.join(changed)}; rebuilding")
+        with DevHandler.build_lock:
+            if not build():
+                print("Build failed; still serving the previous deploy/")
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, root: str = None) -> ThreadingHTTPServer:
+    router = Router(root or prepare_deploy.DEPLOY_DIR, prepare_deploy.vercel_config())
+    handler = type("ConfiguredDevHandler", (DevHandler,), {"router": router})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve deploy/ locally with compression and live rebuilds")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--no-build", action="store_true", help="serve deploy/ as it is")
+    parser.add_argument("--no-watch", action="store_true", help="do not rebuild when sources change")
+    parser.add_argument("--no-minify", action="store_true", help="build readable, unminified assets")
+    args = parser.parse_args()
+
+    def build():
+        return prepare_deploy.prepare_deployment(minify=not args.no_minify)
+
+    if not args.no_build and not build() and not os.path.isdir(prepare_deploy.DEPLOY_DIR):
+        sys.exit(1)
+    stop = threading.Event()
+    if not args.no_build and not args.no_watch:
+        threading.Thread(target=watch, args=(build, stop), daemon=True).start()
+    server = serve(args.host, args.port)
+    print(f"\nServing {prepare_deploy.DEPLOY_DIR} on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        stop.set()
+        server.shutdown()
@@ -1,5 +1,7 @@
 import os
 
+from fix_encoding import decode_source
+
 path = 'C:/Users/33589/.gemini/antigravity/scratch/tds_marketing_os/app.js'
 
 try:
@@ -7,8 +9,8 @@ try:
         # Read as binary to avoid encoding errors initially
         content_bytes = f.read()
 
-    # Decode with error replacement to handle corruption
-    content = content_bytes.decode('utf-8', errors='replace')
+    # Strict decode in the file's real encoding; never drop or replace bytes
+    content = decode_source(content_bytes)[0]
 
     # 1. Truncate Standby Mode sections
     split_marker = '// 13. Exhibition Standby Mode'
@@ -1,26 +1,176 @@
+#!/usr/bin/env python3
+"""
+Normalizes every text source in the tree to UTF-8 without BOM.
+
+Each file is read once: the encoding comes from its BOM, or from a bounded
+scan of the first bytes for UTF-16's interleaved NULs, and is confirmed by a
+strict decode (falling back to GB18030, then cp1252). Files are rewritten
+only when their bytes actually change. Mojibake - U+FFFD, UTF-8 read as
+cp1252, NUL-interleaved UTF-16 pasted into a UTF-8 file, and string
+literals whose characters were lost to '?' (the corrupted showToast
+messages) - is reported with line and column; files with NUL data are
+left alone because there is no safe automatic repair.
+
+    python fix_encoding.py               # whole tree
+    python fix_encoding.py --dry-run     # report only
+    python fix_encoding.py app.js index.html
+"""
+
 import os
+import re
+import sys
+import codecs
+import argparse
+
+TEXT_EXTENSIONS = ('.js', '.html', '.css', '.py', '.md', '.json', '.txt', '.bat', '.log')
+SKIP_DIRS = {'.git', 'deploy', 'node_modules', '__pycache__'}
+
+# utf-32 first: its LE BOM starts with the utf-16 LE BOM
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32-le'),
+    (codecs.BOM_UTF32_BE, 'utf-32-be'),
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+)
+SCAN_BYTES = 64 * 1024
+FALLBACKS = ('gb18030', 'cp1252', 'latin-1')
+
+# Characters cp1252 produces for bytes 0x80-0xFF: runs of them are UTF-8 read with the wrong codec
+_CP1252_HIGH = ''.join(sorted({bytes([b]).decode('cp1252', errors='ignore') for b in range(0x80, 0x100)} - {''}))
+_CP1252_RUN_RE = re.compile('[%s]{2,}' % re.escape(_CP1252_HIGH))
+_STRING_RE = re.compile(r"""'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*\"""")
+
 
-def fix_encoding():
-    file_path = 'app.js'
+def detect_encoding(data):
+    """(encoding, BOM length) from the BOM, or a scan of the first SCAN_BYTES for UTF-16 NUL patterns."""
+    for bom, encoding in BOMS:
+        if data.startswith(bom):
+            return encoding, len(bom)
+    sample = data[:SCAN_BYTES]
+    even_nuls = sample[0::2].count(0)
+    odd_nuls = sample[1::2].count(0)
+    # ASCII-heavy UTF-16 has a NUL in nearly every other byte
+    if len(sample) >= 4 and max(even_nuls, odd_nuls) > len(sample) // 4:
+        return ('utf-16-le' if odd_nuls > even_nuls else 'utf-16-be'), 0
+    return 'utf-8', 0
+
+
+def decode_source(data):
+    """Returns (text, encoding, had_bom). The decode is strict; undecodable UTF-8 falls back in FALLBACKS order."""
+    encoding, bom_length = detect_encoding(data)
+    body = data[bom_length:]
     try:
-        # Try reading as UTF-16 first (common result of PowerShell > redirection)
-        with open(file_path, 'r', encoding='utf-16') as f:
-            content = f.read()
+        return body.decode(encoding), encoding, bom_length > 0
     except UnicodeDecodeError:
+        if bom_length:
+            raise
+    for encoding in FALLBACKS:
         try:
-            # Try UTF-8
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-        except:
-             # Fallback to binary and simple decode or utf-16-le
-             with open(file_path, 'r', encoding='utf-16-le') as f:
-                content = f.read()
-
-    # Write back as clean UTF-8
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print(f"Successfully converted {file_path} to UTF-8")
+            return body.decode(encoding), encoding, False
+        except UnicodeDecodeError:
+            continue
+
+
+def read_source(path):
+    """Text of a source file in whatever encoding it was saved in."""
+    with open(path, 'rb') as f:
+        return decode_source(f.read())[0]
+
+
+def _position(text, offset):
+    line = text.count('\n', 0, offset) + 1
+    return line, offset - (text.rfind('\n', 0, offset) + 1) + 1
+
+
+def find_mojibake(text):
+    """Suspicious spans as dicts: line, col, kind, excerpt and (when reversible) suggestion."""
+    spans = []
+
+    def add(offset, kind, excerpt, suggestion=None):
+        line, col = _position(text, offset)
+        spans.append({'line': line, 'col': col, 'kind': kind, 'excerpt': excerpt.replace('\x00', '')[:60],
+                      'suggestion': suggestion})
+
+    last_line = None
+    for m in re.finditer('\ufffd+', text):
+        line = text.count('\n', 0, m.start())
+        if line != last_line:
+            add(m.start(), 'replacement-char', text[max(0, m.start() - 20):m.end() + 20])
+        last_line = line
+    for m in re.finditer(r'\x00', text):
+        add(m.start(), 'nul', 'NUL-interleaved data: UTF-16 text inside a UTF-8 file')
+        break  # one report per file is enough; the whole tail is affected
+    for m in _CP1252_RUN_RE.finditer(text):
+        try:
+            fixed = m.group(0).encode('cp1252').decode('utf-8')
+        except UnicodeError:
+            continue
+        add(m.start(), 'utf8-as-cp1252', m.group(0), fixed)
+    for m in _STRING_RE.finditer(text):
+        literal = m.group(0)[1:-1]
+        letters = sum(ch.isalnum() for ch in literal)
+        # Characters replaced by '?' leave strings of spaces, '?' and stray punctuation
+        if '?' in literal and '  ' in literal and letters < len(literal) * 0.4:
+            add(m.start(), 'lost-characters', m.group(0))
+    spans.sort(key=lambda s: (s['line'], s['col']))
+    return spans
+
+
+def normalize_file(path, keep_bom=False, dry_run=False):
+    """Decodes once, reports mojibake and rewrites as UTF-8 only if the bytes change."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    text, encoding, had_bom = decode_source(data)
+    spans = find_mojibake(text)
+    result = {'path': path, 'encoding': encoding, 'bom': had_bom, 'mojibake': spans, 'rewritten': False}
+    if any(s['kind'] == 'nul' for s in spans):
+        result['skipped'] = 'mixed encodings'
+        return result
+    output = (codecs.BOM_UTF8 if keep_bom and had_bom else b'') + text.encode('utf-8')
+    if output != data:
+        result['rewritten'] = True
+        if not dry_run:
+            tmp = path + '.tmp'
+            with open(tmp, 'wb') as f:
+                f.write(output)
+            os.replace(tmp, path)
+    return result
+
+
+def iter_sources(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for name in sorted(filenames):
+            if name.lower().endswith(TEXT_EXTENSIONS):
+                yield os.path.join(dirpath, name)
+
+
+def fix_encoding(paths=None, keep_bom=False, dry_run=False):
+    paths = paths or list(iter_sources(os.getcwd()))
+    results = [normalize_file(path, keep_bom, dry_run) for path in paths]
+    for result in results:
+        name = os.path.relpath(result['path'])
+        if result['rewritten']:
+            bom = ' with BOM' if result['bom'] else ''
+            print(f"{'Would convert' if dry_run else 'Converted'} {name}: {result['encoding']}{bom} -> utf-8")
+        elif result.get('skipped'):
+            print(f"Skipped {name}: {result['skipped']}")
+        for span in result['mojibake']:
+            hint = f" -> {span['suggestion']!r}" if span['suggestion'] else ''
+            print(f"  {name}:{span['line']}:{span['col']}: {span['kind']}: {span['excerpt']!r}{hint}")
+    changed = sum(r['rewritten'] for r in results)
+    flagged = sum(bool(r['mojibake']) for r in results)
+    print(f"\n{len(results)} file(s) scanned, {changed} {'to convert' if dry_run else 'converted'}, "
+          f"{flagged} with suspected mojibake")
+    return results
+
 
 if __name__ == '__main__':
-    fix_encoding()
+    parser = argparse.ArgumentParser(description="Normalize source files to UTF-8 and report mojibake")
+    parser.add_argument('paths', nargs='*', help="files to process (default: every text file in the tree)")
+    parser.add_argument('--dry-run', action='store_true', help="report without rewriting")
+    parser.add_argument('--keep-bom', action='store_true', help="keep an existing UTF-8 BOM")
+    args = parser.parse_args()
+    results = fix_encoding(args.paths, args.keep_bom, args.dry_run)
+    sys.exit(1 if any(r['mojibake'] for r in results) else 0)
@@ -2,6 +2,7 @@
 """
 Fix app_fixed.js structure by extracting nested functions to global scope.
 The issue: Many functions are nested inside updateDashboard() -> if (expos.length > 0) block.
+Superseded by js_index.py (`list --nested`, `move`).
 """
 
 import re
@@ -3,103 +3,20 @@
 
 import re
 
+from fix_encoding import read_source
+from page_fragments import PageTemplate
+
 # 读取v2文件
-with open('index_v2.html', 'r', encoding='utf-8') as f:
-    content = f.read()
+content = read_source('index_v2.html')
 
 # 1. 更新版本号
 content = content.replace('v18.0 数据联动版', 'v18.1 智能知识库版')
 
-# 2. 替换产品知识库HTML部分（194-211行区域）
-old_product_db = r'<!-- Product DB -->.*?</div>\s*</div>\s*</div>'
-new_product_db = '''<!-- Product DB - Smart Knowledge Base -->
-            <div id="product-db" class="tab-content">
-                <h2 class="text-3xl font-black mb-2" style="color: var(--text-primary);">产品知识库 🧠</h2>
-                <p class="text-sm mb-6" style="color: var(--text-secondary);">智能文档系统 · 上传学习检索</p>
-                
-                <!-- 主功能区 -->
-                <div class="grid grid-cols-12 gap-6 mb-6">
-                    <!-- 文件上传 -->
-                    <div class="col-span-4">
-                        <div class="panel">
-                            <h3 class="text-lg font-bold mb-4" style="color: var(--text-primary);">📎 上传文档</h3>
-                            <div id="drop-zone" class="border-2 border-dashed rounded-lg p-8 text-center cursor-pointer transition-all hover:border-blue-500 hover:bg-blue-500 hover:bg-opacity-5" 
-                                 style="border-color: var(--border-primary);" 
-                                 onclick="document.getElementById('file-upload').click()">
-                                <div class="text-5xl mb-3">📂</div>
-                                <p class="font-bold mb-2" style="color: var(--text-primary);">拖拽或点击上传</p>
-                                <p class="text-xs" style="color: var(--text-secondary);">支持: TXT, MD, JSON</p>
-                            </div>
-                            <input type="file" id="file-upload" class="hidden" accept=".txt,.md,.json" onchange="handleKnowledgeFileUpload(event)" multiple>
-                            
-                            <!-- 统计 -->
-                            <div class="mt-4 p-4 rounded" style="background: var(--bg-secondary); border: 1px solid var(--border-primary);">
-                                <div class="text-xs font-bold mb-3 text-blue-400 uppercase">知识库统计</div>
-                                <div class="grid grid-cols-2 gap-3 text-sm">
-                                    <div class="text-center p-2 rounded" style="background: var(--bg-panel);">
-                                        <div class="text-2xl font-black text-blue-400" id="doc-count">0</div>
-                                        <div class="text-xs mt-1" style="color: var(--text-secondary);">文档</div>
-                                    </div>
-                                    <div class="text-center p-2 rounded" style="background: var(--bg-panel);">
-                                        <div class="text-2xl font-black text-green-400" id="total-chars">0</div>
-                                        <div class="text-xs mt-1" style="color: var(--text-secondary);">字符</div>
-                                    </div>
-                                </div>
-                            </div>
-                        </div>
-                    </div>
-            
-                    <!-- 智能检索 -->
-                    <div class="col-span-4">
-                        <div class="panel">
-                            <h3 class="text-lg font-bold mb-4" style="color: var(--text-primary);">🔍 智能检索</h3>
-                            <input type="text" id="search-input" placeholder="搜索关键词..." class="input-box mb-4" oninput="searchKnowledge(this.value)">
-                            <div id="search-results" style="max-height: 350px; overflow-y: auto;">
-                                <div class="text-center py-16 text-sm" style="color: var(--text-secondary);">
-                                    <div class="text-4xl mb-2">🔎</div>
-                                    输入关键词开始搜索
-                                </div>
-                            </div>
-                        </div>
-                    </div>
-            
-                    <!-- 文档库 -->
-                    <div class="col-span-4">
-                        <div class="panel">
-                            <h3 class="text-lg font-bold mb-4" style="color: var(--text-primary);">📚 文档库</h3>
-                            <div id="knowledge-docs" style="max-height: 350px; overflow-y: auto;">
-                                <div class="text-center py-16 text-sm" style="color: var(--text-secondary);">
-                                    <div class="text-4xl mb-2">📄</div>
-                                    暂无文档
-                                </div>
-                            </div>
-                        </div>
-                    </div>
-                </div>
-            
-                <!-- 快速录入产品（保留原功能） -->
-                <div class="panel">
-                    <div class="flex justify-between items-center mb-4">
-                        <h3 class="text-lg font-bold" style="color: var(--text-primary);">📋 快速录入产品</h3>
-                        <button onclick="toggleProductForm()" class="text-sm px-3 py-1 rounded hover:bg-blue-500 hover:bg-opacity-20 transition" style="color: var(--text-secondary);">
-                            <span id="form-toggle-icon">▼</span> 展开/折叠
-                        </button>
-                    </div>
-                    <div id="product-form-container" class="hidden">
-                        <div class="grid grid-cols-12 gap-4 mb-4">
-                            <input type="text" id="db-name" placeholder="产品型号" class="input-box col-span-3">
-                            <input type="text" id="db-pain" placeholder="核心痛点" class="input-box col-span-3">
-                            <input type="text" id="db-feat" placeholder="详细参数" class="input-box col-span-4">
-                            <button onclick="saveProduct()" class="btn-primary col-span-2">💾 存入</button>
-                        </div>
-                    </div>
-                    <div id="product-list" class="grid grid-cols-3 gap-4 min-h-[100px]">
-                        <div class="col-span-3 text-center py-10 text-sm" style="color: var(--text-secondary);">暂无产品数据</div>
-                    </div>
-                </div>
-            </div>'''
-
-content = re.sub(old_product_db, new_product_db, content, flags=re.DOTALL)
+# 2. 替换产品知识库HTML部分（片段文件 fragments/v18.1/product-db.html，按 tab 的 id 定位）
+content = content.replace('<!-- Product DB -->', '<!-- Product DB - Smart Knowledge Base -->')
+page = PageTemplate(content)
+page.set_fragment('product-db', read_source('fragments/v18.1/product-db.html'))
+content, _ = page.render()
 
 # 3. 添加知识库变量声明
 content = content.replace(
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Duplicate-definition and dead-code report for the app JS files.
+
+Every top-level function (via js_index) is fingerprinted by its token stream,
+so copies that differ only in whitespace or comments hash the same. The
+report lists:
+
+  duplicates    same name, identical body, in more than one file
+  conflicts     same name, different bodies (which one wins depends on load order)
+  clones        identical bodies under different names
+  shadowed      earlier declarations in a file that a later one of the same
+                name replaces before any code runs (function hoisting)
+  unreferenced  functions no other code, string or HTML mentions
+
+prepare_deploy uses dead_functions() to prune the last two from what it ships.
+
+    python js_audit.py                          # every app*.js variant + index.html
+    python js_audit.py app_v18_90.js app_part_*.js --html index.html --json
+"""
+
+import re
+import sys
+import glob
+import json
+import hashlib
+import argparse
+from collections import Counter
+from typing import Dict, List
+
+from js_lexer import tokenize, significant, JSLexError, IDENT, STRING, TEMPLATE, REGEX
+from js_index import build_index
+from fix_encoding import read_source
+
+_WORD_RE = re.compile(r'[A-Za-z_$][\w$]*')
+
+
+class Definition:
+    __slots__ = ('name', 'file', 'line', 'start', 'end', 'fingerprint', 'body_fingerprint')
+
+    def __init__(self, name, file, line, start, end, fingerprint, body_fingerprint):
+        self.name = name
+        self.file = file
+        self.line = line
+        self.start = start
+        self.end = end
+        self.fingerprint = fingerprint            # whole declaration
+        self.body_fingerprint = body_fingerprint  # everything after the name, for clones
+
+    @property
+    def size(self):
+        return self.end - self.start
+
+    def location(self):
+        return f"{self.file}:{self.line}"
+
+
+def _digest(values) -> str:
+    return hashlib.sha256('\0'.join(values).encode('utf-8')).hexdigest()[:16]
+
+
+def collect_definitions(js_texts: Dict[str, str]):
+    """Top-level function declarations of every file; returns (definitions, {file: error})."""
+    definitions, errors = [], {}
+    for file, text in js_texts.items():
+        try:
+            index = build_index(text)
+        except ValueError as e:
+            errors[file] = str(e)
+            continue
+        for block in index.blocks:
+            if block.kind != 'function' or not block.name:
+                continue
+            values = [t.value for t in significant(tokenize(text[block.code_start:block.end]))]
+            name_at = values.index(block.name)
+            definitions.append(Definition(block.name, file, block.line, block.start, block.end,
+                                          _digest(values), _digest(values[name_at + 1:])))
+    return definitions, errors
+
+
+def word_counts(text: str, html: bool = False) -> Counter:
+    """Identifier occurrences, counting words inside strings and templates (onclick="fn()", window['fn'])."""
+    if html:
+        return Counter(_WORD_RE.findall(text))
+    counts = Counter()
+    try:
+        for tok in significant(tokenize(text)):
+            if tok.type == IDENT:
+                counts[tok.value] += 1
+            elif tok.type in (STRING, TEMPLATE, REGEX):
+                counts.update(_WORD_RE.findall(tok.value))
+    except JSLexError:
+        counts.update(_WORD_RE.findall(text))  # unknown structure: every word may be a reference
+    return counts
+
+
+def analyze(js_texts: Dict[str, str], html_texts: Dict[str, str] = None) -> Dict:
+    definitions, errors = collect_definitions(js_texts)
+    by_name: Dict[str, List[Definition]] = {}
+    for d in definitions:
+        by_name.setdefault(d.name, []).append(d)
+
+    duplicates, conflicts, shadowed = [], [], []
+    for name, defs in sorted(by_name.items()):
+        for file in {d.file for d in defs}:
+            in_file = [d for d in defs if d.file == file]
+            shadowed.extend(in_file[:-1])
+        if len({d.file for d in defs}) < 2:
+            continue
+        variants = {}
+        for d in defs:
+            variants.setdefault(d.fingerprint, []).append(d)
+        if len(variants) == 1:
+            duplicates.append({'name': name, 'locations': [d.location() for d in defs],
+                               'bytes_repeated': sum(d.size for d in defs[1:])})
+        else:
+            conflicts.append({'name': name, 'variants': [[d.location() for d in group]
+                                                         for group in variants.values()]})
+
+    clones = {}
+    for d in definitions:
+        clones.setdefault(d.body_fingerprint, []).append(d)
+    clones = [{'names': sorted({d.name for d in group}), 'locations': [d.location() for d in group]}
+              for group in clones.values() if len({d.name for d in group}) > 1]
+
+    return {
+        'files': len(js_texts),
+        'functions': len(definitions),
+        'errors': errors,
+        'duplicates': duplicates,
+        'conflicts': conflicts,
+        'clones': clones,
+        'shadowed': [{'name': d.name, 'location': d.location(), 'bytes': d.size} for d in shadowed],
+        'unreferenced': [{'name': d.name, 'location': d.location(), 'bytes': d.size}
+                         for d in _unreferenced(js_texts, html_texts or {}, definitions)],
+    }
+
+
+def _unreferenced(js_texts, html_texts, definitions) -> List[Definition]:
+    total = Counter()
+    for text in js_texts.values():
+        total.update(word_counts(text))
+    for text in html_texts.values():
+        total.update(word_counts(text, html=True))
+    # Mentions inside a function's own declarations (its name, recursion) do not keep it alive
+    own = Counter()
+    for d in definitions:
+        own[d.name] += word_counts(js_texts[d.file][d.start:d.end])[d.name]
+    return [d for d in definitions if total[d.name] - own[d.name] <= 0]
+
+
+def dead_functions(js_texts: Dict[str, str], html_texts: Dict[str, str], keep=()) -> Dict[str, List[Definition]]:
+    """Per file, the declarations that can be dropped: shadowed in their own file, or never referenced."""
+    definitions, _ = collect_definitions(js_texts)
+    dead = {}
+    seen = {}
+    for d in definitions:
+        later = seen.get((d.file, d.name))
+        if later is not None:
+            dead.setdefault(d.file, []).append(later)  # the previous one is shadowed by this one
+        seen[(d.file, d.name)] = d
+    for d in _unreferenced(js_texts, html_texts, definitions):
+        if d.name not in keep and d not in dead.get(d.file, []):
+            dead.setdefault(d.file, []).append(d)
+    return {file: sorted(defs, key=lambda d: d.start) for file, defs in dead.items()}
+
+
+def prune_source(text: str, definitions: List[Definition]) -> str:
+    """Cuts the given declarations out of text (offsets from collect_definitions on the same text)."""
+    out, pos = [], 0
+    for d in sorted(definitions, key=lambda d: d.start):
+        out.append(text[pos:d.start])
+        pos = d.end
+    out.append(text[pos:])
+    return ''.join(out)
+
+
+def print_report(report: Dict):
+    print(f"{report['functions']} top-level functions in {report['files']} file(s)")
+    for file, error in report['errors'].items():
+        print(f"  skipped {file}: {error}")
+    sections = (
+        ('Duplicates', report['duplicates'], lambda r: f"{r['name']}: {', '.join(r['locations'])}"
+                                                       f" ({r['bytes_repeated']} bytes repeated)"),
+        ('Conflicting definitions', report['conflicts'],
+         lambda r: f"{r['name']}: " + ' vs '.join('/'.join(v) for v in r['variants'])),
+        ('Clones under different names', report['clones'],
+         lambda r: f"{', '.join(r['names'])}: {', '.join(r['locations'])}"),
+        ('Shadowed by a later declaration in the same file', report['shadowed'],
+         lambda r: f"{r['name']} at {r['location']} ({r['bytes']} bytes)"),
+        ('Unreferenced', report['unreferenced'], lambda r: f"{r['name']} at {r['location']} ({r['bytes']} bytes)"),
+    )
+    for title, rows, fmt in sections:
+        print(f"\n{title}: {len(rows)}")
+        for row in rows:
+            print(f"  {fmt(row)}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Report duplicate, conflicting and dead JS functions")
+    parser.add_argument('files', nargs='*', help="JS files (default: every app*.js)")
+    parser.add_argument('--html', action='append', default=None,
+                        help="pages whose markup and inline scripts count as references (default: index.html)")
+    parser.add_argument('--json', action='store_true', help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    files = args.files or sorted(glob.glob('app*.js'))
+    pages = args.html if args.html is not None else ['index.html']
+    report = analyze({f: read_source(f) for f in files}, {p: read_source(p) for p in pages})
+    if args.json:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+    else:
+        print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Top-level function/block index for the app JS files, and a splitter built on it.
+
+One pass over the js_lexer tokens records every top-level statement (with
+the comment block directly above it) as a Block with offsets and line
+numbers, plus any function declared inside another block - the kind of
+accidental nesting restructure_app.py / fix_structure.py patched by hand.
+Moving code then slices by offsets instead of searching for marker
+comments, and refuses any edit whose result no longer balances.
+
+    python js_index.py list app_v18_90.js
+    python js_index.py list app_fixed.js --nested
+    python js_index.py extract app.js renderRadar runCalc > snippet.js
+    python js_index.py move app.js app_part_radar.js renderRadar --dry-run
+"""
+
+import os
+import re
+import sys
+import argparse
+from typing import Dict, List, Optional
+
+from js_lexer import tokenize, significant, line_col, JSLexError, COMMENT, NL, IDENT, NUMBER, STRING, TEMPLATE, REGEX, PUNCT
+from check_syntax import check_source, format_problem
+from fix_encoding import read_source
+
+# A newline before an identifier ends the statement, unless the previous token needs an operand
+_CONTINUES_AFTER = frozenset(('const', 'let', 'var', 'function', 'class', 'new', 'typeof', 'return', 'throw',
+                              'await', 'yield', 'async', 'else', 'do', 'in', 'of', 'instanceof', 'delete',
+                              'void', 'case', 'extends', 'export', 'import', 'static'))
+_CONTINUES_BEFORE = frozenset(('else', 'catch', 'finally', 'while', 'in', 'instanceof', 'of'))
+
+
+class Block:
+    __slots__ = ('name', 'kind', 'start', 'code_start', 'end', 'line')
+
+    def __init__(self, name, kind, start, code_start, end, line):
+        self.name = name              # declared name, dotted target for `a.b = ...`, or None
+        self.kind = kind              # function, class, const, let, var, assign or statement
+        self.start = start            # includes the comment block directly above
+        self.code_start = code_start
+        self.end = end
+        self.line = line
+
+    def __repr__(self):
+        return f"Block({self.kind} {self.name} @{self.line})"
+
+
+class NestedFunction:
+    __slots__ = ('name', 'parent', 'start', 'line', 'depth')
+
+    def __init__(self, name, parent, start, line, depth):
+        self.name, self.parent, self.start, self.line, self.depth = name, parent, start, line, depth
+
+
+class JSIndex:
+    def __init__(self, src: str, blocks: List[Block], nested: List[NestedFunction]):
+        self.src = src
+        self.blocks = blocks
+        self.nested = nested
+        self.by_name: Dict[str, List[Block]] = {}
+        for block in blocks:
+            if block.name:
+                self.by_name.setdefault(block.name, []).append(block)
+
+    def find(self, name: str, occurrence: Optional[str] = None) -> List[Block]:
+        """Blocks declaring `name`; with several declarations, occurrence must be 'all', 'first' or 'last'."""
+        found = self.by_name.get(name, [])
+        if not found:
+            nested = [n for n in self.nested if n.name == name]
+            where = f" (only nested inside {nested[0].parent}, line {nested[0].line})" if nested else ''
+            raise ValueError(f"{name} is not a top-level declaration{where}")
+        if len(found) > 1 and occurrence not in ('all', 'first', 'last'):
+            lines = ', '.join(str(b.line) for b in found)
+            raise ValueError(f"{name} is declared {len(found)} times (lines {lines}); choose first, last or all")
+        return found[-1:] if occurrence == 'last' else found[:1] if occurrence == 'first' else found
+
+    def text(self, block: Block) -> str:
+        return self.src[block.start:block.end]
+
+
+def _starts_statement(prev, tok, newline: bool, closed: bool) -> bool:
+    if closed or (prev.type == PUNCT and prev.value == ';'):
+        return True
+    if prev.type == PUNCT and prev.value == '}':
+        # `} foo()` can only be a new statement; `} else`, `}.x`, `})` continue
+        return tok.type == IDENT and tok.value not in _CONTINUES_BEFORE
+    if not newline:
+        return False
+    ends_operand = (prev.type in (NUMBER, STRING, TEMPLATE, REGEX)
+                    or (prev.type == IDENT and prev.value not in _CONTINUES_AFTER)
+                    or (prev.type == PUNCT and prev.value in (')', ']', '++', '--')))
+    starts_operand = ((tok.type == IDENT and tok.value not in _CONTINUES_BEFORE)
+                      or tok.type in (NUMBER, STRING))
+    return ends_operand and starts_operand  # automatic semicolon insertion
+
+
+def _leading_start(src: str, prev_end: int, start: int) -> int:
+    """Start of the comments directly above `start` (no blank line in between)."""
+    lead = start
+    gap = list(tokenize(src[prev_end:start]))
+    for tok in reversed(gap):
+        if tok.type == COMMENT:
+            lead = prev_end + tok.start
+        elif tok.type == NL and tok.value.count('\n') > 1:
+            break
+    # Keep the indentation of the first line with the block
+    return src.rfind('\n', prev_end, lead) + 1 if src.rfind('\n', prev_end, lead) >= 0 else lead
+
+
+def _describe(sig, j):
+    """(kind, name) of the statement starting at significant token j."""
+    t0 = sig[j]
+    nxt = lambda k: sig[j + k] if j + k < len(sig) else None
+    if t0.type == IDENT:
+        k = 1 if t0.value == 'async' and nxt(1) and nxt(1).value == 'function' else 0
+        if sig[j + k].value == 'function':
+            name = nxt(k + 1)
+            if name is not None and name.value == '*':
+                name = nxt(k + 2)
+            return 'function', name.value if name is not None and name.type == IDENT else None
+        if t0.value == 'class':
+            return 'class', nxt(1).value if nxt(1) is not None and nxt(1).type == IDENT else None
+        if t0.value in ('const', 'let', 'var'):
+            return t0.value, nxt(1).value if nxt(1) is not None and nxt(1).type == IDENT else None
+        parts, k = [t0.value], 1
+        while nxt(k) is not None and nxt(k).value == '.' and nxt(k + 1) is not None and nxt(k + 1).type == IDENT:
+            parts.append(nxt(k + 1).value)
+            k += 2
+        if nxt(k) is not None and nxt(k).value == '=':
+            return 'assign', '.'.join(parts)
+    return 'statement', None
+
+
+def build_index(src: str) -> JSIndex:
+    """Indexes top-level statements in one pass. Raises ValueError on unbalanced input."""
+    try:
+        sig = list(significant(tokenize(src)))
+    except JSLexError as e:
+        line, col = line_col(src, e.offset)
+        raise ValueError(f"{e} at {line}:{col}")
+    blocks, nested = [], []
+    depth = 0
+    current = None          # [kind, name, start, code_start, line]
+    body_depth = None       # depth of a function/class body still open
+    after_params = False    # function declaration: params closed, body next
+    closed = False          # the current declaration's body has closed
+    prev = None
+    line = 1
+    for j, tok in enumerate(sig):
+        gap_start = prev.end if prev is not None else 0
+        gap = src[gap_start:tok.start]
+        line += src.count('\n', gap_start, tok.start)
+        if depth == 0 and (prev is None or _starts_statement(prev, tok, '\n' in gap, closed)):
+            if current is not None:
+                blocks.append(Block(current[1], current[0], current[2], current[3], prev.end, current[4]))
+            kind, name = _describe(sig, j)
+            current = [kind, name, _leading_start(src, gap_start, tok.start), tok.start, line]
+            after_params = closed = False
+            body_depth = None
+        if tok.type == PUNCT:
+            if tok.value in '([{':
+                if tok.value == '{' and depth == 0 and body_depth is None and (
+                        current[0] == 'class' or (current[0] == 'function' and after_params)):
+                    body_depth = 0
+                depth += 1
+            elif tok.value in ')]}':
+                depth -= 1
+                if depth < 0:
+                    raise ValueError(f"Unbalanced '{tok.value}' at line {line}")
+                if depth == 0 and tok.value == ')' and current[0] == 'function':
+                    after_params = True
+                if depth == 0 and tok.value == '}' and body_depth == 0:
+                    closed = True
+        elif tok.type == IDENT and tok.value == 'function' and depth > 0:
+            name = sig[j + 1] if j + 1 < len(sig) else None
+            if name is not None and name.type == IDENT:
+                nested.append(NestedFunction(name.value, current[1] or f"statement at line {current[4]}",
+                                             tok.start, line, depth))
+        # a token's own newlines (template literals) count for the next one
+        line += tok.value.count('\n')
+        prev = tok
+    if depth != 0:
+        raise ValueError(f"{depth} unclosed bracket(s) at end of input")
+    if current is not None:
+        blocks.append(Block(current[1], current[0], current[2], current[3], prev.end, current[4]))
+    return JSIndex(src, blocks, nested)
+
+
+def extract(index: JSIndex, names: List[str], occurrence: Optional[str] = None,
+            placeholder: Optional[str] = None):
+    """
+    Cuts the named blocks out in one pass. Returns (remaining source,
+    extracted source); refuses (ValueError) if either would not balance.
+    """
+    chosen = sorted({id(b): b for name in names for b in index.find(name, occurrence)}.values(),
+                    key=lambda b: b.start)
+    remaining, pieces, pos = [], [], 0
+    for block in chosen:
+        remaining.append(index.src[pos:block.start])
+        if placeholder:
+            remaining.append(placeholder.format(name=block.name))
+            if not re.match(r'[ \t]*(?:\r?\n|$)', index.src[block.end:block.end + 80]):
+                remaining.append('\n')  # code followed on the same line; keep it out of the comment
+        pieces.append(index.text(block))
+        pos = block.end
+    remaining.append(index.src[pos:])
+    rest, moved = ''.join(remaining), '\n\n'.join(pieces) + '\n'
+    for label, text in (('remaining source', rest), ('extracted code', moved)):
+        problem = check_source(text, label)
+        if problem:
+            raise ValueError(f"Refusing edit: {format_problem(problem)}")
+    return rest, moved
+
+
+def move(source_path: str, dest_path: str, names: List[str], occurrence: Optional[str] = None,
+         placeholder: bool = True, dry_run: bool = False):
+    """Moves named top-level blocks from one file to the end of another (created if missing)."""
+    index = build_index(read_source(source_path))
+    note = f"// [{{name}} moved to {os.path.basename(dest_path)}]" if placeholder else None
+    rest, moved = extract(index, names, occurrence, note)
+    dest = read_source(dest_path) if os.path.exists(dest_path) else ''
+    if dest:
+        dest_index = build_index(dest)
+        clash = [n for n in names if n in dest_index.by_name]
+        if clash:
+            raise ValueError(f"{os.path.basename(dest_path)} already declares {', '.join(clash)}")
+    combined = (dest.rstrip() + '\n\n' if dest.strip() else '') + moved
+    problem = check_source(combined, dest_path)
+    if problem:
+        raise ValueError(f"Refusing edit: {format_problem(problem)}")
+    if not dry_run:
+        for path, text in ((dest_path, combined), (source_path, rest)):
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8', newline='') as f:
+                f.write(text)
+            os.replace(tmp, path)
+    return rest, combined
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Index and split top-level JS declarations")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_list = sub.add_parser('list', help="print the top-level index")
+    p_list.add_argument('file')
+    p_list.add_argument('--nested', action='store_true', help="only list functions declared inside other blocks")
+    for name in ('extract', 'move'):
+        p = sub.add_parser(name)
+        p.add_argument('file')
+        if name == 'move':
+            p.add_argument('dest')
+            p.add_argument('--no-placeholder', action='store_true', help="leave no comment where code was")
+            p.add_argument('--dry-run', action='store_true')
+        p.add_argument('names', nargs='+')
+        p.add_argument('--occurrence', choices=('first', 'last', 'all'),
+                       help="which declaration to take when a name is declared more than once")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'list':
+            index = build_index(read_source(args.file))
+            if args.nested:
+                for n in index.nested:
+                    print(f"{n.line:>6}  {n.name}  (inside {n.parent}, depth {n.depth})")
+                return 0
+            for block in index.blocks:
+                lines = index.src.count('\n', block.start, block.end) + 1
+                print(f"{block.line:>6}  {block.kind:<9} {block.name or '-':<32} "
+                      f"[{block.start}:{block.end}] {lines} line(s)")
+        elif args.command == 'extract':
+            _, moved = extract(build_index(read_source(args.file)), args.names, args.occurrence)
+            sys.stdout.write(moved)
+        else:
+            move(args.file, args.dest, args.names, args.occurrence, not args.no_placeholder, args.dry_run)
+            print(f"{'Would move' if args.dry_run else 'Moved'} {', '.join(args.names)} "
+                  f"from {args.file} to {args.dest}")
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Small regex-driven JavaScript lexer shared by the build scripts.
+
+It understands what the brace-counting scripts did not: string, template and
+regex literals, and comments, so braces inside them are never miscounted.
+Tokens carry byte offsets into the source; line/column are computed only when
+needed (see `line_col`).
+"""
+
+import re
+from typing import Iterator, List, Optional, Tuple
+
+WS = 'ws'            # whitespace without a newline
+NL = 'nl'            # whitespace containing a newline
+COMMENT = 'comment'
+STRING = 'string'
+TEMPLATE = 'template'
+REGEX = 'regex'
+NUMBER = 'number'
+IDENT = 'ident'      # identifiers and keywords
+PUNCT = 'punct'
+
+
+class JSLexError(Exception):
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class Token:
+    __slots__ = ('type', 'value', 'start', 'end')
+
+    def __init__(self, type: str, value: str, start: int, end: int):
+        self.type = type
+        self.value = value
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"Token({self.type}, {self.value[:20]!r}, {self.start})"
+
+
+_WS_RE = re.compile(r'[ \t\f\v\u00a0\ufeff\u2028\u2029\r\n]+')
+_LINE_COMMENT_RE = re.compile(r'//[^\n\r\u2028\u2029]*')
+_BLOCK_COMMENT_RE = re.compile(r'/\*[\s\S]*?\*/')
+_STRING_RE = {
+    '"': re.compile(r'"(?:[^"\\\n\r]|\\[\s\S])*"'),
+    "'": re.compile(r"'(?:[^'\\\n\r]|\\[\s\S])*'"),
+}
+_IDENT_RE = re.compile(r'(?:[A-Za-z_$\u0080-\uffff]|\\u[0-9a-fA-F]{4})(?:[\w$\u0080-\uffff]|\\u[0-9a-fA-F]{4})*')
+_NUMBER_RE = re.compile(
+    r'(?:0[xX][0-9a-fA-F_]+|0[oO][0-7_]+|0[bB][01_]+|(?:\d[\d_]*\.?[\d_]*|\.\d[\d_]*)(?:[eE][+-]?\d+)?)n?')
+_REGEX_RE = re.compile(r'/(?:[^/\\\[\n\r]|\\.|\[(?:[^\]\\\n\r]|\\.)*\])+/[A-Za-z]*')
+_TEMPLATE_CHUNK_RE = re.compile(r'(?:[^`\\$]|\\[\s\S]|\$(?!\{))*')
+_PUNCT_RE = re.compile(
+    r'>>>=|\.\.\.|===|!==|\*\*=|<<=|>>=|>>>|&&=|\|\|=|\?\?=|'
+    r'=>|==|!=|<=|>=|&&|\|\||\?\?|\?\.(?!\d)|\+\+|--|\+=|-=|\*=|/=|%=|&=|\|=|\^=|\*\*|<<|>>|'
+    r'[{}()\[\];,<>+\-*/%&|^!~?:=.@#]')
+
+# After these keywords a `/` starts a regex, not a division
+_REGEX_KEYWORDS = frozenset((
+    'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw',
+    'case', 'do', 'else', 'yield', 'await',
+))
+
+
+def _regex_allowed(prev: Optional[Token]) -> bool:
+    if prev is None:
+        return True
+    if prev.type == PUNCT:
+        return prev.value not in (')', ']', '}', '++', '--')
+    if prev.type == IDENT:
+        return prev.value in _REGEX_KEYWORDS
+    return prev.type not in (NUMBER, STRING, TEMPLATE, REGEX)
+
+
+def tokenize(src: str, pos: int = 0, in_template_expr: bool = False) -> Iterator[Token]:
+    """
+    Yields tokens (whitespace and comments included, so the output can be
+    re-assembled losslessly). Raises JSLexError on unterminated literals.
+    With in_template_expr, stops before the `}` closing a `${...}` expression.
+    """
+    n = len(src)
+    prev = None  # last significant token, for the regex/division decision
+    depth = 0
+    while pos < n:
+        ch = src[pos]
+        m = None
+        if ch in ' \t\n\r\f\v\u00a0\ufeff\u2028\u2029':
+            m = _WS_RE.match(src, pos)
+            value = m.group()
+            yield Token(NL if ('\n' in value or '\r' in value) else WS, value, pos, m.end())
+            pos = m.end()
+            continue
+        if ch == '/':
+            nxt = src[pos + 1:pos + 2]
+            if nxt == '/':
+                m = _LINE_COMMENT_RE.match(src, pos)
+                yield Token(COMMENT, m.group(), pos, m.end())
+                pos = m.end()
+                continue
+            if nxt == '*':
+                m = _BLOCK_COMMENT_RE.match(src, pos)
+                if not m:
+                    raise JSLexError("Unterminated block comment", pos)
+                yield Token(COMMENT, m.group(), pos, m.end())
+                pos = m.end()
+                continue
+            if _regex_allowed(prev):
+                m = _REGEX_RE.match(src, pos)
+                if not m:
+                    raise JSLexError("Unterminated regular expression", pos)
+                prev = Token(REGEX, m.group(), pos, m.end())
+                yield prev
+                pos = m.end()
+                continue
+        if ch in '"\'':
+            m = _STRING_RE[ch].match(src, pos)
+            if not m:
+                raise JSLexError("Unterminated string literal", pos)
+            prev = Token(STRING, m.group(), pos, m.end())
+        elif ch == '`':
+            end = template_end(src, pos)
+            prev = Token(TEMPLATE, src[pos:end], pos, end)
+        elif ch.isdigit() or (ch == '.' and src[pos + 1:pos + 2].isdigit()):
+            m = _NUMBER_RE.match(src, pos)
+            prev = Token(NUMBER, m.group(), pos, m.end())
+        elif (m := _IDENT_RE.match(src, pos)) is not None:
+            prev = Token(IDENT, m.group(), pos, m.end())
+        else:
+            m = _PUNCT_RE.match(src, pos)
+            if not m:
+                raise JSLexError(f"Unexpected character {ch!r}", pos)
+            value = m.group()
+            if in_template_expr:
+                if value == '{':
+                    depth += 1
+                elif value == '}':
+                    if depth == 0:
+                        return
+                    depth -= 1
+            prev = Token(PUNCT, value, pos, m.end())
+        yield prev
+        pos = prev.end
+    if in_template_expr:
+        raise JSLexError("Unterminated template expression", pos)
+
+
+def template_end(src: str, start: int) -> int:
+    """Offset just past the template literal starting at `start` (a backtick)."""
+    pos = start + 1
+    n = len(src)
+    while True:
+        pos = _TEMPLATE_CHUNK_RE.match(src, pos).end()
+        if pos >= n:
+            raise JSLexError("Unterminated template literal", start)
+        if src[pos] == '`':
+            return pos + 1
+        # `${`: lex the embedded expression up to its closing brace
+        pos += 2
+        last = None
+        for last in tokenize(src, pos, in_template_expr=True):
+            pass
+        pos = last.end if last else pos
+        # skip whitespace between the last token and the closing brace
+        while pos < n and src[pos] != '}':
+            pos += 1
+        pos += 1
+
+
+def significant(tokens) -> Iterator[Token]:
+    """Drops whitespace and comments."""
+    for tok in tokens:
+        if tok.type not in (WS, NL, COMMENT):
+            yield tok
+
+
+def line_col(src: str, offset: int) -> Tuple[int, int]:
+    """1-based line and column of an offset."""
+    line = src.count('\n', 0, offset) + 1
+    return line, offset - (src.rfind('\n', 0, offset) + 1) + 1
+
+
+def top_level_declarations(src: str) -> Tuple[List[str], List[str], bool]:
+    """
+    Names declared at brace depth 0: (lexical let/const/class names,
+    function/var names, has_unparsed_destructuring).
+    """
+    lexical, hoisted = [], []
+    destructuring = False
+    depth = 0
+    toks = list(significant(tokenize(src)))
+    for i, tok in enumerate(toks):
+        if tok.type == PUNCT:
+            if tok.value in '{([':
+                depth += 1
+            elif tok.value in '})]':
+                depth -= 1
+            continue
+        if depth or tok.type != IDENT or i + 1 >= len(toks):
+            continue
+        if i and toks[i - 1].type == PUNCT and toks[i - 1].value == '.':
+            continue  # property access such as obj.let
+        nxt = toks[i + 1]
+        if tok.value in ('let', 'const', 'var', 'class'):
+            if nxt.type == IDENT:
+                (hoisted if tok.value == 'var' else lexical).append(nxt.value)
+                # further declarators: `let a = 1, b = 2;` at the same depth
+                if tok.value != 'class':
+                    _more_declarators(toks, i + 2, hoisted if tok.value == 'var' else lexical)
+            elif nxt.type == PUNCT and nxt.value in '{[':
+                destructuring = True
+        elif tok.value == 'function':
+            name = nxt if nxt.type == IDENT else (toks[i + 2] if i + 2 < len(toks) and nxt.value == '*' else None)
+            if name is not None and name.type == IDENT:
+                hoisted.append(name.value)
+    return lexical, hoisted, destructuring
+
+
+def _more_declarators(toks: List[Token], i: int, names: List[str]):
+    depth = 0
+    while i < len(toks):
+        tok = toks[i]
+        if tok.type == PUNCT:
+            if tok.value in '{([':
+                depth += 1
+            elif tok.value in '})]':
+                if depth == 0:
+                    return
+                depth -= 1
+            elif depth == 0 and tok.value == ';':
+                return
+            elif depth == 0 and tok.value == ',' and i + 1 < len(toks) and toks[i + 1].type == IDENT:
+                names.append(toks[i + 1].value)
+        elif depth == 0 and tok.type == IDENT and tok.value in ('function', 'let', 'const', 'var', 'class', 'if', 'for'):
+            return  # statement ended by ASI
+        i += 1
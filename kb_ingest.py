@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+Incremental knowledge ingestion into a persistent SQLite store.
+
+ingestKnowledge()/smartChunking() in app_part_rag.js re-chunk whole uploads
+and keep every chunk in localStorage. Here documents are streamed (TXT, MD,
+JSON arrays) in blocks, cut into chunks of at most CHUNK_SIZE characters with
+CHUNK_OVERLAP characters carried over, and stored once per distinct text
+(content hash), however many documents contain it.
+
+Chunk boundaries are content-defined: a paragraph whose hash hits the anchor
+divisor ends a chunk once it is long enough. An edit therefore changes the
+chunks around it and the boundaries resynchronize after it, so re-ingesting a
+changed document only inserts and deletes the chunks that actually changed.
+Unchanged documents (same size and mtime, or same content hash) are skipped.
+Every insert/delete is appended to a change log, which kb_search.py replays to
+update its index without rebuilding it.
+
+    python kb_ingest.py add manuals/ specs/*.md --db kb.sqlite
+    python kb_ingest.py remove specs/old.md --db kb.sqlite
+    python kb_ingest.py stats --db kb.sqlite
+    python kb_search.py serve --db kb.sqlite
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import codecs
+import itertools
+import sqlite3
+import hashlib
+import argparse
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from fix_encoding import detect_encoding, FALLBACKS, SKIP_DIRS
+
+CHUNK_SIZE = 800      # characters per chunk, overlap included
+CHUNK_OVERLAP = 100   # characters repeated from the end of the previous chunk
+MIN_CHUNK = 200       # a content anchor only ends a chunk past this length
+ANCHOR_DIVISOR = 3    # about one paragraph in three is an anchor
+READ_BLOCK = 1 << 16
+MAX_UNIT = 1 << 16    # characters; a longer paragraph is passed on in pieces
+EXTENSIONS = ('.txt', '.md', '.json')
+
+_SENTENCE_END_RE = re.compile(r'(?<=[。！？；.!?;])\s*')
+_PARAGRAPH_BREAK_RE = re.compile(r'\n[ \t]*\n')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT, chunks INTEGER, ingested REAL);
+CREATE TABLE IF NOT EXISTS chunks (
+    hash TEXT PRIMARY KEY, text TEXT NOT NULL, source TEXT, refs INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS doc_chunks (
+    path TEXT NOT NULL, seq INTEGER NOT NULL, hash TEXT NOT NULL, PRIMARY KEY (path, seq));
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT, op TEXT NOT NULL, hash TEXT NOT NULL);
+"""
+
+
+def iter_text(path: str, encoding: Optional[str] = None) -> Iterator[str]:
+    """Decoded blocks of a file; the encoding comes from its first block unless given."""
+    with open(path, 'rb') as f:
+        head = f.read(READ_BLOCK)
+        skip = 0
+        if encoding is None:
+            encoding, skip = detect_encoding(head)
+        decoder = codecs.getincrementaldecoder(encoding)('strict')
+        block = head[skip:]
+        while block:
+            yield decoder.decode(block)
+            block = f.read(READ_BLOCK)
+        yield decoder.decode(b'', final=True)
+
+
+def iter_paragraphs(blocks: Iterable[str]) -> Iterator[str]:
+    """
+    Blank-line separated paragraphs from a stream of text blocks. Only the new
+    text is searched for a break, and a paragraph longer than MAX_UNIT is
+    passed on in pieces, so memory stays bounded however long it is.
+    """
+    pending, scan, carry = '', 0, ''
+    for block in blocks:
+        block = carry + block
+        carry = '\r' if block.endswith('\r') else ''  # may be half of a \r\n split across blocks
+        pending += (block[:-1] if carry else block).replace('\r\n', '\n').replace('\r', '\n')
+        start = 0
+        for m in _PARAGRAPH_BREAK_RE.finditer(pending, scan):
+            if pending[start:m.start()].strip():
+                yield pending[start:m.start()].strip()
+            start = m.end()
+        pending = pending[start:]
+        while len(pending) > MAX_UNIT:
+            cut = _unit_cut(pending)
+            if pending[:cut].strip():
+                yield pending[:cut].strip()
+            pending = pending[cut:]
+        # A break still being read starts at the last newline
+        scan = pending.rfind('\n') if '\n' in pending else len(pending)
+    if pending.strip():
+        yield pending.strip()
+
+
+def _unit_cut(text: str) -> int:
+    """Where to cut an over-long paragraph: a line end, else a sentence end or space, else hard."""
+    head = text[:MAX_UNIT]
+    cut = head.rfind('\n') + 1
+    if cut < MAX_UNIT // 2:
+        cut = max(head.rfind(' '), head.rfind('。')) + 1
+    return cut if cut >= MAX_UNIT // 2 else MAX_UNIT
+
+
+def _json_text(item) -> str:
+    if isinstance(item, str):
+        return item
+    if isinstance(item, dict):
+        return '\n'.join(f"{key}: {value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)}"
+                         for key, value in item.items())
+    return json.dumps(item, ensure_ascii=False)
+
+
+def iter_json_items(blocks: Iterable[str]) -> Iterator[str]:
+    """
+    Items of a top-level JSON array, decoded one at a time; any other document
+    is one item. An item is only taken once the ',' or ']' after it has been
+    read (a number may go on in the next block), and an unfinished one is
+    retried after the buffered text has doubled, so a huge item is not
+    re-parsed for every block.
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, in_array = '', 0, None
+    waiting, need = [], 0  # blocks held back until `need` more characters have arrived
+    for block in itertools.chain(blocks, [None]):
+        final = block is None
+        if not final:
+            waiting.append(block)
+            need -= len(block)
+            if need > 0:
+                continue
+        if waiting:
+            buffer, pos, waiting = buffer[pos:] + ''.join(waiting), 0, []
+        need = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if in_array is None:
+                in_array = buffer[pos] == '['
+                if in_array:
+                    pos += 1
+                continue
+            if not in_array:
+                need = len(buffer) - pos  # not an array: parse the whole document at the end
+                break
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+                after = end
+                while after < len(buffer) and buffer[after] in ' \t\r\n':
+                    after += 1
+                if after < len(buffer) and buffer[after] not in ',]':
+                    raise ValueError(f"Expecting ',' delimiter at {after}")  # e.g. "12" of "12.5"
+            except ValueError:
+                if final:
+                    raise
+                need = len(buffer) - pos  # item not complete yet
+                break
+            if after == len(buffer) and not final:
+                need = 1
+                break
+            yield _json_text(item)
+            pos = end
+    if not in_array and buffer[pos:].strip():
+        yield _json_text(json.loads(buffer[pos:]))
+
+
+def _pieces(units: Iterable[str], size: int) -> Iterator[str]:
+    """Units no longer than size: long ones are split at sentence ends, then hard."""
+    for unit in units:
+        if len(unit) <= size:
+            yield unit
+            continue
+        piece = ''
+        for sentence in _SENTENCE_END_RE.split(unit):
+            while len(sentence) > size:
+                if piece:
+                    yield piece
+                    piece = ''
+                yield sentence[:size]
+                sentence = sentence[size:]
+            if len(piece) + len(sentence) + 1 > size and piece:
+                yield piece
+                piece = ''
+            piece = f"{piece} {sentence}" if piece else sentence
+        if piece:
+            yield piece
+
+
+def _overlap_tail(text: str, overlap: int) -> str:
+    if overlap <= 0 or len(text) <= overlap:
+        return text if overlap > 0 else ''
+    tail = text[-overlap:]
+    cut = re.search(r'\s', tail)  # start at a word boundary when there is one
+    return tail[cut.end():] if cut and cut.end() < len(tail) else tail
+
+
+def iter_chunks(units: Iterable[str], size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP,
+                min_size: int = MIN_CHUNK) -> Iterator[str]:
+    """Content-defined chunks of at most `size` characters (overlap included)."""
+    if not 0 <= overlap < size // 2:
+        raise ValueError("overlap must be smaller than half the chunk size")
+    body: List[str] = []
+    length, tail = 0, ''
+    for piece in _pieces(units, size - overlap - 2):
+        if body and length + len(piece) + 2 > size - len(tail) - 2:
+            text = '\n\n'.join(body)
+            yield f"{tail}\n\n{text}" if tail else text
+            tail, body, length = _overlap_tail(text, overlap), [], 0
+        body.append(piece)
+        length += len(piece) + 2
+        if length >= min_size and zlib.crc32(piece.encode('utf-8')) % ANCHOR_DIVISOR == 0:
+            text = '\n\n'.join(body)
+            yield f"{tail}\n\n{text}" if tail else text
+            tail, body, length = _overlap_tail(text, overlap), [], 0
+    if body:
+        text = '\n\n'.join(body)
+        yield f"{tail}\n\n{text}" if tail else text
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+class KnowledgeStore:
+    """Documents, deduplicated chunks and the change log, in one SQLite file."""
+
+    def __init__(self, path: str, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP):
+        self.path = path
+        self.size = size
+        self.overlap = overlap
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def _units(self, path: str, encoding: Optional[str]) -> Iterator[str]:
+        blocks = iter_text(path, encoding)
+        return iter_json_items(blocks) if path.lower().endswith('.json') else iter_paragraphs(blocks)
+
+    def ingest(self, path: str, force: bool = False) -> Dict:
+        """Adds or updates one document; returns {'status', 'added', 'removed', 'kept'}."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        row = self.conn.execute("SELECT size, mtime_ns, sha256 FROM documents WHERE path = ?", (path,)).fetchone()
+        if row and not force and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return {'status': 'unchanged', 'added': 0, 'removed': 0, 'kept': 0}
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(READ_BLOCK), b''):
+                digest.update(block)
+        sha = digest.hexdigest()
+        if row and not force and row[2] == sha:
+            with self.conn:
+                self.conn.execute("UPDATE documents SET size = ?, mtime_ns = ? WHERE path = ?",
+                                  (st.st_size, st.st_mtime_ns, path))
+            return {'status': 'unchanged', 'added': 0, 'removed': 0, 'kept': 0}
+
+        for encoding in (None,) + FALLBACKS:
+            try:
+                with self.conn:  # one transaction: a decode error part way leaves the store untouched
+                    return self._replace(path, st, sha, self._units(path, encoding))
+            except UnicodeDecodeError:
+                continue
+        raise ValueError(f"{path}: cannot be decoded")
+
+    def _replace(self, path, st, sha, units) -> Dict:
+        conn = self.conn
+        old = [h for (h,) in conn.execute("SELECT hash FROM doc_chunks WHERE path = ? ORDER BY seq", (path,))]
+        new, added = [], 0
+        for text in iter_chunks(units, self.size, self.overlap):
+            h = chunk_hash(text)
+            cur = conn.execute("INSERT OR IGNORE INTO chunks (hash, text, source, refs) VALUES (?, ?, ?, 0)",
+                               (h, text, path))
+            if cur.rowcount:
+                conn.execute("INSERT INTO changes (op, hash) VALUES ('add', ?)", (h,))
+                added += 1
+            new.append(h)
+
+        delta = Counter(new)
+        delta.subtract(Counter(old))
+        conn.executemany("UPDATE chunks SET refs = refs + ? WHERE hash = ?",
+                         [(n, h) for h, n in delta.items() if n])
+        gone = [h for h, n in delta.items()
+                if n < 0 and conn.execute("SELECT refs FROM chunks WHERE hash = ?", (h,)).fetchone()[0] <= 0]
+        conn.executemany("DELETE FROM chunks WHERE hash = ?", [(h,) for h in gone])
+        conn.executemany("INSERT INTO changes (op, hash) VALUES ('remove', ?)", [(h,) for h in gone])
+
+        # Rewrite only the positions whose chunk changed
+        conn.executemany("INSERT OR REPLACE INTO doc_chunks (path, seq, hash) VALUES (?, ?, ?)",
+                         [(path, seq, h) for seq, h in enumerate(new) if seq >= len(old) or old[seq] != h])
+        conn.execute("DELETE FROM doc_chunks WHERE path = ? AND seq >= ?", (path, len(new)))
+        conn.execute("INSERT OR REPLACE INTO documents (path, size, mtime_ns, sha256, chunks, ingested) "
+                     "VALUES (?, ?, ?, ?, ?, ?)", (path, st.st_size, st.st_mtime_ns, sha, len(new), time.time()))
+        return {'status': 'updated' if old else 'added', 'added': added, 'removed': len(gone),
+                'kept': len(new) - added}
+
+    def remove(self, path: str) -> int:
+        """Drops a document; returns how many chunks no other document used."""
+        path = os.path.abspath(path)
+        with self.conn:
+            hashes = [h for (h,) in self.conn.execute("SELECT hash FROM doc_chunks WHERE path = ?", (path,))]
+            self.conn.executemany("UPDATE chunks SET refs = refs - ? WHERE hash = ?",
+                                  [(n, h) for h, n in Counter(hashes).items()])
+            gone = [h for h in set(hashes)
+                    if self.conn.execute("SELECT refs FROM chunks WHERE hash = ?", (h,)).fetchone()[0] <= 0]
+            self.conn.executemany("DELETE FROM chunks WHERE hash = ?", [(h,) for h in gone])
+            self.conn.executemany("INSERT INTO changes (op, hash) VALUES ('remove', ?)", [(h,) for h in gone])
+            self.conn.execute("DELETE FROM doc_chunks WHERE path = ?", (path,))
+            self.conn.execute("DELETE FROM documents WHERE path = ?", (path,))
+        return len(gone)
+
+    def generation(self) -> int:
+        return self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+
+    def changes_since(self, seq: int) -> List[Tuple[int, str, str, Optional[str], Optional[str]]]:
+        """(seq, op, hash, text, source) after seq; text is None once a chunk is gone again."""
+        return self.conn.execute(
+            "SELECT c.seq, c.op, c.hash, k.text, k.source FROM changes c LEFT JOIN chunks k ON k.hash = c.hash "
+            "WHERE c.seq > ? ORDER BY c.seq", (seq,)).fetchall()
+
+    def iter_chunks(self) -> Iterator[Tuple[str, str, str]]:
+        """(hash, text, source) of every stored chunk."""
+        return iter(self.conn.execute("SELECT hash, text, source FROM chunks ORDER BY rowid"))
+
+    def stats(self) -> Dict:
+        q = lambda sql: self.conn.execute(sql).fetchone()[0]
+        return {'documents': q("SELECT COUNT(*) FROM documents"), 'chunks': q("SELECT COUNT(*) FROM chunks"),
+                'references': q("SELECT COUNT(*) FROM doc_chunks"), 'generation': self.generation()}
+
+
+def iter_files(paths: Iterable[str]) -> Iterator[str]:
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+                for name in sorted(files):
+                    if name.lower().endswith(EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Incremental knowledge-base ingestion")
+    # --db goes after the command, as in kb_search.py
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--db', default='kb.sqlite', help="store file (default: kb.sqlite)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('add', parents=[common], help="ingest files or directories (changed ones only)")
+    p.add_argument('paths', nargs='+')
+    p.add_argument('--force', action='store_true', help="re-chunk even unchanged files")
+    p.add_argument('--size', type=int, default=CHUNK_SIZE)
+    p.add_argument('--overlap', type=int, default=CHUNK_OVERLAP)
+    p = sub.add_parser('remove', parents=[common], help="drop documents")
+    p.add_argument('paths', nargs='+')
+    sub.add_parser('stats', parents=[common], help="show store counts")
+    args = parser.parse_args(argv)
+
+    store = KnowledgeStore(args.db, getattr(args, 'size', CHUNK_SIZE), getattr(args, 'overlap', CHUNK_OVERLAP))
+    try:
+        if args.command == 'add':
+            started = time.perf_counter()
+            totals = Counter()
+            for path in iter_files(args.paths):
+                try:
+                    result = store.ingest(path, force=args.force)
+                except (OSError, ValueError) as e:
+                    print(f"Error: {e}")
+                    totals['errors'] += 1
+                    continue
+                totals[result['status']] += 1
+                totals.update({'chunks_' + k: result[k] for k in ('added', 'removed')})
+                if result['status'] != 'unchanged':
+                    print(f"{result['status']:<9} {path}: +{result['added']} -{result['removed']} "
+                          f"={result['kept']} chunks")
+            print(f"{sum(totals[s] for s in ('added', 'updated', 'unchanged'))} file(s), "
+                  f"{totals['unchanged']} unchanged; chunks +{totals['chunks_added']} -{totals['chunks_removed']} "
+                  f"in {time.perf_counter() - started:.2f}s")
+            return 1 if totals['errors'] else 0
+        if args.command == 'remove':
+            for path in args.paths:
+                print(f"removed {path}: -{store.remove(path)} chunks")
+            return 0
+        print(json.dumps(store.stats()))
+        return 0
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
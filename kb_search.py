@@ -0,0 +1,663 @@
+#!/usr/bin/env python3
+"""
+Knowledge-base retrieval: a prebuilt inverted index ranked with BM25.
+
+app_part_rag.js retrieveRelevantContext() scans every chunk for every query
+(toLowerCase + a new RegExp per term per chunk) and ignores how rare a term
+is. Here each term maps to a postings list of (chunk, term frequency), so a
+query only touches the chunks that contain its terms, IDF weighs rare terms
+up, and the best K come from a heap instead of sorting every score. Common
+terms are pruned (MaxScore); queries made only of very common terms walk the
+postings in impact order and stop early (threshold algorithm). Both return
+exactly the exhaustive BM25 top K.
+
+    python kb_search.py build docs/*.md -o kb_index.json
+    python kb_search.py search kb_index.json "bucket capacity PC200"
+    python kb_search.py serve kb_index.json --port 8766     # GET /search?q=...&k=5
+    python kb_search.py serve --db kb.sqlite                 # follow a kb_ingest.py store
+    python kb_search.py serve --db kb.sqlite --vectors       # hybrid BM25 + vector ranking (kb_vectors.py)
+    python kb_search.py serve --db kb.sqlite --products      # POST /match, RFQ products (rfq_matcher.py)
+
+With --db the index is loaded from a snapshot next to the store and brought
+up to date by replaying the store's change log, and the service keeps
+replaying it while running: chunks are removed with tombstones and added in
+place, and the postings are compacted once many chunks are deleted.
+
+The page uses the service when window.KB_SERVICE_URL points at it; set
+--allow-origin to the page's origin to keep other sites from reading it.
+POST /chunks (add chunks to a served index file) is accepted only from this
+machine and never from another web origin; with --db it is disabled, since
+chunks belong in the store (kb_ingest.py add).
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import base64
+import time
+import heapq
+import bisect
+import argparse
+import ipaddress
+import threading
+import unicodedata
+from array import array
+from operator import itemgetter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from fix_encoding import read_source
+
+# jieba is optional: with it, CJK runs also yield dictionary words of three or more characters
+try:
+    import jieba
+except ImportError:
+    jieba = None
+
+INDEX_VERSION = 3
+HEAVY_POSTINGS = 4096  # when every query term is at least this common, walk postings by impact instead
+# A posting is one unsigned 32-bit int: chunk number << 8 | term frequency (capped at 255)
+TF_BITS = 8
+TF_MAX = (1 << TF_BITS) - 1
+MAX_CHUNKS = 1 << (32 - TF_BITS)
+COMPACT_RATIO = 0.25   # rebuild the postings once this share of the chunks is deleted
+SYNC_INTERVAL = 2.0    # seconds between change-log checks when serving a store
+
+_CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af'
+_CJK_RUN_RE = re.compile('[%s]+' % _CJK)
+_WORD_RE = re.compile(r'[^\W%s]+(?:[.\-][^\W%s]+)*' % (_CJK, _CJK))
+
+
+def _cjk_terms(run: str) -> List[str]:
+    if len(run) == 1:
+        return [run]
+    terms = [run[i:i + 2] for i in range(len(run) - 1)]
+    if jieba is not None and len(run) > 2:
+        terms += [w for w in jieba.lcut(run) if len(w) > 2]
+    return terms
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Terms of mixed Chinese/English text. Latin, digits and other scripts give
+    lowercased words (model numbers like pc200-8 or 1.5m3 stay whole; one-letter
+    words are dropped). Han, kana and hangul runs give overlapping character
+    bigrams, so 挖掘机 matches 小型挖掘机 without a dictionary; a lone character
+    is kept as is. Full-width forms are folded first (ＰＣ２００ -> pc200).
+    """
+    text = unicodedata.normalize('NFKC', text).lower()
+    terms = []
+    pos = 0
+    for run in _CJK_RUN_RE.finditer(text):
+        terms += [w for w in _WORD_RE.findall(text, pos, run.start()) if len(w) > 1 or w.isdigit()]
+        terms += _cjk_terms(run.group())
+        pos = run.end()
+    terms += [w for w in _WORD_RE.findall(text, pos) if len(w) > 1 or w.isdigit()]
+    return terms
+
+
+def _is_cjk_char(term: str) -> bool:
+    return len(term) == 1 and _CJK_RUN_RE.match(term) is not None
+
+
+def chunk_text(text: str, source: str, min_chars: int = 20) -> List[Dict]:
+    """Paragraph chunks, as smartChunking() in app_part_rag.js makes them."""
+    chunks = []
+    for index, segment in enumerate(re.split(r'\n\s*\n', text)):
+        clean = segment.strip()
+        if len(clean) > min_chars:
+            chunks.append({'id': f"{source}_{index}", 'text': clean, 'source': source})
+    return chunks
+
+
+class BM25Index:
+    """Inverted index over text chunks with Okapi BM25 scoring."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids: List[str] = []        # doc number -> chunk id
+        self.sources: List[str] = []
+        self.texts: List[str] = []
+        self.lengths = array('I')       # tokens per chunk
+        # term -> packed postings in chunk order (see TF_BITS); a term seen in only one chunk
+        # keeps its single posting as a plain int, which saves an array object per rare term
+        self.postings: Dict[str, Union[int, array]] = {}
+        self._norms: Optional[List[float]] = None  # k1 * (1 - b + b * len / avgdl), rebuilt after adds
+        self._impacts: Dict[str, Tuple[array, float]] = {}  # term -> (per-posting BM25 tf part, its max)
+        self._orders: Dict[str, array] = {}  # term -> posting positions by impact, highest first
+        self._char_terms: Optional[Dict[str, List[str]]] = None  # CJK char -> terms containing it
+        self.deleted = set()            # tombstoned doc numbers, skipped by search until compact()
+        self._doc_of: Optional[Dict[str, int]] = None  # chunk id -> live doc number, built on first remove
+        self.generation = 0             # last store change applied by sync()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids) - len(self.deleted)
+
+    def add(self, chunk_id: str, text: str, source: str = '') -> int:
+        counts: Dict[str, int] = {}
+        for term in tokenize(text):
+            counts[term] = counts.get(term, 0) + 1
+        with self._lock:
+            doc = len(self.ids)
+            if doc >= MAX_CHUNKS:
+                raise ValueError(f"Index is full ({MAX_CHUNKS} chunks)")
+            self.ids.append(chunk_id)
+            self.sources.append(source)
+            self.texts.append(text)
+            self.lengths.append(sum(counts.values()))
+            if self._doc_of is not None:
+                self._doc_of[chunk_id] = doc
+            postings = self.postings
+            for term, tf in counts.items():
+                packed = doc << TF_BITS | min(tf, TF_MAX)
+                plist = postings.get(term)
+                if plist is None:
+                    postings[term] = packed
+                    self._char_terms = None
+                elif type(plist) is int:
+                    postings[term] = array('I', (plist, packed))
+                else:
+                    plist.append(packed)
+            self._norms = None
+            self._impacts.clear()
+            self._orders.clear()
+        return doc
+
+    def add_many(self, chunks: Iterable[Dict]) -> int:
+        added = 0
+        for chunk in chunks:
+            self.add(chunk['id'], chunk['text'], chunk.get('source', ''))
+            added += 1
+        return added
+
+    def remove(self, chunk_id: str) -> bool:
+        """Tombstones a chunk; its postings stay until compact()."""
+        with self._lock:
+            doc = self._live_docs().pop(chunk_id, None)
+            if doc is None:
+                return False
+            self.deleted.add(doc)
+            return True
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._live_docs()
+
+    def _live_docs(self) -> Dict[str, int]:
+        if self._doc_of is None:
+            self._doc_of = {cid: doc for doc, cid in enumerate(self.ids) if doc not in self.deleted}
+        return self._doc_of
+
+    def compact(self) -> bool:
+        """Rebuilds the postings without the deleted chunks. Returns False if chunks were added meanwhile."""
+        size = len(self.ids)
+        live = [doc for doc in range(size) if doc not in self.deleted]
+        fresh = BM25Index(self.k1, self.b)
+        for doc in live:
+            fresh.add(self.ids[doc], self.texts[doc], self.sources[doc])
+        with self._lock:
+            if len(self.ids) != size or len(live) != size - len(self.deleted):
+                return False
+            self.ids, self.sources, self.texts = fresh.ids, fresh.sources, fresh.texts
+            self.lengths, self.postings = fresh.lengths, fresh.postings
+            self.deleted, self._doc_of = set(), None
+            self._norms, self._char_terms = None, None
+            self._impacts.clear()
+            self._orders.clear()
+        return True
+
+    def sync(self, store) -> int:
+        """Applies the kb_ingest store's changes since the last sync; returns how many took effect."""
+        applied = 0
+        for seq, op, chunk_id, text, source in store.changes_since(self.generation):
+            if op == 'add' and text is not None and chunk_id not in self:
+                self.add(chunk_id, text, source or '')
+                applied += 1
+            elif op == 'remove' and self.remove(chunk_id):
+                applied += 1
+            self.generation = seq
+        if self.deleted and len(self.deleted) > COMPACT_RATIO * len(self.ids):
+            self.compact()
+        return applied
+
+    @classmethod
+    def from_store(cls, store, snapshot: Optional[str] = None) -> 'BM25Index':
+        """Index of a kb_ingest store: the snapshot plus the changes after it, or every stored chunk.
+        A new or outdated snapshot is rewritten."""
+        index = None
+        if snapshot and os.path.exists(snapshot):
+            try:
+                index = cls.load(snapshot)
+            except ValueError:
+                pass
+        saved = index.generation if index else None
+        if index is None:
+            index = cls()
+            index.generation = store.generation()
+            for chunk_id, text, source in store.iter_chunks():
+                index.add(chunk_id, text, source or '')
+        index.sync(store)
+        if snapshot and index.generation != saved:
+            index.save(snapshot)
+        return index
+
+    def idf(self, term: str) -> float:
+        df = len(self._postings(term)) if term in self.postings else 0
+        return math.log(1 + (len(self.ids) - df + 0.5) / (df + 0.5))
+
+    def _doc_norms(self) -> List[float]:
+        norms = self._norms
+        if norms is None:
+            avgdl = (sum(self.lengths) / len(self.lengths)) if self.lengths else 1.0
+            k1, b = self.k1, self.b
+            norms = self._norms = [k1 * (1 - b + b * n / (avgdl or 1.0)) for n in self.lengths]
+        return norms
+
+    def _term_impacts(self, term: str, norms: List[float]) -> Tuple[array, float]:
+        cached = self._impacts.get(term)
+        if cached is None:
+            k1 = self.k1
+            impacts = array('f', [(k1 + 1) * (p & TF_MAX) / ((p & TF_MAX) + norms[p >> TF_BITS])
+                                  for p in self._postings(term)])
+            cached = self._impacts[term] = (impacts, max(impacts))
+        return cached
+
+    def search(self, query: str, k: int = 5) -> List[Dict]:
+        """Top-k chunks by BM25: {'id', 'source', 'text', 'score'}, best first."""
+        if k <= 0:
+            return []
+        with self._lock:
+            counts = self._query_terms(query)
+            if not counts:
+                return []
+            norms = self._doc_norms()
+            # (term, weight, impacts, upper bound of its contribution), strongest first
+            terms = []
+            for term, qtf in counts.items():
+                impacts, top = self._term_impacts(term, norms)
+                weight = self.idf(term) * qtf
+                terms.append((term, weight, impacts, weight * top))
+            terms.sort(key=lambda t: t[3], reverse=True)
+            if min(len(impacts) for _, _, impacts, _ in terms) >= HEAVY_POSTINGS:
+                best = self._threshold_top(terms, k)
+                if best is not None:
+                    return self._results(best)
+            return self._results(self._maxscore_top(terms, k))
+
+    def score_chunks(self, query: str, chunk_ids: Iterable[str]) -> List[Dict]:
+        """BM25 scores of the given live chunks (0.0 when no term matches), as search() results."""
+        with self._lock:
+            live = self._live_docs()
+            counts = self._query_terms(query)
+            norms = self._doc_norms() if counts else None
+            best = []
+            for doc in [live[cid] for cid in chunk_ids if cid in live]:
+                score = 0.0
+                for term, qtf in counts.items():
+                    i = self._find(self._postings(term), doc)
+                    if i is not None:
+                        score += self.idf(term) * qtf * self._term_impacts(term, norms)[0][i]
+                best.append((doc, score))
+            return self._results(best)
+
+    def _query_terms(self, query: str) -> Dict[str, int]:
+        counts = {}
+        for term in tokenize(query):
+            # A lone CJK character only exists inside bigrams: match any term that contains it
+            for match in (self._cjk_char_terms(term) if _is_cjk_char(term) else (term,)):
+                if match in self.postings:
+                    counts[match] = counts.get(match, 0) + 1
+        return counts
+
+    def _maxscore_top(self, terms, k):
+        """Term at a time, strongest term first. Once the terms still to come cannot lift an
+        unseen chunk into the top k, they only adjust chunks that are already candidates."""
+        remaining = sum(t[3] for t in terms)
+        scores: Dict[int, float] = {}
+        for term, weight, impacts, bound in terms:
+            remaining -= bound
+            plist = self._postings(term)
+            threshold = self._kth(scores, k)
+            if scores and remaining + bound < threshold:
+                for doc in [d for d, s in scores.items() if s + bound + remaining >= threshold]:
+                    i = self._find(plist, doc)
+                    if i is not None:
+                        scores[doc] += weight * impacts[i]
+                continue
+            get = scores.get
+            for p, impact in zip(plist, impacts):
+                doc = p >> TF_BITS
+                scores[doc] = get(doc, 0.0) + weight * impact
+            for doc in self.deleted:
+                scores.pop(doc, None)
+        return heapq.nlargest(k, scores.items(), key=itemgetter(1))
+
+    def _threshold_top(self, terms, k):
+        """Fagin's threshold algorithm over impact-ordered postings, for queries made only of
+        very common terms. Returns None if it would cost more than a term-at-a-time pass."""
+        lists = [(self._postings(term), impacts, weight, self._impact_order(term, impacts))
+                 for term, weight, impacts, _ in terms]
+        budget = min(len(impacts) for _, impacts, _, _ in lists)
+        seen, heap = set(self.deleted), []
+        for depth in range(max(len(order) for _, _, _, order in lists)):
+            threshold = 0.0
+            for plist, impacts, weight, order in lists:
+                if depth >= len(order):
+                    continue
+                i = order[depth]
+                threshold += weight * impacts[i]
+                doc = plist[i] >> TF_BITS
+                if doc in seen:
+                    continue
+                seen.add(doc)
+                score = 0.0
+                for other, other_impacts, other_weight, _ in lists:
+                    j = self._find(other, doc)
+                    if j is not None:
+                        score += other_weight * other_impacts[j]
+                if len(heap) < k:
+                    heapq.heappush(heap, (score, doc))
+                elif score > heap[0][0]:
+                    heapq.heapreplace(heap, (score, doc))
+            if len(heap) == k and heap[0][0] >= threshold:
+                return [(doc, score) for score, doc in sorted(heap, reverse=True)]
+            if len(seen) > budget + len(self.deleted):
+                return None
+        return [(doc, score) for score, doc in sorted(heap, reverse=True)]
+
+    def _postings(self, term: str) -> array:
+        plist = self.postings[term]
+        return array('I', (plist,)) if type(plist) is int else plist
+
+    @staticmethod
+    def _find(plist: array, doc: int) -> Optional[int]:
+        """Position of a chunk in a packed postings list (binary search), or None."""
+        i = bisect.bisect_left(plist, doc << TF_BITS)
+        return i if i < len(plist) and plist[i] >> TF_BITS == doc else None
+
+    def _cjk_char_terms(self, char: str) -> List[str]:
+        if self._char_terms is None:
+            index: Dict[str, List[str]] = {}
+            for term in self.postings:
+                if len(term) <= 3 and _CJK_RUN_RE.fullmatch(term):
+                    for c in set(term):
+                        index.setdefault(c, []).append(term)
+            self._char_terms = index
+        return self._char_terms.get(char, [])
+
+    def _impact_order(self, term: str, impacts: array) -> array:
+        order = self._orders.get(term)
+        if order is None:
+            order = self._orders[term] = array('I', sorted(range(len(impacts)), key=impacts.__getitem__, reverse=True))
+        return order
+
+    def _results(self, best) -> List[Dict]:
+        return [{'id': self.ids[doc], 'source': self.sources[doc], 'text': self.texts[doc],
+                 'score': round(score, 4)} for doc, score in best]
+
+    @staticmethod
+    def _kth(scores: Dict[int, float], k: int) -> float:
+        if len(scores) < k:
+            return 0.0
+        return heapq.nlargest(k, scores.values())[-1]
+
+    def warm(self):
+        """Precomputes norms, impacts and impact order of the common terms, so the first queries are fast too."""
+        with self._lock:
+            norms = self._doc_norms()
+            for term, plist in self.postings.items():
+                if type(plist) is not int and len(plist) >= HEAVY_POSTINGS:
+                    self._impact_order(term, self._term_impacts(term, norms)[0])
+
+    def stats(self) -> Dict:
+        postings = sum(1 if type(plist) is int else len(plist) for plist in self.postings.values())
+        return {'chunks': len(self), 'deleted': len(self.deleted), 'terms': len(self.postings), 'postings': postings,
+                'postings_bytes': postings * array('I').itemsize}
+
+    def save(self, path: str):
+        terms = list(self.postings)
+        blob = array('I')
+        offsets = array('I', [0])
+        for term in terms:
+            blob.extend(self._postings(term))
+            offsets.append(len(blob))
+        data = {'version': INDEX_VERSION, 'k1': self.k1, 'b': self.b, 'ids': self.ids, 'sources': self.sources,
+                'texts': self.texts, 'lengths': base64.b64encode(self.lengths.tobytes()).decode('ascii'),
+                'terms': terms, 'offsets': base64.b64encode(offsets.tobytes()).decode('ascii'),
+                'postings': base64.b64encode(blob.tobytes()).decode('ascii'),
+                'deleted': sorted(self.deleted), 'generation': self.generation}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path: str) -> 'BM25Index':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != INDEX_VERSION:
+            raise ValueError(f"{path}: index version {data.get('version')}, expected {INDEX_VERSION}; rebuild it")
+        index = cls(data['k1'], data['b'])
+        index.ids, index.sources, index.texts = data['ids'], data['sources'], data['texts']
+        index.lengths = array('I', base64.b64decode(data['lengths']))
+        offsets = array('I', base64.b64decode(data['offsets']))
+        blob = array('I', base64.b64decode(data['postings']))
+        index.postings = {term: blob[offsets[n]] if offsets[n + 1] - offsets[n] == 1 else blob[offsets[n]:offsets[n + 1]]
+                          for n, term in enumerate(data['terms'])}
+        index.deleted, index.generation = set(data['deleted']), data['generation']
+        return index
+
+
+class SearchHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    index: BM25Index = None
+    vectors = None  # kb_vectors.VectorIndex, enables mode=hybrid|vector
+    matcher = None  # rfq_matcher.ProductIndex, enables POST /match
+    allow_origin = "*"  # the page is served from another port
+    accept_chunks = True  # POST /chunks; off when following a store
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload: Dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Access-Control-Allow-Origin", self.allow_origin)
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header("Access-Control-Allow-Origin", self.allow_origin)
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+        self.send_header("Access-Control-Allow-Headers", "Content-Type")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = parse_qs(url.query)
+        if url.path == "/stats":
+            return self._send(200, self.index.stats())
+        if url.path != "/search":
+            return self._send(404, {"error": f"Unknown path {url.path}"})
+        try:
+            k = min(int(params.get("k", ["5"])[0]), 100)
+        except ValueError:
+            return self._send(400, {"error": "k must be an integer"})
+        query = params.get("q", [""])[0]
+        mode = params.get("mode", ["hybrid" if self.vectors else "bm25"])[0]
+        if mode not in ("bm25", "hybrid", "vector") or (mode != "bm25" and not self.vectors):
+            return self._send(400, {"error": f"Unsupported mode {mode}"})
+        started = time.perf_counter()
+        if mode == "hybrid":
+            results = self.vectors.hybrid_search(self.index, query, k)
+        elif mode == "vector":
+            scores = dict(self.vectors.search(query, k))
+            results = sorted((dict(r, score=scores[r["id"]]) for r in self.index.score_chunks(query, list(scores))),
+                             key=itemgetter("score"), reverse=True)
+        else:
+            results = self.index.search(query, k)
+        self._send(200, {"results": results, "mode": mode,
+                         "took_ms": round((time.perf_counter() - started) * 1000, 3)})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path == "/match" and self.matcher:
+            return self._match()
+        if path != "/chunks":
+            return self._send(404, {"error": f"Unknown path {self.path}"})
+        if not self.accept_chunks:
+            return self._send(403, {"error": "This index follows a store; add documents with kb_ingest.py"})
+        if not self._local_writer():
+            return self._send(403, {"error": "POST /chunks is only accepted from local tools, not web pages"})
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            chunks = json.loads(self.rfile.read(length)).get("chunks", [])
+            added = self.index.add_many(chunks)
+            if self.matcher:
+                self.matcher.add_many(chunks)
+        except (ValueError, KeyError, AttributeError, TypeError):
+            return self._send(400, {"error": "Expected {\"chunks\": [{\"id\", \"text\", \"source\"}]}"})
+        self._send(200, {"added": added, **self.index.stats()})
+
+    def _local_writer(self) -> bool:
+        """A client on this machine, not a web page from another origin (any page can send a simple POST)."""
+        try:
+            if not ipaddress.ip_address(self.client_address[0]).is_loopback:
+                return False
+        except ValueError:
+            return False
+        origin = self.headers.get("Origin")
+        return origin is None or (self.allow_origin != "*" and origin == self.allow_origin)
+
+    def _match(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            body = json.loads(self.rfile.read(length))
+            requested = [str(item) for item in body.get("products_requested", [])]
+            k = min(int(body.get("k", 3)), 20)
+        except (ValueError, AttributeError, TypeError):
+            return self._send(400, {"error": "Expected {\"products_requested\": [\"...\"], \"k\": 3}"})
+        started = time.perf_counter()
+        result = self.matcher.match(requested, k)
+        self._send(200, dict(result, took_ms=round((time.perf_counter() - started) * 1000, 3)))
+
+
+def serve(index: BM25Index, host: str = "127.0.0.1", port: int = 8766, vectors=None,
+          matcher=None, allow_origin: str = "*", accept_chunks: bool = True) -> ThreadingHTTPServer:
+    handler = type("ConfiguredSearchHandler", (SearchHandler,),
+                   {"index": index, "vectors": vectors, "matcher": matcher, "allow_origin": allow_origin,
+                    "accept_chunks": accept_chunks})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def follow(index: BM25Index, store, snapshot: str, stop: threading.Event, vectors=None, matcher=None):
+    """Replays the store's change log into the served index (vectors, products) and refreshes the snapshots."""
+    while not stop.wait(SYNC_INTERVAL):
+        if store.generation() == index.generation:
+            continue
+        started = time.perf_counter()
+        applied = index.sync(store)
+        index.warm()
+        index.save(snapshot)
+        if vectors is not None:
+            vectors.sync(store)
+            vectors.save(store.path + ".vectors.json")
+        if matcher is not None:
+            matcher.sync(store)
+            matcher.save(store.path + ".products.json")
+        print(f"Synced {applied} change(s) in {(time.perf_counter() - started) * 1000:.0f} ms "
+              f"({len(index)} chunks)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="BM25 knowledge-base index and search service")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("build", help="chunk text files and write an index")
+    p.add_argument("files", nargs="+")
+    p.add_argument("-o", "--output", default="kb_index.json")
+    p = sub.add_parser("search", help="query an index")
+    p.add_argument("index", nargs="?")
+    p.add_argument("query")
+    p.add_argument("-k", type=int, default=5)
+    p.add_argument("--db", help="kb_ingest.py store to index (snapshot: INDEX or DB.index.json)")
+    p = sub.add_parser("serve", help="serve an index over HTTP")
+    p.add_argument("index", nargs="?")
+    p.add_argument("--db", help="kb_ingest.py store to index and follow (snapshot: INDEX or DB.index.json)")
+    p.add_argument("--vectors", action="store_true", help="also embed the store for hybrid search (needs --db)")
+    p.add_argument("--products", action="store_true", help="also index product specs for POST /match")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8766)
+    p.add_argument("--allow-origin", default="*", help="CORS origin of the page, e.g. http://127.0.0.1:8000")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        index = BM25Index()
+        for path in args.files:
+            index.add_many(chunk_text(read_source(path), path))
+        index.save(args.output)
+        stats = index.stats()
+        print(f"Indexed {stats['chunks']} chunks, {stats['terms']} terms -> {args.output}")
+        return 0
+
+    store = None
+    if args.db:
+        from kb_ingest import KnowledgeStore
+        store = KnowledgeStore(args.db)
+        snapshot = args.index or args.db + ".index.json"
+        index = BM25Index.from_store(store, snapshot)
+    elif args.index:
+        index = BM25Index.load(args.index)
+    else:
+        parser.error("an index file or --db is required")
+    if args.command == "search":
+        started = time.perf_counter()
+        results = index.search(args.query, args.k)
+        elapsed = (time.perf_counter() - started) * 1000
+        for r in results:
+            print(f"{r['score']:8.3f}  [{r['source']}] {r['text'][:100].replace(chr(10), ' ')}")
+        print(f"{len(results)} result(s) in {elapsed:.2f} ms")
+        return 0
+
+    vectors = None
+    if args.vectors:
+        if not store:
+            parser.error("--vectors needs --db")
+        from kb_vectors import VectorIndex
+        vectors = VectorIndex.from_store(store, args.db + ".vectors.json")
+    matcher = None
+    if args.products:
+        from rfq_matcher import ProductIndex
+        if store:
+            matcher = ProductIndex.from_store(store, args.db + ".products.json")
+        else:
+            matcher = ProductIndex()
+            matcher.add_many({'id': index.ids[doc], 'text': index.texts[doc], 'source': index.sources[doc]}
+                             for doc in range(len(index.ids)) if doc not in index.deleted)
+        print(f"Indexed {len(matcher)} product(s) for /match")
+    index.warm()
+    stop = threading.Event()
+    if store:
+        threading.Thread(target=follow, args=(index, store, snapshot, stop, vectors, matcher), daemon=True).start()
+    server = serve(index, args.host, args.port, vectors, matcher, args.allow_origin, accept_chunks=store is None)
+    print(f"Knowledge-base search on http://{args.host}:{args.port}/search?q=...  ({len(index)} chunks)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        stop.set()
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
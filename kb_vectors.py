@@ -0,0 +1,629 @@
+#!/usr/bin/env python3
+"""
+Offline vector retrieval for the knowledge base, fused with BM25.
+
+Keyword retrieval (kb_search.py, matchProductFromKB) misses paraphrases
+("bucket capacity" vs "heaped volume") and RFQs written in another language
+than the spec sheets. Chunks are embedded on the CPU, with no network:
+
+  HashedEmbedder  signed feature hashing of words, accent-folded character
+                  4-grams (excavator / excavadora share most of them) and
+                  concepts from a small EN/ES/ZH trade lexicon (CONCEPTS,
+                  extendable with --lexicon), so paraphrases and translations
+                  land on the same features
+  ModelEmbedder   a local sentence-transformers model directory, if that
+                  package is installed (--model PATH; never downloads)
+
+Vectors are stored quantized (int8 with a scale per row, or float16) in one
+contiguous buffer. With NumPy the rows are clustered with spherical k-means
+into an IVF index and a query scans only the nprobe closest lists; without
+it every row is scanned, which is fine for a few thousand chunks. Hybrid
+search re-ranks the union of the BM25 and vector candidates by a weighted
+sum of normalized BM25 and cosine scores.
+
+    python kb_vectors.py build --db kb.sqlite               # writes kb.sqlite.vectors.json
+    python kb_vectors.py search --db kb.sqlite "heaped volume 1.2"
+    python kb_vectors.py bench --db kb.sqlite               # IVF recall vs an exact scan
+    python kb_search.py serve --db kb.sqlite --vectors      # GET /search?q=...&mode=hybrid
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import zlib
+import heapq
+import base64
+import struct
+import argparse
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from kb_search import BM25Index, COMPACT_RATIO, tokenize
+
+# NumPy is optional: it vectorizes batch embedding and scoring and enables the IVF index
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+VECTORS_VERSION = 2
+DIM = 384
+BATCH = 256           # chunks embedded per batch during ingest
+IVF_MIN = 2048        # below this many rows a full scan is as fast as probing lists
+NPROBE = 16           # IVF lists scanned per query, at least; a sixteenth of them on large indexes
+KMEANS_ITERATIONS = 8
+KMEANS_SAMPLE = 64    # training rows per list
+CONCEPT_WEIGHT = 2.0
+TERM_CACHE = 200000   # terms whose hashed features are kept
+NGRAM_WEIGHT = 0.35
+HYBRID_ALPHA = 0.5    # weight of the vector score in hybrid ranking
+CANDIDATES = 4        # each side contributes k * CANDIDATES candidates
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the this to with we our you your
+please need want would like looking quote about
+de del la las el los en y o un una unos unas para por con que se su sus al es lo le les como
+necesitamos necesito queremos busco cotizar favor
+""".split())
+
+# Concept -> surface forms (English, Spanish, Chinese); matched after accent folding and stopword removal
+CONCEPTS = {
+    'bucket_capacity': ['bucket capacity', 'heaped volume', 'heaped capacity', 'bucket volume', 'struck capacity',
+                        'capacidad del cucharon', 'capacidad de cucharon', 'volumen colmado', 'capacidad colmada',
+                        '斗容', '斗容量', '铲斗容量'],
+    'operating_weight': ['operating weight', 'machine weight', 'tonnage', 'ton class', 'peso operativo',
+                         'peso de operacion', 'tonelaje', '整机重量', '工作重量', '吨位'],
+    'engine_power': ['engine power', 'rated power', 'horsepower', 'hp', 'kw', 'potencia del motor',
+                     'potencia nominal', 'potencia', '发动机功率', '额定功率', '马力', '功率'],
+    'engine': ['engine', 'motor', '发动机'],
+    'excavator': ['excavator', 'digger', 'excavadora', 'retroexcavadora', '挖掘机', '挖机'],
+    'wheel_loader': ['wheel loader', 'front loader', 'cargadora', 'pala cargadora', '装载机'],
+    'forklift': ['forklift', 'fork lift', 'montacargas', 'carretilla elevadora', '叉车'],
+    'crane': ['crane', 'grua', '起重机', '吊车'],
+    'ton': ['ton', 'tons', 'tonne', 'tonnes', 'tonelada', 'toneladas', '吨'],
+    'lifting_capacity': ['lifting capacity', 'load capacity', 'rated load', 'payload', 'capacidad de carga',
+                         'capacidad de elevacion', '额定载荷', '起重量', '载重'],
+    'digging_depth': ['digging depth', 'profundidad de excavacion', '挖掘深度'],
+    'dimensions': ['dimensions', 'overall size', 'dimensiones', 'medidas', '尺寸', '外形尺寸'],
+    'fuel_consumption': ['fuel consumption', 'consumo de combustible', '油耗'],
+    'hydraulic': ['hydraulic', 'hidraulico', 'hidraulica', '液压'],
+    'pump': ['pump', 'bomba', '泵'],
+    'price': ['price', 'quotation', 'cost', 'precio', 'cotizacion', '价格', '报价'],
+    'delivery_time': ['delivery time', 'lead time', 'tiempo de entrega', 'plazo de entrega', '交货期', '交期'],
+    'warranty': ['warranty', 'guarantee', 'garantia', '质保', '保修'],
+    'payment_terms': ['payment terms', 'letter of credit', 'forma de pago', 'condiciones de pago', '付款方式'],
+    'shipping': ['shipping', 'freight', 'shipment', 'envio', 'flete', '运费', '海运'],
+    'minimum_order': ['moq', 'minimum order', 'pedido minimo', '起订量'],
+    'spare_parts': ['spare parts', 'repuestos', 'refacciones', '配件', '备件'],
+    'certificate': ['certificate', 'certification', 'certificado', 'certificacion', '认证', '证书'],
+    'voltage': ['voltage', 'voltaje', 'tension', '电压'],
+    'speed': ['travel speed', 'max speed', 'velocidad', '行走速度', '速度'],
+    'tire': ['tire', 'tyre', 'neumatico', 'llanta', '轮胎'],
+    'track': ['crawler', 'oruga', '履带'],
+    'used': ['used', 'second hand', 'usado', 'segunda mano', '二手'],
+    'electric': ['electric', 'electrico', 'electrica', '电动'],
+    'diesel': ['diesel', '柴油'],
+}
+
+
+def fold(text: str) -> str:
+    """Strips accents from Latin letters (cucharón -> cucharon); CJK and Hangul come back unchanged."""
+    if text.isascii():
+        return text
+    decomposed = unicodedata.normalize('NFKD', text)
+    return unicodedata.normalize('NFC', ''.join(c for c in decomposed if not unicodedata.combining(c)))
+
+
+def _terms(text: str) -> List[str]:
+    return [t for t in tokenize(fold(text)) if t not in STOPWORDS]
+
+
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    h = zlib.crc32(feature.encode('utf-8'))
+    return h % dim, (1.0 if h >> 31 else -1.0)
+
+
+class HashedEmbedder:
+    """Feature-hashing embedder: words, character 4-grams and lexicon concepts."""
+
+    def __init__(self, dim: int = DIM, lexicon: Optional[Dict[str, List[str]]] = None):
+        self.dim = dim
+        self.concepts = dict(CONCEPTS)
+        for concept, phrases in (lexicon or {}).items():
+            self.concepts[concept] = self.concepts.get(concept, []) + list(phrases)
+        self._phrases: Dict[Tuple[str, ...], str] = {}
+        # One-character CJK phrases (泵, 吨): inside a run tokenize only yields bigrams, so they are found in the text
+        self._chars: Dict[str, str] = {}
+        for concept, phrases in self.concepts.items():
+            for phrase in phrases:
+                key = tuple(_terms(phrase))
+                if len(key) == 1 and len(key[0]) == 1 and not key[0].isdigit():
+                    self._chars[key[0]] = concept
+                elif key:
+                    self._phrases[key] = concept
+        self._starts = {key[0] for key in self._phrases}
+        self._longest = max((len(key) for key in self._phrases), default=0)
+        self._cache: Dict[str, List[Tuple[int, float]]] = {}
+        lexicon_digest = zlib.crc32(json.dumps(self.concepts, sort_keys=True).encode('utf-8'))
+        self.signature = f"hashed:{dim}:{lexicon_digest:08x}"
+
+    def _term_buckets(self, term: str) -> List[Tuple[int, float]]:
+        """(dimension, signed weight) of a term's word and character 4-gram features, cached."""
+        cached = self._cache.get(term)
+        if cached is None:
+            features = [('w:' + term, 1.0)]
+            if term.isalpha() and term.isascii() and len(term) > 3:
+                marked = f"<{term}>"
+                grams = [marked[i:i + 4] for i in range(len(marked) - 3)]
+                features += [('g:' + gram, NGRAM_WEIGHT * 3 / len(grams)) for gram in grams]
+            cached = []
+            for feature, value in features:
+                i, sign = _bucket(feature, self.dim)
+                cached.append((i, sign * value))
+            if len(self._cache) < TERM_CACHE:
+                self._cache[term] = cached
+        return cached
+
+    def sparse(self, text: str) -> Dict[int, float]:
+        """Unnormalized embedding as {dimension: value}; term and concept counts are dampened with 1 + log."""
+        terms = _terms(text)
+        row: Dict[int, float] = {}
+        for term, count in Counter(terms).items():
+            weight = 1.0 + math.log(count)
+            for i, value in self._term_buckets(term):
+                row[i] = row.get(i, 0.0) + weight * value
+        for concept, count in self._concepts(terms, text).items():
+            i, sign = _bucket('c:' + concept, self.dim)
+            row[i] = row.get(i, 0.0) + sign * CONCEPT_WEIGHT * (1.0 + math.log(count))
+        return row
+
+    def concepts_in(self, text: str) -> Counter:
+        """Lexicon concepts mentioned in text, with counts."""
+        return self._concepts(_terms(text), text)
+
+    def _concepts(self, terms: List[str], text: str) -> Counter:
+        concepts = Counter()
+        if self._chars and not text.isascii():
+            folded = unicodedata.normalize('NFKC', fold(text))  # the form tokenize sees
+            for char, concept in self._chars.items():
+                if char in folded:
+                    concepts[concept] += folded.count(char)
+        phrases, starts = self._phrases, self._starts
+        for i, term in enumerate(terms):
+            if term in starts:
+                for n in range(1, min(self._longest, len(terms) - i) + 1):
+                    concept = phrases.get(tuple(terms[i:i + n]))
+                    if concept:
+                        concepts[concept] += 1
+        return concepts
+
+    def embed(self, text: str) -> List[float]:
+        row = [0.0] * self.dim
+        for i, value in self.sparse(text).items():
+            row[i] = value
+        norm = math.sqrt(sum(v * v for v in row)) or 1.0
+        return [v / norm for v in row]
+
+    def embed_batch(self, texts: Sequence[str]):
+        """Normalized rows for a batch: an ndarray with NumPy, else a list of lists."""
+        if np is None:
+            return [self.embed(text) for text in texts]
+        rows, cols, values = [], [], []
+        for r, text in enumerate(texts):
+            sparse = self.sparse(text)
+            rows.extend([r] * len(sparse))
+            cols.extend(sparse)
+            values.extend(sparse.values())
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        matrix[np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)] = values
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+
+class ModelEmbedder:
+    """A local sentence-transformers model, on the CPU."""
+
+    def __init__(self, path: str):
+        if SentenceTransformer is None:
+            raise ValueError("--model needs the sentence-transformers package")
+        if not os.path.isdir(path):
+            raise ValueError(f"{path}: not a local model directory")
+        self.model = SentenceTransformer(path, device='cpu')
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.signature = f"model:{os.path.abspath(path)}:{self.dim}"
+
+    def embed(self, text: str) -> List[float]:
+        return list(self.embed_batch([text])[0])
+
+    def embed_batch(self, texts: Sequence[str]):
+        return self.model.encode(list(texts), batch_size=BATCH, normalize_embeddings=True,
+                                 convert_to_numpy=True, show_progress_bar=False)
+
+
+class VectorIndex:
+    """Quantized embeddings of the chunks, with an IVF index when NumPy is available."""
+
+    def __init__(self, embedder=None, dtype: str = 'int8'):
+        if dtype not in ('int8', 'float16'):
+            raise ValueError("dtype must be int8 or float16")
+        self.embedder = embedder or HashedEmbedder()
+        self.dim = self.embedder.dim
+        self.dtype = dtype
+        self.row_bytes = self.dim * (1 if dtype == 'int8' else 2)
+        self.ids: List[str] = []
+        self.blob = bytearray()        # row-major quantized vectors
+        self.scales = array('f')       # int8: value = byte * scale; float16: 1.0
+        self.deleted = set()
+        self.generation = 0
+        self.centroids = None          # (nlist, dim) float32 ndarray once trained
+        self.assign = array('I')       # row -> list
+        self.lists: List[array] = []
+        self.trained_rows = 0
+        self._row_of: Optional[Dict[str, int]] = None
+        self._matrix = None            # cached float32 view of blob, rebuilt after adds
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids) - len(self.deleted)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._live_rows()
+
+    def _live_rows(self) -> Dict[str, int]:
+        if self._row_of is None:
+            self._row_of = {cid: row for row, cid in enumerate(self.ids) if row not in self.deleted}
+        return self._row_of
+
+    def _quantize(self, rows) -> Tuple[bytes, List[float]]:
+        if np is not None:
+            matrix = np.asarray(rows, dtype=np.float32)
+            if self.dtype == 'float16':
+                return matrix.astype('<f2').tobytes(), [1.0] * len(matrix)
+            peak = np.abs(matrix).max(axis=1)
+            peak[peak == 0] = 1.0
+            return (np.rint(matrix * (127.0 / peak[:, None])).astype(np.int8).tobytes(),
+                    (peak / 127.0).tolist())
+        data, scales = bytearray(), []
+        for row in rows:
+            if self.dtype == 'float16':
+                data += struct.pack(f'<{self.dim}e', *row)
+                scales.append(1.0)
+            else:
+                peak = max(map(abs, row)) or 1.0
+                data += array('b', [round(v * 127.0 / peak) for v in row]).tobytes()
+                scales.append(peak / 127.0)
+        return bytes(data), scales
+
+    def add_many(self, chunks: Iterable[Tuple[str, str]], batch: int = BATCH) -> int:
+        """Embeds (chunk_id, text) pairs in batches; returns how many were added."""
+        added, pending = 0, []
+        for item in chunks:
+            pending.append(item)
+            if len(pending) >= batch:
+                added += self._add_batch(pending)
+                pending = []
+        if pending:
+            added += self._add_batch(pending)
+        if self.centroids is None or len(self.ids) >= 2 * self.trained_rows:
+            self.train()
+        return added
+
+    def _add_batch(self, items: List[Tuple[str, str]]) -> int:
+        embedded = self.embedder.embed_batch([text for _, text in items])
+        data, scales = self._quantize(embedded)
+        with self._lock:
+            first = len(self.ids)
+            self.blob += data
+            self.scales.extend(scales)
+            for n, (chunk_id, _) in enumerate(items):
+                self.ids.append(chunk_id)
+                if self._row_of is not None:
+                    self._row_of[chunk_id] = first + n
+            self._matrix = None
+            if self.centroids is not None:
+                nearest = (np.asarray(embedded, dtype=np.float32) @ self.centroids.T).argmax(axis=1)
+                for n, lst in enumerate(nearest.tolist()):
+                    self.assign.append(lst)
+                    self.lists[lst].append(first + n)
+        return len(items)
+
+    def remove(self, chunk_id: str) -> bool:
+        with self._lock:
+            row = self._live_rows().pop(chunk_id, None)
+            if row is None:
+                return False
+            self.deleted.add(row)
+            return True
+
+    def compact(self):
+        """Drops the deleted rows from the buffer (no re-embedding) and retrains the lists."""
+        with self._lock:
+            live = [row for row in range(len(self.ids)) if row not in self.deleted]
+            size = self.row_bytes
+            self.blob = bytearray().join(self.blob[row * size:(row + 1) * size] for row in live)
+            self.scales = array('f', [self.scales[row] for row in live])
+            self.ids = [self.ids[row] for row in live]
+            self.deleted, self._row_of, self._matrix = set(), None, None
+            self.centroids, self.lists, self.assign, self.trained_rows = None, [], array('I'), 0
+        self.train()
+
+    def _dense(self):
+        """All rows as a float32 (rows, dim) matrix, cached until the next add (NumPy only)."""
+        if self._matrix is None:
+            dtype = np.int8 if self.dtype == 'int8' else np.dtype('<f2')
+            matrix = np.frombuffer(bytes(self.blob), dtype=dtype).reshape(-1, self.dim).astype(np.float32)
+            if self.dtype == 'int8':
+                matrix *= np.frombuffer(self.scales.tobytes(), dtype=np.float32)[:, None]
+            self._matrix = matrix
+        return self._matrix
+
+    def _rows_matrix(self, rows):
+        return self._dense()[np.asarray(list(rows), dtype=np.intp)]
+
+    def _row(self, row: int) -> Sequence[float]:
+        offset = row * self.row_bytes
+        if self.dtype == 'float16':
+            return struct.unpack_from(f'<{self.dim}e', self.blob, offset)
+        scale = self.scales[row]
+        return [v * scale for v in array('b', self.blob[offset:offset + self.row_bytes])]
+
+    def train(self, seed: int = 0):
+        """Spherical k-means over a sample of the live rows; about 2 * sqrt(rows) lists."""
+        if np is None:
+            return
+        live = np.asarray([row for row in range(len(self.ids)) if row not in self.deleted], dtype=np.intp)
+        if len(live) < IVF_MIN:
+            with self._lock:
+                self.centroids, self.lists, self.assign, self.trained_rows = None, [], array('I'), 0
+            return
+        nlist = int(2 * math.sqrt(len(live)))
+        rng = np.random.default_rng(seed)
+        matrix = self._dense()
+        sample = matrix[rng.choice(live, size=min(len(live), nlist * KMEANS_SAMPLE), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            labels = (sample @ centroids.T).argmax(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            centroids = np.where(empty[:, None], centroids, sums / np.where(norms == 0, 1.0, norms))
+        labels = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), 8192):
+            labels[start:start + 8192] = (matrix[start:start + 8192] @ centroids.T).argmax(axis=1)
+        lists = [array('I') for _ in range(nlist)]
+        for row, lst in enumerate(labels.tolist()):
+            lists[lst].append(row)
+        with self._lock:
+            self.centroids, self.lists = centroids.astype(np.float32), lists
+            self.assign, self.trained_rows = array('I', labels.tolist()), len(self.ids)
+
+    def _query(self, text: str):
+        row = self.embedder.embed_batch([text])[0]
+        return np.asarray(row, dtype=np.float32) if np is not None else row
+
+    def search(self, text: str, k: int = 5, nprobe: Optional[int] = None, exact: bool = False) -> List[Tuple[str, float]]:
+        """Top-k (chunk_id, cosine), best first; scans the nprobe closest IVF lists unless exact."""
+        if k <= 0 or not self.ids:
+            return []
+        q = self._query(text)
+        with self._lock:
+            if np is None:
+                scored = ((sum(a * b for a, b in zip(q, self._row(row))), row)
+                          for row in range(len(self.ids)) if row not in self.deleted)
+                return [(self.ids[row], round(score, 4)) for score, row in heapq.nlargest(k, scored)]
+            matrix = self._dense()
+            if self.centroids is not None and not exact:
+                probe = np.argsort(-(self.centroids @ q))[:nprobe or max(NPROBE, len(self.lists) // 16)]
+                rows = np.concatenate([np.frombuffer(self.lists[lst], dtype=np.uint32)
+                                       for lst in probe.tolist()]).astype(np.intp)
+                scores = matrix[rows] @ q
+            else:
+                rows = np.arange(len(matrix))
+                scores = matrix @ q
+            if self.deleted:
+                keep = ~np.isin(rows, np.fromiter(self.deleted, dtype=np.intp))
+                rows, scores = rows[keep], scores[keep]
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+                top = top[np.argsort(-scores[top])]
+            else:
+                top = np.argsort(-scores)
+            return [(self.ids[rows[i]], round(float(scores[i]), 4)) for i in top.tolist()]
+
+    def score(self, text: str, chunk_ids: Iterable[str]) -> Dict[str, float]:
+        """Exact cosine of the query against the given chunks."""
+        q = self._query(text)
+        with self._lock:
+            live = self._live_rows()
+            pairs = [(cid, live[cid]) for cid in chunk_ids if cid in live]
+            if not pairs:
+                return {}
+            if np is None:
+                return {cid: sum(a * b for a, b in zip(q, self._row(row))) for cid, row in pairs}
+            scores = self._rows_matrix(row for _, row in pairs) @ q
+            return {cid: float(s) for (cid, _), s in zip(pairs, scores.tolist())}
+
+    def hybrid_search(self, bm25: BM25Index, text: str, k: int = 5, alpha: float = HYBRID_ALPHA) -> List[Dict]:
+        """BM25 and vector candidates re-ranked by alpha * cosine + (1 - alpha) * BM25 / best BM25."""
+        pool = k * CANDIDATES
+        keyword = {r['id']: r['score'] for r in bm25.search(text, pool)}
+        semantic = dict(self.search(text, pool))
+        missing = [cid for cid in keyword if cid not in semantic]
+        semantic.update(self.score(text, missing))
+        missing = [cid for cid in semantic if cid not in keyword]
+        keyword.update({r['id']: r['score'] for r in bm25.score_chunks(text, missing)})
+        top = max(keyword.values(), default=0.0) or 1.0
+        fused = {cid: alpha * max(semantic.get(cid, 0.0), 0.0) + (1 - alpha) * keyword.get(cid, 0.0) / top
+                 for cid in set(keyword) | set(semantic)}
+        best = heapq.nlargest(k, fused.items(), key=lambda item: item[1])
+        chunks = {r['id']: r for r in bm25.score_chunks(text, [cid for cid, _ in best])}
+        return [dict(chunks[cid], score=round(score, 4), bm25=round(keyword.get(cid, 0.0), 4),
+                     vector=round(semantic.get(cid, 0.0), 4)) for cid, score in best if cid in chunks]
+
+    def sync(self, store) -> int:
+        """Applies the kb_ingest store's changes since the last sync (see BM25Index.sync)."""
+        applied, pending = 0, []
+        for seq, op, chunk_id, text, _ in store.changes_since(self.generation):
+            if op == 'add' and text is not None and chunk_id not in self:
+                pending.append((chunk_id, text))
+            elif op == 'remove':
+                if pending:
+                    applied += self.add_many(pending)
+                    pending = []
+                applied += self.remove(chunk_id)
+            self.generation = seq
+        if pending:
+            applied += self.add_many(pending)
+        if self.deleted and len(self.deleted) > COMPACT_RATIO * len(self.ids):
+            self.compact()
+        return applied
+
+    @classmethod
+    def from_store(cls, store, snapshot: Optional[str] = None, embedder=None, dtype: str = 'int8') -> 'VectorIndex':
+        """Vectors of a kb_ingest store: the snapshot plus later changes, or every chunk embedded afresh."""
+        embedder = embedder or HashedEmbedder()
+        index = None
+        if snapshot and os.path.exists(snapshot):
+            try:
+                index = cls.load(snapshot, embedder)
+            except ValueError:
+                pass
+        saved = index.generation if index else None
+        if index is None:
+            index = cls(embedder, dtype)
+            index.generation = store.generation()
+            index.add_many((chunk_id, text) for chunk_id, text, _ in store.iter_chunks())
+        index.sync(store)
+        if snapshot and index.generation != saved:
+            index.save(snapshot)
+        return index
+
+    def stats(self) -> Dict:
+        return {'vectors': len(self), 'deleted': len(self.deleted), 'dim': self.dim, 'dtype': self.dtype,
+                'bytes': len(self.blob), 'lists': len(self.lists), 'embedder': self.embedder.signature}
+
+    def save(self, path: str):
+        data = {'version': VECTORS_VERSION, 'embedder': self.embedder.signature, 'dtype': self.dtype,
+                'ids': self.ids, 'deleted': sorted(self.deleted), 'generation': self.generation,
+                'blob': base64.b64encode(bytes(self.blob)).decode('ascii'),
+                'scales': base64.b64encode(self.scales.tobytes()).decode('ascii'),
+                'assign': base64.b64encode(self.assign.tobytes()).decode('ascii'),
+                'trained_rows': self.trained_rows,
+                'centroids': base64.b64encode(self.centroids.tobytes()).decode('ascii')
+                if self.centroids is not None else None}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path: str, embedder=None) -> 'VectorIndex':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        index = cls(embedder, data.get('dtype', 'int8'))
+        if data.get('version') != VECTORS_VERSION or data.get('embedder') != index.embedder.signature:
+            raise ValueError(f"{path}: built with another version or embedder; rebuild it")
+        index.ids, index.deleted, index.generation = data['ids'], set(data['deleted']), data['generation']
+        index.blob = bytearray(base64.b64decode(data['blob']))
+        index.scales = array('f', base64.b64decode(data['scales']))
+        if data['centroids'] and np is not None:
+            index.centroids = np.frombuffer(base64.b64decode(data['centroids']), dtype=np.float32).reshape(-1, index.dim)
+            index.assign = array('I', base64.b64decode(data['assign']))
+            index.trained_rows = data['trained_rows']
+            index.lists = [array('I') for _ in range(len(index.centroids))]
+            for row, lst in enumerate(index.assign):
+                index.lists[lst].append(row)
+        return index
+
+
+def make_embedder(args):
+    if args.model:
+        return ModelEmbedder(args.model)
+    lexicon = None
+    if args.lexicon:
+        with open(args.lexicon, 'r', encoding='utf-8') as f:
+            lexicon = json.load(f)
+    return HashedEmbedder(args.dim, lexicon)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline vector and hybrid retrieval for the knowledge base")
+    # Options go after the command, as in kb_search.py and kb_ingest.py
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--db', default='kb.sqlite', help="kb_ingest.py store (default: kb.sqlite)")
+    common.add_argument('--model', help="local sentence-transformers model directory")
+    common.add_argument('--lexicon', help="JSON {concept: [phrases]} added to the built-in lexicon")
+    common.add_argument('--dim', type=int, default=DIM, help="hashed embedding size")
+    common.add_argument('--dtype', choices=('int8', 'float16'), default='int8')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('build', parents=[common], help="embed the store and write DB.vectors.json")
+    p = sub.add_parser('search', parents=[common], help="hybrid (default), vector or bm25 search")
+    p.add_argument('query')
+    p.add_argument('-k', type=int, default=5)
+    p.add_argument('--mode', choices=('hybrid', 'vector', 'bm25'), default='hybrid')
+    p = sub.add_parser('bench', parents=[common], help="IVF recall@k and latency against an exact scan")
+    p.add_argument('-k', type=int, default=10)
+    p.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    from kb_ingest import KnowledgeStore
+    store = KnowledgeStore(args.db)
+    try:
+        embedder = make_embedder(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    started = time.perf_counter()
+    vectors = VectorIndex.from_store(store, args.db + '.vectors.json', embedder, args.dtype)
+    if args.command == 'build':
+        stats = vectors.stats()
+        print(f"{stats['vectors']} vectors ({stats['dtype']}, {stats['lists']} IVF lists, "
+              f"{stats['bytes'] / 1e6:.1f} MB) in {time.perf_counter() - started:.1f}s")
+        return 0
+
+    if args.command == 'bench':
+        texts = [text for _, text, _ in store.iter_chunks()]
+        step = max(1, len(texts) // args.queries)
+        queries = [' '.join(texts[i].split()[:12]) for i in range(0, len(texts), step)][:args.queries]
+        hits = total = 0
+        timings = []
+        for query in queries:
+            exact = {cid for cid, _ in vectors.search(query, args.k, exact=True)}
+            t0 = time.perf_counter()
+            approx = {cid for cid, _ in vectors.search(query, args.k)}
+            timings.append((time.perf_counter() - t0) * 1000)
+            hits += len(exact & approx)
+            total += len(exact)
+        timings.sort()
+        print(f"{len(queries)} queries over {len(vectors)} vectors: recall@{args.k} {hits / max(total, 1):.3f}, "
+              f"p50 {timings[len(timings) // 2]:.2f} ms, p95 {timings[int(len(timings) * 0.95)]:.2f} ms")
+        return 0
+
+    bm25 = BM25Index.from_store(store, args.db + '.index.json')
+    t0 = time.perf_counter()
+    if args.mode == 'hybrid':
+        results = vectors.hybrid_search(bm25, args.query, args.k)
+    elif args.mode == 'bm25':
+        results = bm25.search(args.query, args.k)
+    else:
+        scores = dict(vectors.search(args.query, args.k))
+        results = [dict(r, score=scores[r['id']]) for r in bm25.score_chunks(args.query, list(scores))]
+        results.sort(key=lambda r: r['score'], reverse=True)
+    elapsed = (time.perf_counter() - t0) * 1000
+    for r in results:
+        print(f"{r['score']:8.3f}  [{os.path.basename(r['source'])}] {r['text'][:100].replace(chr(10), ' ')}")
+    print(f"{len(results)} result(s) in {elapsed:.2f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
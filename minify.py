@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Dependency-free minifiers for the deploy build (JS, CSS, HTML) plus the
+pre-compressed .gz/.br variants served to clients that accept them.
+
+The JS minifier only removes comments and whitespace - it never renames or
+rewrites code - and re-lexes its own output to confirm the token stream is
+unchanged; on any doubt it returns the source untouched.
+
+    python minify.py app_v18_90.js app_part_rfq.js ui-fix.css index.html
+"""
+
+import re
+import sys
+import gzip
+
+from js_lexer import (tokenize, significant, JSLexError,
+                      WS, NL, COMMENT, TEMPLATE, REGEX, NUMBER, IDENT, PUNCT)
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# A newline after any other punctuator can go: a statement cannot end on it
+_STATEMENT_END = frozenset((')', ']', '}', '++', '--'))
+# ...nor before these, which can only continue an expression
+_NO_ASI_BEFORE = frozenset((')', ']', '}', ',', ';', '.', '?.', '?', ':', '=', '==', '===', '!=', '!==',
+                            '&&', '||', '??', '*', '%', '<', '>', '<=', '>=', '=>', '*=', '%=',
+                            '&=', '|=', '^=', '&', '|', '^', '<<', '>>', '>>>', '**'))
+
+
+def _needs_space(a, b) -> bool:
+    """Whether two tokens would merge (or change meaning) if written back to back."""
+    if a.type in (IDENT, NUMBER) and b.type in (IDENT, NUMBER):
+        return True
+    if a.type == NUMBER and b.value.startswith('.'):
+        return True  # 1 .toString()
+    if a.type == REGEX and b.type == IDENT:
+        return True  # /x/ in y  ->  /x/in would read as flags
+    if a.type == IDENT and b.type == TEMPLATE:
+        return True  # keep `x \`..\`` from turning into a tagged template
+    if a.type == PUNCT and b.type in (PUNCT, REGEX):
+        last, first = a.value[-1], b.value[0]
+        if last in '+-' and first == last:
+            return True  # a + +b, a - --b
+        if last == '/' and first in '/*':
+            return True  # a / /re/  ->  a//re/ would start a comment
+        if last == '<' and b.value.startswith('!'):
+            return True  # a < !b  ->  a<!--b is an HTML-style comment
+    return False
+
+
+def minify_js(src: str) -> str:
+    """Strips comments and redundant whitespace. Returns src unchanged if it cannot be lexed safely."""
+    try:
+        tokens = list(tokenize(src))
+    except JSLexError:
+        return src
+    out = []
+    prev = None
+    gap = None  # None, ' ' or '\n': the strongest separator seen since prev
+    for tok in tokens:
+        if tok.type in (WS, NL, COMMENT):
+            if tok.type == NL or (tok.type == COMMENT and ('\n' in tok.value or tok.value.startswith('//'))):
+                gap = '\n'
+            elif gap is None:
+                gap = ' '
+            continue
+        if prev is not None and gap is not None:
+            if gap == '\n':
+                droppable = ((prev.type == PUNCT and prev.value not in _STATEMENT_END)
+                             or (tok.type == PUNCT and tok.value in _NO_ASI_BEFORE))
+                if not droppable:
+                    out.append('\n')
+                elif _needs_space(prev, tok):
+                    out.append(' ')
+            elif _needs_space(prev, tok):
+                out.append(' ')
+        out.append(tok.value)
+        prev, gap = tok, None
+    result = ''.join(out)
+    # Self-check: the minified text must lex to the same significant tokens
+    try:
+        same = [t.value for t in significant(tokenize(result))] == [t.value for t in significant(tokens)]
+    except JSLexError:
+        same = False
+    return result if same else src
+
+
+_CSS_TOKEN_RE = re.compile(r'''/\*[\s\S]*?\*/|"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|\s+|[^\s"'/]+|/''')
+
+
+def minify_css(src: str) -> str:
+    """Drops comments and collapses whitespace; strings and calc() operators are left alone."""
+    out = []
+    for tok in _CSS_TOKEN_RE.findall(src):
+        if tok.startswith('/*'):
+            if not out or not out[-1].endswith(' '):
+                out.append(' ')
+        elif tok.isspace():
+            if out and not out[-1].endswith(' '):
+                out.append(' ')
+        else:
+            out.append(tok)
+    css = ''.join(out)
+    # `a :hover` and `and (max-width)` need their space, so only these are safe to squeeze
+    css = re.sub(r'''("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|\s*([{};,>])\s*''',
+                 lambda m: m.group(1) or m.group(2), css)
+    css = re.sub(r'''("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|:\s+''', lambda m: m.group(1) or ':', css)
+    css = re.sub(r'''("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')|;}''', lambda m: m.group(1) or '}', css)
+    return css.strip()
+
+
+_HTML_RE = re.compile(
+    r'<!--[\s\S]*?-->'
+    r'|<(script|style|pre|textarea)\b(?:[^"\'>]|"[^"]*"|\'[^\']*\')*>[\s\S]*?</\1\s*>'
+    r'|</?[A-Za-z][\w:-]*(?:[^"\'>]|"[^"]*"|\'[^\']*\')*>'
+    r'|<!(?:[^>])*>'
+    r'|[^<]+|<', re.IGNORECASE)
+_OPEN_TAG_RE = re.compile(r'<([A-Za-z][\w:-]*)((?:[^"\'>]|"[^"]*"|\'[^\']*\')*)>', re.IGNORECASE)
+_PRESERVE_ATTR_RE = re.compile(r'whitespace-pre|white-space', re.IGNORECASE)
+_SCRIPT_TYPE_RE = re.compile(r'''\btype\s*=\s*["']?([^"'\s>]+)''', re.IGNORECASE)
+_JS_TYPES = ('text/javascript', 'application/javascript', 'module')
+_VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                        'source', 'track', 'wbr'))
+
+
+def minify_html(src: str) -> str:
+    """
+    Minifies inline <script>/<style>, drops comments (conditional ones stay) and
+    collapses whitespace between tags. Attributes, <pre>, <textarea> and
+    elements styled with white-space are kept verbatim.
+    """
+    out = []
+    preserve = None  # (tag name, nesting depth) while inside a white-space element
+    for m in _HTML_RE.finditer(src):
+        chunk = m.group(0)
+        if chunk.startswith('<!--'):
+            if chunk.startswith('<!--[if') or chunk.startswith('<!--<!'):
+                out.append(chunk)
+            continue
+        raw = m.group(1)
+        if raw:
+            out.append(_minify_raw_element(chunk, raw.lower()))
+            continue
+        if chunk.startswith('<'):
+            opened = _OPEN_TAG_RE.match(chunk)
+            if preserve:
+                name = preserve[0]
+                if opened and opened.group(1).lower() == name and not chunk.endswith('/>'):
+                    preserve = (name, preserve[1] + 1)
+                elif re.match(r'</%s\s*>' % re.escape(name), chunk, re.IGNORECASE):
+                    preserve = (name, preserve[1] - 1) if preserve[1] > 1 else None
+            elif opened and _PRESERVE_ATTR_RE.search(opened.group(2) or ''):
+                tag = opened.group(1).lower()
+                if tag not in _VOID_TAGS and not chunk.endswith('/>'):
+                    preserve = (tag, 1)
+            out.append(chunk)
+            continue
+        if preserve:
+            out.append(chunk)
+        else:
+            # Keep one separator so inline elements still render with their gap
+            out.append(re.sub(r'\s+', lambda w: '\n' if '\n' in w.group(0) else ' ', chunk))
+    return ''.join(out).strip() + '\n'
+
+
+def _minify_raw_element(chunk: str, tag: str) -> str:
+    open_end = _OPEN_TAG_RE.match(chunk).end()
+    close_start = chunk.lower().rindex('</' + tag)
+    opening, body, closing = chunk[:open_end], chunk[open_end:close_start], chunk[close_start:]
+    if tag == 'style':
+        return opening + minify_css(body) + closing
+    if tag == 'script' and body.strip():
+        m = _SCRIPT_TYPE_RE.search(opening)
+        if not m or m.group(1).lower() in _JS_TYPES:
+            return opening + minify_js(body).strip() + closing
+    return chunk
+
+
+MINIFIERS = {'.js': minify_js, '.css': minify_css, '.html': minify_html}
+
+
+def compress_variants(data: bytes) -> dict:
+    """Pre-compressed copies keyed by suffix; gzip always, brotli when the module is installed."""
+    variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants['.br'] = brotli.compress(data, quality=11)
+    return variants
+
+
+def format_size(n: int) -> str:
+    return f"{n / 1024:.1f}K" if n >= 1024 else f"{n}B"
+
+
+if __name__ == "__main__":
+    import os
+    for path in sys.argv[1:]:
+        minifier = MINIFIERS.get(os.path.splitext(path)[1].lower())
+        if not minifier:
+            print(f"Skipping {path}: no minifier for this type")
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        small = minifier(text).encode('utf-8')
+        sizes = [f"{k[1:]} {format_size(len(v))}" for k, v in compress_variants(small).items()]
+        print(f"{path}: {format_size(len(text.encode('utf-8')))} -> {format_size(len(small))} ({', '.join(sizes)})")
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Fragment-based page generator.
+
+A page is indexed once into named sections:
+  - every tab (an element with class "tab-content"), named by its id
+  - any region wrapped in <!-- fragment:name --> ... <!-- /fragment:name -->
+
+`build` swaps in fragments/<name>.html for the matching sections and writes
+the result. The index, the fragment hashes and where each fragment landed in
+the output are cached next to the fragments. If only some fragments changed
+(and the page and output did not), just those spans are patched in the
+existing output. Nothing rescans the document.
+
+    python page_fragments.py list index.html
+    python page_fragments.py extract index.html product-db -d fragments
+    python page_fragments.py build index.html -d fragments -o index.html
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import argparse
+import textwrap
+from typing import Dict, List, Optional
+
+from fix_encoding import read_source
+from build_io import file_digest, write_if_changed
+
+CACHE_NAME = '.fragments-cache.json'
+SECTION_CLASS = 'tab-content'
+CACHE_VERSION = 1
+
+# One alternation: comments, raw-text elements (skipped whole), then tags
+_MARKUP_RE = re.compile(
+    r'<!--([\s\S]*?)-->'
+    r'|<(script|style|textarea)\b(?:"[^"]*"|\'[^\']*\'|[^\'">])*>[\s\S]*?</\2\s*>'
+    r'|<(/?)([a-zA-Z][\w-]*)((?:"[^"]*"|\'[^\']*\'|[^\'">])*)>',
+    re.IGNORECASE)
+_ID_RE = re.compile(r'''\bid\s*=\s*["']([^"']+)["']''', re.IGNORECASE)
+_CLASS_RE = re.compile(r'''\bclass\s*=\s*["']([^"']*)["']''', re.IGNORECASE)
+_MARKER_RE = re.compile(r'^\s*(/?)fragment:([\w.-]+)\s*$')
+VOID_ELEMENTS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+                 'param', 'source', 'track', 'wbr'}
+
+
+class Section:
+    __slots__ = ('name', 'kind', 'start', 'end', 'line')
+
+    def __init__(self, name, kind, start, end, line):
+        self.name = name
+        self.kind = kind    # 'element' (the whole element) or 'marker' (between the two comments)
+        self.start = start
+        self.end = end
+        self.line = line
+
+    def to_json(self):
+        return [self.kind, self.start, self.end, self.line]
+
+    @classmethod
+    def from_json(cls, name, data):
+        return cls(name, *data)
+
+
+def index_sections(html: str, section_class: str = SECTION_CLASS):
+    """One pass over the markup; returns ({name: Section} in document order, warnings)."""
+    sections: Dict[str, Section] = {}
+    warnings: List[str] = []
+    stack = []    # [tag, section name or None, start]
+    markers = {}  # open fragment markers: name -> (content start, line)
+    line, line_pos = 1, 0
+
+    def line_at(offset):  # incremental; section starts can lie behind the scan position
+        nonlocal line, line_pos
+        if offset >= line_pos:
+            line += html.count('\n', line_pos, offset)
+        else:
+            line -= html.count('\n', offset, line_pos)
+        line_pos = offset
+        return line
+
+    def add(name, kind, start, end, at_line):
+        unique, n = name, 1
+        while unique in sections:
+            n += 1
+            unique = f"{name}.{n}"
+        if unique != name:
+            warnings.append(f"line {at_line}: duplicate section '{name}' indexed as '{unique}'")
+        sections[unique] = Section(unique, kind, start, end, at_line)
+
+    for m in _MARKUP_RE.finditer(html):
+        if m.group(1) is not None:
+            marker = _MARKER_RE.match(m.group(1))
+            if not marker:
+                continue
+            closing, name = marker.groups()
+            if not closing:
+                markers[name] = (m.end(), line_at(m.start()))
+            elif name in markers:
+                start, at_line = markers.pop(name)
+                add(name, 'marker', start, m.start(), at_line)
+            else:
+                warnings.append(f"line {line_at(m.start())}: <!-- /fragment:{name} --> without an opening marker")
+            continue
+        if m.group(2):
+            continue
+        closing, tag, attrs = m.group(3), m.group(4).lower(), m.group(5)
+        if not closing:
+            if tag in VOID_ELEMENTS or attrs.rstrip().endswith('/'):
+                continue
+            name = None
+            classes = _CLASS_RE.search(attrs)
+            if classes and section_class in classes.group(1).split():
+                ident = _ID_RE.search(attrs)
+                name = ident.group(1) if ident else None
+            stack.append((tag, name, m.start()))
+            continue
+        # Close the nearest matching element; anything left open inside it ends with it
+        for depth in range(len(stack) - 1, -1, -1):
+            if stack[depth][0] == tag:
+                for open_tag, name, start in stack[depth:]:
+                    if name:
+                        add(name, 'element', start, m.end() if open_tag == tag else m.start(), line_at(start))
+                del stack[depth:]
+                break
+    for tag, name, start in stack:
+        if name:
+            warnings.append(f"line {line_at(start)}: section '{name}' is never closed")
+    for name, (start, at_line) in markers.items():
+        warnings.append(f"line {at_line}: <!-- fragment:{name} --> is never closed")
+    ordered = dict(sorted(sections.items(), key=lambda item: item[1].start))
+    return ordered, warnings
+
+
+def _indent_of(html: str, offset: int) -> str:
+    line_start = html.rfind('\n', 0, offset) + 1
+    prefix = html[line_start:offset]
+    return prefix if not prefix.strip() else ''
+
+
+def render_fragment(text: str, indent: str) -> str:
+    """Fragments are stored dedented; continuation lines take the section's indentation."""
+    lines = textwrap.dedent(text.strip('\n')).rstrip().split('\n')
+    return '\n'.join([lines[0]] + [indent + l if l.strip() else '' for l in lines[1:]])
+
+
+class PageTemplate:
+    """A page split into static text and named, replaceable sections."""
+
+    def __init__(self, html: str, sections: Optional[Dict[str, Section]] = None):
+        self.html = html
+        self.warnings = []
+        if sections is None:
+            sections, self.warnings = index_sections(html)
+        self.sections = sections
+        self.overrides: Dict[str, str] = {}
+
+    @classmethod
+    def load(cls, path):
+        return cls(read_source(path))
+
+    def get(self, name: str) -> str:
+        section = self._section(name)
+        return self.overrides.get(name, self.html[section.start:section.end])
+
+    def set(self, name: str, text: str):
+        section = self._section(name)
+        for other in self.overrides:
+            s = self.sections[other]
+            if other != name and s.start < section.end and section.start < s.end:
+                raise ValueError(f"Section '{name}' overlaps '{other}', which is already replaced")
+        self.overrides[name] = text
+
+    def set_fragment(self, name: str, text: str):
+        """Like set(), re-indenting a stored fragment to where the section sits."""
+        self.set(name, render_fragment(text, _indent_of(self.html, self._section(name).start)))
+
+    def render(self):
+        """Returns (html, {name: (start, end) of each replaced section in the output})."""
+        out, spans, pos, size = [], {}, 0, 0
+        for name in sorted(self.overrides, key=lambda n: self.sections[n].start):
+            section = self.sections[name]
+            out.append(self.html[pos:section.start])
+            size += section.start - pos
+            out.append(self.overrides[name])
+            spans[name] = (size, size + len(self.overrides[name]))
+            size += len(self.overrides[name])
+            pos = section.end
+        out.append(self.html[pos:])
+        return ''.join(out), spans
+
+    def _section(self, name):
+        try:
+            return self.sections[name]
+        except KeyError:
+            raise KeyError(f"No section named '{name}'") from None
+
+
+def fragment_files(fragments_dir: str) -> Dict[str, str]:
+    return {os.path.splitext(os.path.basename(p))[0]: p
+            for p in sorted(glob.glob(os.path.join(fragments_dir, '*.html')))}
+
+
+def _load_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache if cache.get('version') == CACHE_VERSION else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _fragment_text(template, name, path, warnings):
+    text = read_source(path)
+    ident = name.split('.')[0]
+    if template.sections[name].kind == 'element' and not re.search(
+            r'''\bid\s*=\s*["']%s["']''' % re.escape(ident), text):
+        warnings.append(f"{path}: does not define id=\"{ident}\"; switchTab() will not find it")
+    return text
+
+
+def build_page(page_path: str, fragments_dir: str, output_path: str, force: bool = False) -> Dict:
+    """Swaps fragments into page sections; returns {'status', 'patched', 'warnings'}."""
+    cache_path = os.path.join(fragments_dir, CACHE_NAME)
+    cache = {} if force else _load_cache(cache_path)
+    files = fragment_files(fragments_dir)
+    page_digest = file_digest(page_path, cache.get('page', {}).get('digest'))
+    digests = {name: file_digest(path, cache.get('fragments', {}).get(name)) for name, path in files.items()}
+    warnings = []
+
+    previous = cache.get('page', {})
+    same_page = previous.get('digest', {}).get('sha256') == page_digest['sha256'] and previous.get('path') == page_path
+    if same_page:
+        template = PageTemplate(read_source(page_path),
+                                {n: Section.from_json(n, d) for n, d in previous['sections'].items()})
+    else:
+        template = PageTemplate.load(page_path)
+        warnings += template.warnings
+
+    unknown = sorted(set(files) - set(template.sections))
+    for name in unknown:
+        warnings.append(f"{files[name]}: no section named '{name}' in {page_path}")
+    wanted = {name: digests[name]['sha256'] for name in files if name in template.sections}
+    output_digest = None
+    if os.path.exists(output_path) and cache.get('output', {}).get('path') == output_path:
+        output_digest = file_digest(output_path, cache['output'].get('digest'))
+    built = cache.get('fragments_built', {})
+    patchable = (same_page and output_digest and output_digest['sha256'] == cache['output']['digest']['sha256']
+                 and set(built) == set(wanted))
+
+    if patchable and built == wanted:
+        return {'status': 'up to date', 'patched': [], 'warnings': warnings}
+
+    if patchable:
+        # Only changed fragments: splice them into the existing output at their recorded spans
+        html = read_source(output_path)
+        spans = {n: tuple(s) for n, s in cache['output']['spans'].items()}
+        changed = sorted((n for n in wanted if built[n] != wanted[n]), key=lambda n: spans[n][0], reverse=True)
+        for name in changed:
+            start, end = spans[name]
+            text = render_fragment(_fragment_text(template, name, files[name], warnings), _indent_of(html, start))
+            html = html[:start] + text + html[end:]
+            delta = len(text) - (end - start)
+            spans[name] = (start, start + len(text))
+            for other, (s, e) in spans.items():
+                if s > start:
+                    spans[other] = (s + delta, e + delta)
+        status = 'patched'
+    else:
+        for name in wanted:
+            template.set_fragment(name, _fragment_text(template, name, files[name], warnings))
+        html, spans = template.render()
+        changed = sorted(wanted)
+        status = 'built'
+
+    write_if_changed(output_path, html.encode('utf-8'))
+    cache = {
+        'version': CACHE_VERSION,
+        'page': {'path': page_path, 'digest': page_digest,
+                 'sections': {n: s.to_json() for n, s in template.sections.items()}},
+        'fragments': digests,
+        'fragments_built': wanted,
+        'output': {'path': output_path, 'digest': file_digest(output_path), 'spans': spans},
+    }
+    write_if_changed(cache_path, json.dumps(cache, indent=2, sort_keys=True).encode('utf-8'))
+    return {'status': status, 'patched': changed, 'warnings': warnings}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Index a page by sections and swap in fragment files")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('list', help="list the sections of a page")
+    p.add_argument('page')
+    p = sub.add_parser('extract', help="write sections out as fragment files")
+    p.add_argument('page')
+    p.add_argument('names', nargs='+')
+    p.add_argument('-d', '--dir', default='fragments')
+    p = sub.add_parser('build', help="swap fragment files into the page")
+    p.add_argument('page')
+    p.add_argument('-d', '--dir', default='fragments')
+    p.add_argument('-o', '--output', required=True)
+    p.add_argument('--force', action='store_true', help="ignore the cache and rebuild from the page")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        try:
+            result = build_page(args.page, args.dir, args.output, force=args.force)
+        except (KeyError, ValueError) as e:
+            print(f"Error: {e}")
+            return 1
+        for warning in result['warnings']:
+            print(f"Warning: {warning}")
+        detail = f": {', '.join(result['patched'])}" if result['patched'] else ''
+        print(f"{args.output} {result['status']}{detail}")
+        return 0
+
+    template = PageTemplate.load(args.page)
+    for warning in template.warnings:
+        print(f"Warning: {warning}")
+    if args.command == 'list':
+        for s in template.sections.values():
+            print(f"{s.name:<28} {s.kind:<8} line {s.line:<6} {s.end - s.start:>8} chars")
+        return 0
+
+    os.makedirs(args.dir, exist_ok=True)
+    for name in args.names:
+        section = template._section(name)
+        indent = _indent_of(template.html, section.start)
+        text = textwrap.dedent(indent + template.get(name)).strip('\n') + '\n'
+        path = os.path.join(args.dir, name + '.html')
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        print(f"Wrote {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
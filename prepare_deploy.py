@@ -1,59 +1,602 @@
 import os
-import shutil
+import re
+import sys
+import json
 import glob
+import hashlib
+import argparse
+
+from js_lexer import top_level_declarations, tokenize, significant, JSLexError, IDENT, PUNCT, STRING, TEMPLATE
+from minify import MINIFIERS, compress_variants, format_size
+from check_syntax import check_files, check_source, format_problem
+from fix_encoding import read_source
+from build_io import file_digest, write_if_changed
+from js_audit import dead_functions, prune_source
 
 # Configuration
 SOURCE_DIR = os.getcwd()
 DEPLOY_DIR = os.path.join(SOURCE_DIR, 'deploy')
+MANIFEST_FILE = os.path.join(DEPLOY_DIR, '.build-manifest.json')
 
 # File patterns to copy
 PATTERNS = [
     'index.html',
     'app.js',
+    'app_v18_90.js',  # the main script index.html actually loads
     'app_part_*.js',
     'ui-fix.css'
 ]
 
-def prepare_deployment():
-    # 1. Create clean deploy directory
-    if os.path.exists(DEPLOY_DIR):
-        print(f"Cleaning existing deploy directory: {DEPLOY_DIR}")
-        shutil.rmtree(DEPLOY_DIR)
-    
-    os.makedirs(DEPLOY_DIR)
-    print(f"Created deploy directory: {DEPLOY_DIR}")
-
-    # 2. Copy files
-    count = 0
+# Pages keep their name (they are the entry points); everything else is content-hashed
+ENTRY_PAGES = {'index.html'}
+
+HASH_LENGTH = 8
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Functions the prune step must keep although nothing in the shipped code names them
+# (e.g. called from the browser console or through a computed name)
+PRUNE_KEEP = set()
+
+# Bumped whenever the transforms change, so cached outputs are rebuilt
+PIPELINE_VERSION = 4
+# Pre-compressed variants are for local preview (dev_server.py serves them); Vercel compresses
+# on its own, so they are left out of the upload (.vercelignore) and out of `builds`
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+SCRIPT_FACTS_LIMIT = 512  # lexed scripts remembered across builds in one process (dev_server)
+
+_SCRIPT_TAG_RE = re.compile(r'<script\b([^>]*)>([\s\S]*?)</script\s*>', re.IGNORECASE)
+_SRC_ATTR_RE = re.compile(r'''\bsrc\s*=\s*["']([^"']+)["']''', re.IGNORECASE)
+_ASSET_ATTR_RE = re.compile(r'''\b(?:src|href)\s*=\s*["']([^"'?#]+)''', re.IGNORECASE)
+_BETWEEN_TAGS_RE = re.compile(r'(?:\s|<!--[\s\S]*?-->)*')
+_TAB_SECTION_RE = re.compile(r'<div\s+id="([^"]+)"\s+class="[^"]*\btab-content\b')
+_HANDLER_ATTR_RE = re.compile(r'''\son\w+\s*=\s*("[^"]*"|'[^']*')''', re.IGNORECASE)
+_PAGE_LOAD_RE = re.compile(r'''DOMContentLoaded|addEventListener\(\s*['"]load['"]|window\.onload''')
+
+# Modules that only serve one tab: fetched the first time switchTab() opens it
+# instead of at startup. Entries that turn out to be unsafe stay eager (see plan_tab_chunks).
+TAB_CHUNKS = {
+    'rfq-decoder': ['app_part_rfq.js'],
+    'customer-deep-dive': ['app_part_deepdive.js'],
+    'customer-pipeline': ['app_part_pipeline.js'],
+    'email-templates': ['app_part_email.js'],
+    'price-calculator': ['app_part_calc.js'],
+    'weekly-plan': ['app_part_calendar.js'],
+    'product-db': ['app_part_rag.js'],
+    'auto-flow': ['app_part_workflow.js'],
+}
+
+TAB_LOADER = '''<script>
+        // Lazy tab modules (generated by prepare_deploy.py)
+        (function () {
+            var chunks = %s;
+            var loading = {};
+            function load(src) {
+                if (!loading[src]) {
+                    loading[src] = new Promise(function (resolve, reject) {
+                        var script = document.createElement('script');
+                        script.src = src;
+                        script.async = false;
+                        script.onload = resolve;
+                        script.onerror = function () {
+                            delete loading[src];
+                            reject(new Error('Failed to load ' + src));
+                        };
+                        document.head.appendChild(script);
+                    });
+                }
+                return loading[src];
+            }
+            window.loadTabChunk = function (tabId) {
+                return Promise.all((chunks[tabId] || []).map(load));
+            };
+            function wrap(name) {
+                var original = window[name];
+                if (typeof original !== 'function' || original.lazyTabs) return;
+                var wrapped = function (tabId) {
+                    var result = original.apply(this, arguments);
+                    var pending = (chunks[tabId] || []).some(function (src) { return !loading[src]; });
+                    if (pending) {
+                        window.loadTabChunk(tabId).then(function () {
+                            // Run the tab's init again now that its module is present
+                            var tab = document.getElementById(tabId);
+                            if (tab && tab.classList.contains('active')) window[name](tabId);
+                        }, function (err) { console.error(err); });
+                    }
+                    return result;
+                };
+                wrapped.lazyTabs = true;
+                window[name] = wrapped;
+            }
+            // Every page script (including later switchTab overrides) has run by now
+            document.addEventListener('DOMContentLoaded', function () {
+                wrap('switchTab');
+                wrap('showTab');
+            });
+        })();
+    </script>
+'''
+
+
+def hashed_name(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}{ext}"
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'sources': {}, 'assets': {}}
+
+
+def rewrite_references(html, asset_names):
+    """Points src/href attributes at the hashed asset names."""
+    def swap(match):
+        target = asset_names.get(match.group(2))
+        return f'{match.group(1)}{target}{match.group(3)}' if target else match.group(0)
+    return re.sub(r'''((?:src|href)\s*=\s*["'])([^"'?#]+)(["'?#])''', swap, html)
+
+
+def vercel_config():
+    """Static builds for the pages, scripts and styles; the .gz/.br variants are not deployed."""
+    return {
+        "name": "morgan-marketing-os",
+        "version": 2,
+        "builds": [
+            {"src": "*.html", "use": "@vercel/static"},
+            {"src": "*.js", "use": "@vercel/static"},
+            {"src": "*.css", "use": "@vercel/static"}
+        ],
+        "routes": [
+            {"src": r"/(.*)\.[0-9a-f]{%d}\.(js|css)" % HASH_LENGTH,
+             "headers": {"Cache-Control": IMMUTABLE}, "continue": True},
+            {"src": "/(.*\\.html)?", "headers": {"Cache-Control": "no-cache"}, "continue": True},
+            {"handle": "filesystem"},
+            {"src": "/(.*)", "dest": "/index.html"}
+        ]
+    }
+
+
+def collect_sources():
+    sources = {}
     for pattern in PATTERNS:
         # Use glob to find files matching pattern
-        files = glob.glob(os.path.join(SOURCE_DIR, pattern))
-        for file_path in files:
-            file_name = os.path.basename(file_path)
-            dest_path = os.path.join(DEPLOY_DIR, file_name)
-            
-            shutil.copy2(file_path, dest_path)
-            print(f"Copied: {file_name}")
-            count += 1
-            
-    # 3. Create vercel.json
-    vercel_config = '''{
-  "name": "morgan-marketing-os",
-  "version": 2,
-  "builds": [
-    { "src": "index.html", "use": "@vercel/static" }
-  ],
-  "routes": [
-    { "src": "/(.*)", "dest": "/index.html" }
-  ]
-}'''
-    
-    with open(os.path.join(DEPLOY_DIR, 'vercel.json'), 'w', encoding='utf-8') as f:
-        f.write(vercel_config)
-    print("Created: vercel.json")
-
-    print(f"\nSuccess! {count} files prepared in '{DEPLOY_DIR}'")
+        for file_path in sorted(glob.glob(os.path.join(SOURCE_DIR, pattern))):
+            sources[os.path.basename(file_path)] = file_path
+    return sources
+
+
+def script_tags(html):
+    """
+    Every <script> in document order as dicts: src (or None for inline), body,
+    deferred, span and `joined` (only whitespace/comments since the previous tag).
+    """
+    tags, last_end = [], None
+    for m in _SCRIPT_TAG_RE.finditer(html):
+        attrs = m.group(1)
+        src = _SRC_ATTR_RE.search(attrs)
+        joined = last_end is not None and _BETWEEN_TAGS_RE.fullmatch(html, last_end, m.start()) is not None
+        tags.append({
+            'src': src.group(1) if src else None,
+            'body': m.group(2),
+            'attrs': attrs,
+            # async/module scripts keep their own tag: their timing differs from classic scripts
+            'deferred': bool(re.search(r'\bdefer\b', attrs, re.IGNORECASE)),
+            'plain': not re.search(r'\b(?:async|type)\b', attrs, re.IGNORECASE),
+            'span': m.span(),
+            'joined': joined,
+        })
+        last_end = m.end()
+    return tags
+
+
+def plan_bundles(tags, sources, read):
+    """
+    Groups adjacent local scripts that load the same way into bundles.
+
+    Classic scripts share one global scope, so a script that redeclares a
+    let/const/class name of an earlier one fails as a whole. Such scripts
+    are left as their own tag (the failure stays isolated exactly as it is
+    today) and reported. A bundle also never holds two declarations of the
+    same function, since hoisting would let the later one win early.
+    Returns (groups, warnings); each group is a list of tag indices.
+    """
+    declared = {}  # name -> script that declared it, in execution order
+    lexical_names = set()
+    conflicts = {}
+    functions = {}  # tag index -> hoisted names
+    # Non-deferred scripts run while parsing, deferred ones after it
+    order = [i for i, t in enumerate(tags) if not t['deferred']] + [i for i, t in enumerate(tags) if t['deferred']]
+    for i in order:
+        tag = tags[i]
+        label = tag['src'] or 'inline script'
+        if tag['src'] and tag['src'] not in sources:
+            continue  # CDN and other external scripts are opaque here
+        try:
+            lexical, hoisted, destructuring = script_facts(read(tag['src']) if tag['src'] else tag['body'])[:3]
+        except JSLexError:
+            conflicts[i] = 'could not be parsed'
+            continue
+        clashes = [n for n in lexical if n in declared] + [n for n in hoisted if n in lexical_names]
+        if clashes:
+            origin = declared[clashes[0]]
+            conflicts[i] = ('is loaded twice; the second copy fails' if origin == label else
+                            f"redeclares {', '.join(clashes)} (from {origin})")
+            continue  # the browser rejects the whole script, so it declares nothing
+        if destructuring:
+            conflicts[i] = 'uses top-level destructuring'
+        functions[i] = set(hoisted)
+        for name in lexical:
+            declared[name] = label
+        lexical_names.update(lexical)
+        for name in hoisted:
+            declared.setdefault(name, label)
+
+    groups, warnings = [], []
+    group_functions = set()
+    for i, tag in enumerate(tags):
+        if not tag['src'] or tag['src'] not in sources:
+            continue
+        if i in conflicts:
+            warnings.append(f"{tag['src']} {conflicts[i]}; kept as a separate script")
+        previous = groups[-1][-1] if groups else None
+        if (previous == i - 1 and tag['joined'] and tag['plain'] and tags[previous]['plain']
+                and tag['deferred'] == tags[previous]['deferred']
+                and i not in conflicts and previous not in conflicts
+                and not functions[i] & group_functions):
+            groups[-1].append(i)
+            group_functions |= functions[i]
+        else:
+            groups.append([i])
+            group_functions = set(functions.get(i, ()))
+    return groups, warnings
+
+
+_script_facts_cache = {}  # sha256 of a script -> its facts, or the JSLexError it raised
+
+
+def script_facts(text):
+    """
+    Lexes a script once per content: (lexical names, hoisted names, has
+    destructuring, identifiers it uses, identifiers it guards with typeof).
+    Uses skip property access and include calls written inside strings, such
+    as onclick="fn()". Raises JSLexError like top_level_declarations.
+    """
+    key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    facts = _script_facts_cache.get(key)
+    if facts is None:
+        try:
+            lexical, hoisted, destructuring = top_level_declarations(text)
+            used, guarded = set(), set()
+            tokens = list(significant(tokenize(text)))
+            for i, tok in enumerate(tokens):
+                if tok.type == IDENT:
+                    before = tokens[i - 1] if i else None
+                    if before is not None and before.type == PUNCT and before.value in ('.', '?.'):
+                        continue  # property access
+                    if before is not None and before.type == IDENT and before.value == 'typeof':
+                        guarded.add(tok.value)
+                    used.add(tok.value)
+                elif tok.type in (STRING, TEMPLATE):
+                    used.update(re.findall(r'([\w$]+)\s*\(', tok.value))
+            facts = (lexical, hoisted, destructuring, used, guarded)
+        except JSLexError as e:
+            facts = e
+        if len(_script_facts_cache) >= SCRIPT_FACTS_LIMIT:
+            _script_facts_cache.clear()
+        _script_facts_cache[key] = facts
+    if isinstance(facts, JSLexError):
+        raise facts
+    return facts
+
+
+def _references(text, names):
+    """
+    Names from `names` that a script uses but neither declares itself (an
+    override or fallback) nor guards with `typeof` - including calls written
+    inside HTML strings such as onclick="fn()".
+    """
+    try:
+        lexical, hoisted, _, used, guarded = script_facts(text)
+    except JSLexError:
+        return set(names)  # unknown, so assume the worst
+    return (used & set(names)) - set(lexical) - set(hoisted) - guarded
+
+
+def plan_tab_chunks(html, tags, sources, read):
+    """
+    Picks the TAB_CHUNKS modules that are safe to load on first use of their tab.
+    A module stays eager when its top-level code waits for page load, when
+    another script or a handler outside its tab uses its functions, or when
+    its let/const names clash with another script (removing it would change
+    which scripts fail). Returns ({tab: [modules]}, notes).
+    """
+    sections = [(m.start(), m.group(1)) for m in _TAB_SECTION_RE.finditer(html)]
+
+    def section_at(offset):
+        current = None
+        for start, tab_id in sections:
+            if start > offset:
+                break
+            current = tab_id
+        return current
+
+    local = {t['src'] for t in tags if t['src'] in sources}
+    inline = [('inline script', t['body']) for t in tags if not t['src']]
+    chunks, notes = {}, []
+    for tab_id, modules in TAB_CHUNKS.items():
+        if tab_id not in {tab for _, tab in sections}:
+            notes.append(f"{tab_id}: no such tab in the page; {', '.join(modules)} stay eager")
+            continue
+        for module in modules:
+            if module not in local:
+                continue
+            text = read(module)
+            lexical, hoisted = script_facts(text)[:2]
+            names = set(lexical) | set(hoisted)
+            reason = None
+            if _PAGE_LOAD_RE.search(text):
+                reason = 'waits for page load'
+            others = [(name, read(name)) for name in sorted(local - {module})] + inline
+            for label, other in others if reason is None else ():
+                try:
+                    other_lexical, other_hoisted = script_facts(other)[:2]
+                except JSLexError:
+                    continue
+                clash = set(lexical) & (set(other_lexical) | set(other_hoisted))
+                if clash:
+                    reason = f"declares {', '.join(sorted(clash))} like {label}"
+                    break
+                used = _references(other, names)
+                if used:
+                    reason = f"{label} uses {', '.join(sorted(used))}"
+                    break
+            if reason is None:
+                for m in _HANDLER_ATTR_RE.finditer(html):
+                    if section_at(m.start()) != tab_id and set(re.findall(r'[\w$]+', m.group(1))) & names:
+                        reason = f"used by a handler outside #{tab_id}"
+                        break
+            if reason:
+                notes.append(f"{module} stays eager: {reason}")
+            else:
+                chunks.setdefault(tab_id, []).append(module)
+    return chunks, notes
+
+
+def strip_script_tags(html, tags, modules):
+    """Removes every tag that loads one of `modules`."""
+    for tag in sorted((t for t in tags if t['src'] in modules), key=lambda t: t['span'], reverse=True):
+        start, end = tag['span']
+        html = html[:start] + html[end:]
+    return html
+
+
+def rewrite_script_groups(html, tags, groups, group_files):
+    """Replaces each group's tags with a single tag pointing at its output file."""
+    edits = []
+    for group, target in zip(groups, group_files):
+        first = tags[group[0]]
+        edits.append((first['span'], f'<script{first["attrs"].replace(first["src"], target, 1)}></script>'))
+        edits.extend((tags[i]['span'], '') for i in group[1:])
+    for (start, end), text in sorted(edits, reverse=True):
+        html = html[:start] + text + html[end:]
+    return html
+
+
+def build_asset(names, read, minify):
+    """Concatenates (and minifies) source files; returns (bytes, original size)."""
+    parts, original = [], 0
+    for name in names:
+        text = read(name)
+        original += len(text.encode('utf-8'))
+        minifier = MINIFIERS.get(os.path.splitext(name)[1]) if minify else None
+        parts.append(minifier(text) if minifier else text)
+    # `;` between files guards against a missing semicolon at the end of one
+    joiner = '\n;\n' if names[0].endswith('.js') else '\n'
+    return joiner.join(parts).encode('utf-8'), original
+
+
+def emit(name, data, written):
+    """Writes an output and its pre-compressed variants; returns their sizes."""
+    path = os.path.join(DEPLOY_DIR, name)
+    sizes = {'bytes': len(data)}
+    changed = write_if_changed(path, data)
+    for suffix, packed in compress_variants(data).items():
+        changed |= write_if_changed(path + suffix, packed)
+        sizes[suffix[1:]] = len(packed)
+    if changed:
+        written.append(name)
+    return sizes
+
+
+def print_size_report(rows):
+    print(f"\n{'asset':<34}{'source':>10}{'min':>10}{'gzip':>10}{'brotli':>10}")
+    totals = [0, 0, 0, 0]
+    for name, entry in sorted(rows.items()):
+        s = entry['sizes']
+        values = [entry['original'], s['bytes'], s.get('gz', 0), s.get('br', 0)]
+        totals = [a + b for a, b in zip(totals, values)]
+        print(f"{name:<34}" + ''.join(f"{format_size(v) if v else '-':>10}" for v in values))
+    print(f"{'total':<34}" + ''.join(f"{format_size(v) if v else '-':>10}" for v in totals))
+
+
+def prepare_deployment(minify=True, bundle=True, lazy=True, check=True, prune=True):
+    # 1. Load the previous build manifest (deploy/ is updated in place, not wiped)
+    os.makedirs(DEPLOY_DIR, exist_ok=True)
+    manifest = load_manifest()
+    sources = collect_sources()
+    previous_outputs = manifest.get('outputs', {})
+    options = {'minify': minify, 'bundle': bundle, 'lazy': lazy, 'prune': prune, 'version': PIPELINE_VERSION}
+
+    new_sources = {name: file_digest(path, manifest['sources'].get(name)) for name, path in sources.items()}
+    texts = {}
+
+    def read(name):
+        if name not in texts:
+            texts[name] = read_source(sources[name])  # any source encoding; outputs are UTF-8
+        return texts[name]
+
+    # 2. Plan the outputs: lazy tab chunks and script bundles for the entry pages, then the other sources
+    plans = {}  # output name -> source names
+    page_groups = {}
+    for page in ENTRY_PAGES & set(sources):
+        html = read(page)
+        tags = script_tags(html)
+        chunks, notes = plan_tab_chunks(html, tags, sources, read) if lazy else ({}, [])
+        for note in notes:
+            print(f"Note: {note}")
+        if chunks:
+            html = strip_script_tags(html, tags, {m for modules in chunks.values() for m in modules})
+            tags = script_tags(html)
+        for tab_id, modules in chunks.items():
+            plans[f'tab-{tab_id}.js'] = modules
+        groups, warnings = plan_bundles(tags, sources, read) if bundle else ([], [])
+        for warning in warnings:
+            print(f"Warning: {warning}")
+        groups = [g for g in groups if len(g) > 1]
+        outputs = []
+        for n, group in enumerate(groups, 1):
+            key = f'bundle-{n}.js' if page == 'index.html' else f'{os.path.splitext(page)[0]}-bundle-{n}.js'
+            plans[key] = [tags[i]['src'] for i in group]
+            outputs.append(key)
+        page_groups[page] = (html, tags, groups, outputs, chunks)
+    # Sources merged into a bundle or tab chunk are not shipped again on their own,
+    # unless a page still loads them with a script tag of their own
+    merged = {name for members in plans.values() for name in members}
+    separate = {tags[i]['src'] for _, tags, groups, _, _ in page_groups.values() for i in range(len(tags))
+                if not any(i in group for group in groups)}
+    for name in sources:
+        if name not in ENTRY_PAGES and (name not in merged or name in separate):
+            plans[name] = [name]
+
+    # 3. Syntax gate: every script input (inline ones too) must tokenize with balanced brackets;
+    #    sources that passed in an earlier build with the same content are not re-checked
+    checked = manifest.get('checked', {})
+    if check:
+        scripts = sorted({name for members in plans.values() for name in members if name.endswith('.js')})
+        pending = [name for name in scripts if checked.get(name) != new_sources[name]['sha256']]
+        problems = check_files([sources[name] for name in pending])
+        for page in page_groups:
+            for tag in script_tags(read(page)):
+                if not tag['src'] and (problem := check_source(tag['body'], f"{page} (inline script)")):
+                    problems.append(problem)
+        if problems:
+            for problem in problems:
+                print(f"Syntax error: {format_problem(problem)}")
+            print("\nBuild aborted; deploy/ was not changed (use --no-check to skip the gate).")
+            return False
+        checked = {name: new_sources[name]['sha256'] for name in scripts}
+
+    # 4. Dead code: sources no entry page loads are not shipped; functions shadowed by a later
+    #    declaration in the same file, or named nowhere in the shipped code and pages, are cut
+    #    (python js_audit.py prints the full report, including cross-file duplicates)
+    dead = {}
+    if prune:
+        pages = [read(page) for page in page_groups]
+        linked = {os.path.basename(url) for html in pages for url in _ASSET_ATTR_RE.findall(html)}
+        loaded = {name for name in sources if name in ENTRY_PAGES or name in linked}
+        for name in sorted(set(sources) - loaded):
+            plans.pop(name, None)
+            print(f"Pruned: {name} (not loaded by any entry page)")
+        shipped = {name: read(name) for name in sorted(loaded) if name.endswith('.js')}
+        for name, defs in dead_functions(shipped, dict(zip(page_groups, pages)), keep=PRUNE_KEEP).items():
+            text = prune_source(read(name), defs)
+            if check_source(text, name):
+                continue  # never ship a cut that does not parse; the gate reports the source itself
+            dead[name] = ([d.name for d in defs], text)
+            saved = len(read(name).encode('utf-8')) - len(text.encode('utf-8'))
+            print(f"Pruned: {len(defs)} dead function(s) from {name} ({format_size(saved)}): "
+                  f"{', '.join(d.name for d in defs)}")
+
+    def shipped_text(name):
+        return dead[name][1] if name in dead else read(name)
+
+    # 5. Content-hashed assets: outputs whose inputs and options are unchanged are reused
+    written, unchanged = [], 0
+    assets, outputs = {}, {}
+    for key, members in plans.items():
+        inputs = {name: new_sources[name]['sha256'] for name in members}
+        cut = {name: dead[name][0] for name in members if name in dead}  # depends on the other sources too
+        previous = previous_outputs.get(key)
+        if (previous and previous['inputs'] == inputs and previous['options'] == options
+                and previous.get('pruned', {}) == cut
+                and all(os.path.exists(os.path.join(DEPLOY_DIR, previous['file'] + ('' if k == 'bytes' else '.' + k)))
+                        for k in previous['sizes'])):
+            outputs[key] = previous
+            assets[key] = previous['file']
+            unchanged += 1
+            continue
+        data, original = build_asset(members, shipped_text, minify)
+        if cut:
+            original = sum(len(read(name).encode('utf-8')) for name in members)  # report the source size
+        assets[key] = hashed_name(key, data)
+        sizes = emit(assets[key], data, written)
+        outputs[key] = {'inputs': inputs, 'options': options, 'file': assets[key],
+                        'original': original, 'sizes': sizes, 'pruned': cut}
+
+    # 6. Entry pages with bundled scripts, the tab loader and rewritten references
+    startup = lazy_total = 0
+    for page, (html, tags, groups, bundle_keys, chunks) in page_groups.items():
+        html = rewrite_script_groups(html, tags, groups, bundle_keys)
+        if chunks:
+            loader_map = {tab_id: [assets[f'tab-{tab_id}.js']] for tab_id in chunks}
+            html = re.sub(r'</body>', lambda m: TAB_LOADER % json.dumps(loader_map) + m.group(0), html, count=1)
+            lazy_total += sum(outputs[f'tab-{tab_id}.js']['sizes']['bytes'] for tab_id in chunks)
+            for tab_id, modules in chunks.items():
+                print(f"Lazy: #{tab_id} -> {', '.join(modules)}")
+        html = rewrite_references(html, assets)
+        files = {entry['file']: entry for entry in outputs.values()}
+        startup += sum(files[t['src']]['sizes']['bytes'] for t in script_tags(html) if t['src'] in files)
+        if minify:
+            html = MINIFIERS['.html'](html)
+        sizes = emit(page, html.encode('utf-8'), written)
+        outputs[page] = {'inputs': {page: new_sources[page]['sha256']}, 'options': options, 'file': page,
+                         'original': len(read(page).encode('utf-8')), 'sizes': sizes}
+    for name in written:
+        print(f"Built: {name}")
+
+    # 7. vercel.json with long-lived caching for hashed assets, and .vercelignore
+    config = json.dumps(vercel_config(), indent=2).encode('utf-8')
+    if write_if_changed(os.path.join(DEPLOY_DIR, 'vercel.json'), config):
+        print("Built: vercel.json")
+        written.append('vercel.json')
+
+    ignore = ''.join(f"*{suffix}\n" for suffix in COMPRESSED_SUFFIXES).encode('utf-8')
+    if write_if_changed(os.path.join(DEPLOY_DIR, '.vercelignore'), ignore):
+        print("Built: .vercelignore")
+        written.append('.vercelignore')
+
+    # 8. Prune outputs that are no longer produced (old hashes, removed files)
+    files = {entry['file'] for entry in outputs.values()}
+    keep = files | {f + suffix for f in files for suffix in COMPRESSED_SUFFIXES}
+    keep |= {'vercel.json', '.vercelignore', os.path.basename(MANIFEST_FILE)}
+    removed = 0
+    for entry in os.listdir(DEPLOY_DIR):
+        if entry not in keep and os.path.isfile(os.path.join(DEPLOY_DIR, entry)):
+            os.remove(os.path.join(DEPLOY_DIR, entry))
+            print(f"Removed stale: {entry}")
+            removed += 1
+
+    manifest = {'sources': new_sources, 'assets': assets, 'outputs': outputs, 'checked': checked}
+    write_if_changed(MANIFEST_FILE, json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+    print_size_report(outputs)
+    if lazy_total:
+        print(f"\nStartup scripts: {format_size(startup)}; loaded on first tab use: {format_size(lazy_total)}")
+    print(f"\nSuccess! {len(written)} written, {unchanged} unchanged, {removed} removed in '{DEPLOY_DIR}'")
     print("Ready for deployment.")
+    return True
+
 
 if __name__ == "__main__":
-    prepare_deployment()
+    parser = argparse.ArgumentParser(description="Build the deploy/ folder")
+    parser.add_argument('--no-minify', action='store_true', help="copy sources without minifying")
+    parser.add_argument('--no-bundle', action='store_true', help="keep one script tag per source file")
+    parser.add_argument('--no-lazy', action='store_true', help="load every tab module at startup")
+    parser.add_argument('--no-check', action='store_true', help="skip the JavaScript syntax gate")
+    parser.add_argument('--no-prune', action='store_true', help="ship unloaded files and dead functions too")
+    args = parser.parse_args()
+    ok = prepare_deployment(minify=not args.no_minify, bundle=not args.no_bundle, lazy=not args.no_lazy,
+                            check=not args.no_check, prune=not args.no_prune)
+    sys.exit(0 if ok else 1)
@@ -1,11 +1,15 @@
 import os
+import sys
+import json
+import hashlib
+import argparse
+
+from fix_encoding import read_source
+from build_io import file_digest, write_if_changed
 
 # Content Blocks
 
-# 1. Base App Logic (from app_fixed.js which seems stable, OR better, let's construct it from known parts)
-# Actually, I should use the FILE content if possible.
-# But I can't easily read `app_fixed.js` in this script without running it.
-# So I will read `app_fixed.js`, then append the new modules.
+# app.js = app_fixed.js + the inline modules below + app_part_deepdive.js (see MODULES)
 
 AUTH_MODULE = r'''
 // ==========================================
@@ -242,29 +246,142 @@ function toggleTheme() {
 window.showTab = switchTab;
 '''
 
-def rebuild_app():
-    base_file = 'app_fixed.js'
-    target_file = 'app.js'
-    
-    print(f"Reading base: {base_file}")
-    with open(base_file, 'r', encoding='utf-8') as f:
-        base_content = f.read()
+# Build graph: modules in output order; `after` names modules that must come first
+# (nav redefines switchTab/toggleTheme from base, so it has to follow it)
+MODULES = [
+    {'name': 'base', 'file': 'app_fixed.js'},
+    {'name': 'auth', 'inline': 'AUTH_MODULE', 'after': ['base']},
+    {'name': 'nav', 'inline': 'NAV_MODULE', 'after': ['base']},
+    {'name': 'deepdive', 'file': 'app_part_deepdive.js', 'after': ['base']},
+]
+TARGET_FILE = 'app.js'
+SEPARATOR = '\n\n'
+STAMP_FILE = '.app-build.json'
+BUILD_VERSION = 1  # bump when the assembly itself changes
+
+_VLQ_CHARS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+
+
+class BuildError(Exception):
+    pass
+
+
+def build_order(modules):
+    """Dependencies first; otherwise the declared order, so the result never varies."""
+    by_name = {m['name']: m for m in modules}
+    order, state = [], {}
+
+    def visit(name, path):
+        if name not in by_name:
+            raise BuildError(f"{path[-1]} depends on unknown module '{name}'")
+        if state.get(name) == 'done':
+            return
+        if state.get(name) == 'visiting':
+            raise BuildError("Dependency cycle: " + ' -> '.join(path + [name]))
+        state[name] = 'visiting'
+        for dep in by_name[name].get('after', []):
+            visit(dep, path + [name])
+        state[name] = 'done'
+        order.append(by_name[name])
 
-    # Read Deep Dive Module
+    for m in modules:
+        visit(m['name'], [])
+    return order
+
+
+def module_source(module):
+    """(source name for the map, text, inline?) of a module; a missing part file is an error."""
+    if 'inline' in module:
+        return f"{os.path.basename(__file__)}/{module['inline']}.js", globals()[module['inline']], True
     try:
-        with open('app_part_deepdive.js', 'r', encoding='utf-8') as f:
-            deep_dive_content = f.read()
-    except:
-        print("Warning: app_part_deepdive.js not found or read error.")
-        deep_dive_content = "// Deep Dive Module Missing"
-        
-    final_content = base_content + "\n\n" + AUTH_MODULE + "\n\n" + NAV_MODULE + "\n\n" + deep_dive_content
-    
-    print(f"Writing target: {target_file}")
-    with open(target_file, 'w', encoding='utf-8') as f:
-        f.write(final_content)
-        
-    print("Success! app.js rebuilt with UTF-8 encoding.")
+        return module['file'], read_source(module['file']), False
+    except OSError as e:
+        raise BuildError(f"Cannot read {module['file']} for module '{module['name']}': {e}") from None
+
+
+def module_digest(module, previous=None):
+    """Content hash of a module; part files reuse the last stamp while size and mtime match."""
+    if 'inline' in module:
+        return {'sha256': _sha256(globals()[module['inline']].encode('utf-8'))}
+    try:
+        return file_digest(module['file'], previous)
+    except OSError as e:
+        raise BuildError(f"Cannot read {module['file']} for module '{module['name']}': {e}") from None
+
+
+def _vlq(value):
+    value = (-value << 1) | 1 if value < 0 else value << 1
+    out = ''
+    while True:
+        digit, value = value & 31, value >> 5
+        out += _VLQ_CHARS[digit | (32 if value else 0)]
+        if not value:
+            return out
+
+
+def source_map(target, parts):
+    """Source map v3 mapping every generated line to its line in the original part."""
+    sources, contents, lines = [], [], []
+    prev_source = prev_line = 0
+    for index, (name, text, inline) in enumerate(parts):
+        if index:
+            lines.extend([''] * (SEPARATOR.count('\n') - 1))  # blank lines between parts
+        sources.append(name)
+        contents.append(text if inline else None)  # part files are on disk; inline modules are not
+        for line_no in range(text.count('\n') + 1):
+            lines.append('A' + _vlq(index - prev_source) + _vlq(line_no - prev_line) + 'A')
+            prev_source, prev_line = index, line_no
+    return {'version': 3, 'file': target, 'sources': sources, 'sourcesContent': contents,
+            'names': [], 'mappings': ';'.join(lines)}
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def rebuild_app(force=False):
+    """Assembles TARGET_FILE (+ .map); returns False when nothing needed doing."""
+    order = build_order(MODULES)
+    map_file = TARGET_FILE + '.map'
+    try:
+        with open(STAMP_FILE, 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        stamp = {}
+
+    inputs = {m['name']: module_digest(m, stamp.get('inputs', {}).get(m['name'])) for m in order}
+    key = _sha256(json.dumps({'version': BUILD_VERSION, 'order': [m['name'] for m in order],
+                              'inputs': {name: d['sha256'] for name, d in inputs.items()}},
+                             sort_keys=True).encode('utf-8'))
+    if not force and stamp.get('key') == key and all(
+            os.path.exists(path) and file_digest(path, stamp.get(path))['sha256'] == stamp.get(path, {}).get('sha256')
+            for path in (TARGET_FILE, map_file)):
+        print(f"{TARGET_FILE} is up to date")
+        return False
+
+    parts = [module_source(m) for m in order]
+    # Bytes only, '\n' newlines and no timestamps: identical inputs give identical output
+    content = SEPARATOR.join(text for _, text, _ in parts)
+    content += f"\n//# sourceMappingURL={os.path.basename(map_file)}\n"
+    smap = json.dumps(source_map(TARGET_FILE, parts), ensure_ascii=False, separators=(',', ':'))
+    for path, data in ((TARGET_FILE, content), (map_file, smap + '\n')):
+        write_if_changed(path, data.encode('utf-8'))
+        print(f"Wrote {path}")
+
+    stamp = {'key': key, 'inputs': inputs,
+             TARGET_FILE: file_digest(TARGET_FILE), map_file: file_digest(map_file)}
+    with open(STAMP_FILE, 'w', encoding='utf-8') as f:
+        json.dump(stamp, f, indent=2, sort_keys=True)
+    print(f"Success! {TARGET_FILE} rebuilt from " + ', '.join(m['name'] for m in order))
+    return True
+
 
 if __name__ == '__main__':
-    rebuild_app()
+    parser = argparse.ArgumentParser(description="Assemble app.js from its modules")
+    parser.add_argument('--force', action='store_true', help="rebuild even if no input changed")
+    args = parser.parse_args()
+    try:
+        rebuild_app(force=args.force)
+    except BuildError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
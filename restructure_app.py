@@ -5,6 +5,9 @@ This script will:
 1. Extract all nested functions to global scope
 2. Fix the updateDashboard function structure
 3. Clean up the code organization
+
+Superseded by js_index.py, which finds nested functions (`list --nested`)
+and moves declarations by parsed offsets instead of marker comments.
 """
 
 def restructure_app():
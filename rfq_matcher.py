@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""
+Product matcher for the RFQ pipeline over a precomputed spec index.
+
+matchProductFromKB() in app_part_rfq.js JSON.parses every knowledge-base
+chunk from localStorage for each RFQ and substring-checks every requested
+term and word against every chunk. Here product chunks are parsed once into
+structured records:
+
+  model     model numbers (PC200-8, ZL50GN, CPCD30) with their family alias
+            (PC200), matched case-insensitively
+  specs     numbers with units, normalized (t, m3, kW, m, V, km/h) and kept as
+            ranges ("3-6 m"), tagged with the spec they describe when the
+            text says so (operating weight, rated load, bucket capacity ...)
+  tags      product categories and other concepts from the kb_vectors
+            lexicon, so "excavadora" and "挖掘机" find an excavator
+  terms     the remaining words
+
+RFQ requirements ("20 ton excavator", "capacidad del cucharón 1 m3",
+"PC200") are parsed the same way and answered from a model index, a tag
+index, a keyword index and per-dimension range indexes (sorted, bisected),
+so only products that match something are scored. Each candidate gets an
+upper bound from the signals that picked it and is scored in bound order,
+stopping once the top K can no longer change.
+
+Like the search index, the product index is saved next to the store
+(DB.products.json) and brought up to date from the store's change log, so
+chunks are only parsed when they change.
+
+    python rfq_matcher.py --db kb.sqlite "20 ton excavator" "bucket 0.8 m3"
+    python kb_search.py serve --db kb.sqlite --products     # POST /match
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import heapq
+import bisect
+import argparse
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from kb_search import COMPACT_RATIO, tokenize
+from kb_vectors import HashedEmbedder, STOPWORDS, fold
+
+TOLERANCE = 0.15    # a single requested value matches specs within +-15%
+CATEGORIES = ('excavator', 'wheel_loader', 'forklift', 'crane')
+MAX_RESULTS = 3
+PRODUCTS_VERSION = 2
+SELECTIVE = 2000    # larger postings only rank the candidates that smaller ones picked, when that suffices
+
+# unit -> (dimension, factor to the base unit); matched after accent folding, longest first
+UNITS = {
+    'kg': ('mass', 0.001), 't': ('mass', 1.0), 'ton': ('mass', 1.0), 'tons': ('mass', 1.0),
+    'tonne': ('mass', 1.0), 'tonnes': ('mass', 1.0), 'tonelada': ('mass', 1.0), 'toneladas': ('mass', 1.0),
+    '吨': ('mass', 1.0), '公斤': ('mass', 0.001), 'lb': ('mass', 0.000453592), 'lbs': ('mass', 0.000453592),
+    'm3': ('volume', 1.0), 'm³': ('volume', 1.0), 'cbm': ('volume', 1.0), 'cubic meters': ('volume', 1.0),
+    'cubic meter': ('volume', 1.0), 'metros cubicos': ('volume', 1.0), '立方米': ('volume', 1.0), '立方': ('volume', 1.0),
+    'kw': ('power', 1.0), '千瓦': ('power', 1.0), 'hp': ('power', 0.7457), 'ps': ('power', 0.7355),
+    'cv': ('power', 0.7355), '马力': ('power', 0.7355),
+    'mm': ('length', 0.001), 'cm': ('length', 0.01), 'm': ('length', 1.0), 'meters': ('length', 1.0),
+    'meter': ('length', 1.0), 'metres': ('length', 1.0), 'metre': ('length', 1.0), 'metros': ('length', 1.0),
+    'metro': ('length', 1.0), '米': ('length', 1.0),
+    'v': ('voltage', 1.0), 'volts': ('voltage', 1.0), 'volt': ('voltage', 1.0), '伏': ('voltage', 1.0),
+    'km/h': ('speed', 1.0), 'kph': ('speed', 1.0), '公里/小时': ('speed', 1.0),
+}
+BASE_UNITS = {'mass': 't', 'volume': 'm3', 'power': 'kW', 'length': 'm', 'voltage': 'V', 'speed': 'km/h'}
+# lexicon concepts that name the spec a number belongs to
+ROLES = {'operating_weight': 'mass', 'lifting_capacity': 'mass', 'bucket_capacity': 'volume',
+         'engine_power': 'power', 'digging_depth': 'length', 'voltage': 'voltage', 'speed': 'speed'}
+NOT_TAGS = set(ROLES) | {'ton'}  # spec names and units are matched as specs, not as tags
+
+_NUM = r'\d+(?:[.,]\d+)?'
+# "3-6 m" is a range; "20-ton" (no second number) is a value with a hyphenated unit
+_SPEC_RE = re.compile(r'(?<![\w.])(?:(?P<lo>%s)\s*(?:-|~|–|to|a|hasta|至|到)\s*)?(?P<value>%s)\s*-?\s*'
+                      r'(?P<unit>%s)(?![a-z0-9])'
+                      % (_NUM, _NUM, '|'.join(re.escape(u) for u in sorted(UNITS, key=len, reverse=True))),
+                      re.IGNORECASE)
+_MODEL_RE = re.compile(r'(?<![\w-])([A-Z]{1,5})(-?)(\d{2,5})([A-Z]{0,4}\d{0,2})((?:-\d{1,2}[A-Z]?)?)(?![\w])')
+_SPACED_MODEL_RE = re.compile(r'(?<![\w-])([A-Z]{1,5})([- ]?)(\d{2,5})([A-Z]{0,4}\d{0,2})((?:-\d{1,2}[A-Z]?)?)(?![\w])')
+NOT_MODELS = {'ISO', 'EN', 'GB', 'CE', 'DIN', 'JIS', 'SAE', 'IP', 'DN', 'EURO', 'TIER', 'STAGE', 'Q', 'NO', 'RMB', 'USD'}
+_MIN_RE = re.compile(r'(at least|minimum|min\.?|above|over|more than|>=?|≥|mas de|minimo|al menos|不低于|不少于|以上)\s*$',
+                     re.IGNORECASE)
+_MAX_RE = re.compile(r'(up to|maximum|max\.?|below|under|less than|within|<=?|≤|hasta|maximo|menos de|不超过|以内|以下)\s*$',
+                     re.IGNORECASE)
+_LINE_RE = re.compile(r'[\r\n]+|\s+\|\s+')
+
+
+def parse_number(text: str) -> float:
+    """'1,200' -> 1200.0, '0,8' -> 0.8 (a comma is a decimal mark unless three digits follow)."""
+    if ',' in text:
+        whole, _, frac = text.partition(',')
+        text = whole + frac if len(frac) == 3 else f"{whole}.{frac}"
+    return float(text)
+
+
+class Spec:
+    __slots__ = ('dimension', 'role', 'lo', 'hi')
+
+    def __init__(self, dimension: str, role: Optional[str], lo: float, hi: float):
+        self.dimension = dimension
+        self.role = role
+        self.lo = lo
+        self.hi = hi
+
+    def label(self) -> str:
+        unit = BASE_UNITS[self.dimension]
+        value = f"{self.lo:g}" if self.lo == self.hi else f"{self.lo:g}-{self.hi:g}" if self.hi != math.inf \
+            else f">={self.lo:g}"
+        return f"{(self.role or self.dimension).replace('_', ' ')} {value} {unit}"
+
+    def to_dict(self) -> Dict:
+        return {'dimension': self.dimension, 'role': self.role, 'min': self.lo,
+                'max': None if self.hi == math.inf else self.hi, 'unit': BASE_UNITS[self.dimension]}
+
+
+def extract_specs(text: str, lexicon: HashedEmbedder, requirement: bool = False) -> List[Spec]:
+    """Numbers with units in (folded) text. For requirements a single value widens by TOLERANCE and
+    'at least' / 'up to' open the range on one side.
+
+    >>> lexicon = HashedEmbedder()
+    >>> [s.label() for s in extract_specs('20 ton excavator', lexicon, requirement=True)]
+    ['mass 17-23 t']
+    >>> [s.label() for s in extract_specs('20-ton excavator', lexicon, requirement=True)]
+    ['mass 17-23 t']
+    >>> [s.label() for s in extract_specs('reach 3-6 m', lexicon)]
+    ['length 3-6 m']
+    """
+    specs, previous_end = [], 0
+    for m in _SPEC_RE.finditer(text):
+        dimension, factor = UNITS[m.group('unit').lower()]
+        value = parse_number(m.group('value')) * factor
+        lo = parse_number(m.group('lo')) * factor if m.group('lo') else value
+        lo, hi = min(lo, value), max(lo, value)
+        before = text[max(previous_end, m.start() - 40):m.start()]
+        roles = sorted(c for c in lexicon.concepts_in(before) if ROLES.get(c) == dimension)
+        if requirement:
+            if _MIN_RE.search(before):
+                hi = math.inf
+            elif _MAX_RE.search(before):
+                lo = 0.0
+            elif lo == hi:
+                lo, hi = value * (1 - TOLERANCE), value * (1 + TOLERANCE)
+        specs.append(Spec(dimension, roles[-1] if roles else None, lo, hi))
+        previous_end = m.end()
+    return specs
+
+
+def extract_models(text: str, spaced: bool = False) -> List[Tuple[str, str]]:
+    """(model, family) pairs: 'PC200-8' -> ('PC200-8', 'PC200'); the text must keep its case.
+    spaced also accepts 'PC 200', which is only safe for lookups (RFQ text), not for parsing sheets."""
+    models = []
+    for prefix, _, digits, suffix, revision in (_SPACED_MODEL_RE if spaced else _MODEL_RE).findall(text):
+        if prefix in NOT_MODELS or prefix.lower() in UNITS:
+            continue
+        model = f"{prefix}{digits}{suffix}{revision}"
+        models.append((model, f"{prefix}{digits}"))
+    return models
+
+
+def _center(spec: Spec) -> float:
+    """The value a requirement asks for: its bound when open on one side, else the middle."""
+    return spec.lo if spec.hi == math.inf else spec.hi if spec.lo == 0 else (spec.lo + spec.hi) / 2
+
+
+def _keywords(text: str) -> List[str]:
+    return [t for t in tokenize(fold(text)) if t not in STOPWORDS and t not in UNITS and not t[0].isdigit()]
+
+
+class Product:
+    __slots__ = ('chunk_id', 'source', 'model', 'family', 'specs', 'tags', 'terms', 'text')
+
+    def __init__(self, chunk_id, source, model, family, specs, tags, terms, text):
+        self.chunk_id = chunk_id
+        self.source = source
+        self.model = model
+        self.family = family
+        self.specs = specs
+        self.tags = tags
+        self.terms = terms
+        self.text = text
+
+
+def parse_products(chunk_id: str, text: str, source: str, lexicon: HashedEmbedder) -> List[Product]:
+    """Products described by a chunk. Each line (or table row) naming a model starts a product and the
+    lines after it add to it; lines before the first model give every product their tags. A chunk with
+    specs and a category but no model number is one unnamed product."""
+    header, groups = [], []
+    for line in _LINE_RE.split(text):
+        if not line.strip():
+            continue
+        models = list(dict.fromkeys(extract_models(line)))
+        if models:
+            groups.append((models, [line]))
+        elif groups:
+            groups[-1][1].append(line)
+        else:
+            header.append(line)
+    header_text = ' '.join(header)
+    if not groups:
+        tags = set(lexicon.concepts_in(header_text)) - NOT_TAGS
+        specs = extract_specs(fold(header_text), lexicon)
+        if not specs or not tags & set(CATEGORIES):
+            return []
+        return [Product(chunk_id, source, None, None, specs, tags, set(_keywords(header_text)), text)]
+    # The header names the kind of machine only for products whose own lines do not (a chunk may
+    # also start with the overlapping tail of another product)
+    header_tags = set(lexicon.concepts_in(header_text)) - NOT_TAGS
+    products = []
+    for models, lines in groups:
+        body = ' '.join(lines)
+        tags = set(lexicon.concepts_in(body)) - NOT_TAGS
+        terms = set(_keywords(body))
+        if not tags & set(CATEGORIES):
+            tags |= header_tags
+            terms |= set(_keywords(header_text))
+        specs = extract_specs(fold(body), lexicon)
+        # A chunk about one product keeps its whole text; table rows get the header and their own lines
+        shown = text if len(groups) == 1 else '\n'.join(header + lines)
+        for model, family in models:
+            products.append(Product(chunk_id, source, model, family, specs, tags, terms, shown))
+    return products
+
+
+class ProductIndex:
+    """Products parsed from knowledge-base chunks, with model, tag, keyword and range indexes."""
+
+    def __init__(self, lexicon: Optional[HashedEmbedder] = None):
+        self.lexicon = lexicon or HashedEmbedder()
+        self.products: List[Product] = []
+        self.deleted = set()
+        self.by_chunk: Dict[str, List[int]] = {}
+        self.models: Dict[str, List[int]] = {}    # lowercased model or family -> products
+        self.tags: Dict[str, List[int]] = {}
+        self.terms: Dict[str, List[int]] = {}
+        self.ranges: Dict[str, List[Tuple[float, float, int]]] = {}  # dimension -> (lo, hi, product), by lo
+        self.range_products: Dict[str, List[int]] = {}  # the products of ranges[dimension], for slicing
+        self.widths: Dict[str, float] = {}        # dimension -> widest spec range, bounds the range scan
+        self.generation = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.products) - len(self.deleted)
+
+    def add(self, chunk_id: str, text: str, source: str = '') -> int:
+        """Parses a chunk; returns how many products it described."""
+        parsed = parse_products(chunk_id, text, source, self.lexicon)
+        with self._lock:
+            if chunk_id in self.by_chunk:
+                return 0
+            self._insert(chunk_id, parsed)
+        return len(parsed)
+
+    def _insert(self, chunk_id: str, parsed: List[Product]):
+        numbers = self.by_chunk[chunk_id] = []
+        for product in parsed:
+            n = len(self.products)
+            self.products.append(product)
+            numbers.append(n)
+            if product.model:
+                for key in {product.model.lower(), product.family.lower()}:
+                    self.models.setdefault(key, []).append(n)
+            for tag in product.tags:
+                self.tags.setdefault(tag, []).append(n)
+            for term in product.terms:
+                self.terms.setdefault(term, []).append(n)
+            for spec in product.specs:
+                entries = self.ranges.setdefault(spec.dimension, [])
+                at = bisect.bisect(entries, (spec.lo, spec.hi, n))
+                entries.insert(at, (spec.lo, spec.hi, n))
+                self.range_products.setdefault(spec.dimension, []).insert(at, n)
+                self.widths[spec.dimension] = max(self.widths.get(spec.dimension, 0.0), spec.hi - spec.lo)
+
+    def add_many(self, chunks: Iterable[Dict]) -> int:
+        return sum(self.add(chunk['id'], chunk['text'], chunk.get('source', '')) for chunk in chunks)
+
+    def remove(self, chunk_id: str) -> bool:
+        with self._lock:
+            numbers = self.by_chunk.pop(chunk_id, None)
+            if numbers is None:
+                return False
+            self.deleted.update(numbers)
+            return True
+
+    def compact(self):
+        """Rebuilds the indexes from the live products (chunks posted to the service included)."""
+        with self._lock:
+            fresh = ProductIndex(self.lexicon)
+            for chunk_id, numbers in self.by_chunk.items():
+                fresh._insert(chunk_id, [self.products[n] for n in numbers])
+            for name in ('products', 'deleted', 'by_chunk', 'models', 'tags', 'terms', 'ranges', 'range_products',
+                         'widths'):
+                setattr(self, name, getattr(fresh, name))
+
+    def sync(self, store) -> int:
+        """Applies the kb_ingest store's changes since the last sync (see BM25Index.sync)."""
+        applied = 0
+        for seq, op, chunk_id, text, source in store.changes_since(self.generation):
+            if op == 'add' and text is not None:
+                applied += self.add(chunk_id, text, source or '') > 0
+            elif op == 'remove':
+                applied += self.remove(chunk_id)
+            self.generation = seq
+        if self.deleted and len(self.deleted) > COMPACT_RATIO * len(self.products):
+            self.compact()
+        return applied
+
+    @classmethod
+    def from_store(cls, store, snapshot: Optional[str] = None,
+                   lexicon: Optional[HashedEmbedder] = None) -> 'ProductIndex':
+        """Products of a kb_ingest store: the snapshot plus later changes, or every chunk parsed afresh."""
+        index = None
+        if snapshot and os.path.exists(snapshot):
+            try:
+                index = cls.load(snapshot, lexicon)
+            except ValueError:
+                pass
+        saved = index.generation if index else None
+        if index is None:
+            index = cls(lexicon)
+            index.generation = store.generation()
+            for chunk_id, text, source in store.iter_chunks():
+                index.add(chunk_id, text, source or '')
+        index.sync(store)
+        if snapshot and index.generation != saved:
+            index.save(snapshot)
+        return index
+
+    def save(self, path: str):
+        with self._lock:
+            chunks = [[chunk_id, [[p.source, p.model, p.family,
+                                   [[s.dimension, s.role, s.lo, None if s.hi == math.inf else s.hi] for s in p.specs],
+                                   sorted(p.tags), sorted(p.terms), p.text]
+                                  for p in (self.products[n] for n in numbers)]]
+                      for chunk_id, numbers in self.by_chunk.items()]
+            data = {'version': PRODUCTS_VERSION, 'lexicon': self.lexicon.signature,
+                    'generation': self.generation, 'chunks': chunks}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path: str, lexicon: Optional[HashedEmbedder] = None) -> 'ProductIndex':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        index = cls(lexicon)
+        if data.get('version') != PRODUCTS_VERSION or data.get('lexicon') != index.lexicon.signature:
+            raise ValueError(f"{path}: built with another version or lexicon; rebuild it")
+        index.generation = data['generation']
+        for chunk_id, products in data['chunks']:
+            index._insert(chunk_id, [
+                Product(chunk_id, source, model, family,
+                        [Spec(dimension, role, lo, math.inf if hi is None else hi) for dimension, role, lo, hi in specs],
+                        set(tags), set(terms), text)
+                for source, model, family, specs, tags, terms, text in products])
+        return index
+
+    def _range_signals(self, spec: Spec) -> Tuple[Dict[int, float], List[List[int]], float]:
+        """Products with a spec overlapping the requested range: those near the asked value with the most
+        _spec_points could give them, and the slices of the rest, which can only get the base points."""
+        entries = self.ranges.get(spec.dimension, [])
+        products = self.range_products.get(spec.dimension, [])
+        width = self.widths.get(spec.dimension, 0.0)
+        center = _center(spec)
+        scale = center * TOLERANCE or 1.0
+        base = 4.0 if spec.role else 3.0
+        start = bisect.bisect_left(entries, (spec.lo - width,))
+        inside = bisect.bisect_left(entries, (spec.lo,))           # from here on every entry overlaps
+        near_lo = max(inside, bisect.bisect_left(entries, (center - scale - width,)))
+        near_hi = max(near_lo, bisect.bisect_right(entries, (center + scale, math.inf, math.inf)))
+        end = bisect.bisect_right(entries, (spec.hi, math.inf, math.inf))
+        near: Dict[int, float] = {}
+        for lo, hi, n in entries[start:inside] + entries[near_lo:min(near_hi, end)]:
+            if hi >= spec.lo:
+                points = base + 2.0 * (1.0 - min(abs(min(max(center, lo), hi) - center) / scale, 1.0))
+                if points > near.get(n, 0.0):
+                    near[n] = points
+        return near, [products[inside:near_lo], products[near_hi:end]], base
+
+    def _idf(self, term: str) -> float:
+        return math.log(1 + len(self.products) / (1 + len(self.terms.get(term, ()))))
+
+    def match_item(self, item: str, k: int = MAX_RESULTS) -> Tuple[List[Tuple[int, float, List[str]]], set]:
+        """The best k products for one requirement as (product, score, hits), and every product that
+        matches any part of it.
+
+        Each model, spec range, tag and word adds its highest possible points to the products it
+        selects; products are then scored in order of that bound and the scan stops once the k-th
+        score beats the next bound, so broad requirements ("excavator") do not score every product."""
+        models = extract_models(item.upper(), spaced=True)
+        tags = set(self.lexicon.concepts_in(item)) - NOT_TAGS
+        specs = extract_specs(fold(item), self.lexicon, requirement=True)
+        words = set(_keywords(item)) - {m.lower() for pair in models for m in pair}
+
+        named: Dict[int, Tuple[float, str]] = {}
+        for model, family in models:
+            for n in set(self.models.get(model.lower(), ())) | set(self.models.get(family.lower(), ())):
+                product = self.products[n]
+                named[n] = (10.0, f"model {product.model}") if product.model.lower() == model.lower() \
+                    else (7.0, f"series {product.family}")
+        weights = {word: self._idf(word) for word in words}
+        # (per-product points) or (products, points each)
+        scored_signals = [{n: points for n, (points, _) in named.items()}]
+        flat_signals = [(self.tags.get(tag, ()), 4.0 if tag in CATEGORIES else 2.0) for tag in tags]
+        flat_signals += [(self.terms.get(word, ()), weights[word]) for word in words]
+        for spec in specs:
+            near, far, base = self._range_signals(spec)
+            scored_signals.append(near)
+            flat_signals += [(products, base) for products in far if products]
+
+        # Phase 1: only small signals pick candidates; the large ones add at most `rest` to anything
+        bounds: Dict[int, float] = {}
+        get = bounds.get
+        rest = 0.0
+        for signal in scored_signals:
+            if len(signal) > SELECTIVE:
+                rest += max(signal.values())
+                continue
+            for n, points in signal.items():
+                bounds[n] = get(n, 0.0) + points
+        large = []
+        for products, points in flat_signals:
+            if len(products) > SELECTIVE:
+                rest += points
+                large.append(products)
+                continue
+            for n in products:
+                bounds[n] = get(n, 0.0) + points
+        for n in bounds:
+            bounds[n] += rest
+
+        wanted = tags & set(CATEGORIES)
+        heap: List[Tuple[float, int, List[str]]] = []
+        done = set(self.deleted)
+
+        def scan(bounds):
+            by_bound: Dict[float, List[int]] = {}
+            for n, bound in bounds.items():
+                if n not in done:
+                    by_bound.setdefault(bound, []).append(n)
+            for bound in sorted(by_bound, reverse=True):
+                for n in by_bound[bound]:
+                    if len(heap) >= k and heap[0][0] >= bound:
+                        return
+                    done.add(n)
+                    product = self.products[n]
+                    score, hit = named.get(n, (0.0, None))
+                    hits = [hit] if hit else []
+                    for spec in specs:
+                        points, label = self._spec_points(spec, product)
+                        if points:
+                            score += points
+                            hits.append(label)
+                    for tag in tags & product.tags:
+                        score += 4.0 if tag in CATEGORIES else 2.0
+                        hits.append(tag.replace('_', ' '))
+                    for word in words & product.terms:
+                        score += weights[word]
+                        hits.append(word)
+                    # Asking for one kind of machine rules out products that are clearly another kind
+                    kinds = product.tags & set(CATEGORIES)
+                    if wanted and kinds and not wanted & kinds:
+                        score -= 6.0
+                    if score <= 0:
+                        continue
+                    if len(heap) < k:
+                        heapq.heappush(heap, (score, -n, hits))
+                    elif (score, -n) > heap[0][:2]:
+                        heapq.heapreplace(heap, (score, -n, hits))
+
+        scan(bounds)
+        matched = set(bounds).union(*large)
+        if rest and not (len(heap) >= k and heap[0][0] >= rest):
+            # Phase 2: products picked only by large signals may still make the top k
+            exact: Dict[int, float] = {}
+            get = exact.get
+            for signal in scored_signals:
+                for n, points in signal.items():
+                    exact[n] = get(n, 0.0) + points
+            for products, points in flat_signals:
+                for n in products:
+                    exact[n] = get(n, 0.0) + points
+            scan(exact)
+        matched -= self.deleted
+        return [(-n, score, hits) for score, n, hits in sorted(heap, reverse=True)], matched
+
+    @staticmethod
+    def _spec_points(spec: Spec, product: Product) -> Tuple[float, Optional[str]]:
+        """Points for the product's best spec in the requested range whose role, if both name one, agrees."""
+        center = _center(spec)
+        best = (0.0, None)
+        for s in product.specs:
+            if s.dimension != spec.dimension or s.lo > spec.hi or s.hi < spec.lo:
+                continue
+            if spec.role and s.role and spec.role != s.role:
+                continue
+            value = min(max(center, s.lo), s.hi)
+            closeness = 1.0 - min(abs(value - center) / (center * TOLERANCE or 1.0), 1.0)
+            points = 3.0 + 2.0 * closeness + (1.0 if spec.role and spec.role == s.role else 0.0)
+            if points > best[0]:
+                best = (points, s.label())
+        return best
+
+    def match(self, requested: Iterable[str], k: int = MAX_RESULTS) -> Dict:
+        """Products that fit the requested items, in the shape matchProductFromKB() returns."""
+        with self._lock:
+            best: Dict[int, Tuple[float, List[str]]] = {}
+            matched = set()
+            for item in requested:
+                if not isinstance(item, str) or not item.strip():
+                    continue
+                # 2k per item: overlapping chunks repeat products, which are merged below
+                top, selected = self.match_item(item, 2 * k)
+                matched |= selected
+                for n, score, hits in top:
+                    if n not in best or score > best[n][0]:
+                        best[n] = (score, hits)
+            # One result per model; unnamed products per chunk
+            seen, ranked = set(), []
+            for n, (score, hits) in sorted(best.items(), key=lambda item: (-item[1][0], item[0])):
+                product = self.products[n]
+                key = product.model.lower() if product.model else product.chunk_id
+                if key not in seen:
+                    seen.add(key)
+                    ranked.append((product, score, hits))
+        matches = [{'text': p.text[:300], 'score': round(score, 2), 'hits': list(dict.fromkeys(hits)),
+                    'source': p.source, 'model': p.model, 'specs': [s.to_dict() for s in p.specs]}
+                   for p, score, hits in ranked[:k]]
+        if matches:
+            summary = ' | '.join(m['text'][:100] for m in matches)
+        else:
+            summary = '知识库中未找到匹配的产品' if len(self) else '知识库为空，请先上传产品资料'
+        return {'found': bool(matches), 'summary': summary, 'matches': matches, 'totalFound': len(matched)}
+
+    def stats(self) -> Dict:
+        return {'products': len(self), 'models': len(self.models), 'tags': len(self.tags),
+                'specs': sum(len(entries) for entries in self.ranges.values())}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Match RFQ requirements against the product spec index")
+    parser.add_argument('requested', nargs='+', help="requested products, e.g. \"20 ton excavator\"")
+    parser.add_argument('--db', default='kb.sqlite', help="kb_ingest.py store (default: kb.sqlite)")
+    parser.add_argument('-k', type=int, default=MAX_RESULTS)
+    parser.add_argument('--json', action='store_true', help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    from kb_ingest import KnowledgeStore
+    store = KnowledgeStore(args.db)
+    started = time.perf_counter()
+    index = ProductIndex.from_store(store, args.db + '.products.json')
+    built = time.perf_counter() - started
+    started = time.perf_counter()
+    result = index.match(args.requested, args.k)
+    elapsed = (time.perf_counter() - started) * 1000
+    if args.json:
+        json.dump(result, sys.stdout, indent=2, ensure_ascii=False)
+        print()
+        return 0
+    for m in result['matches']:
+        print(f"{m['score']:6.1f}  {m['model'] or '-':<12} {', '.join(m['hits'])}")
+        print(f"        [{m['source']}] {m['text'][:100].replace(chr(10), ' ')}")
+    print(f"{result['totalFound']} product(s) matched in {elapsed:.2f} ms "
+          f"(index of {len(index)} products loaded in {built:.2f}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,8 +9,8 @@ echo.
 :: Try starting on port 8000 first, it's safer
 start http://localhost:8000
 
-:: Start the Python HTTP server and keep window open on error
-python -m http.server 8000
+:: Build deploy/ and serve it (gzip/brotli, ETags, rebuild on save); keep window open on error
+python dev_server.py --port 8000
 if %errorlevel% neq 0 (
     echo.
     echo [ERROR] Server failed to start!